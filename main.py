@@ -3,11 +3,13 @@ import requests
 import re
 import time
 import os
-from bs4 import BeautifulSoup
 import json
-import schedule
 from datetime import datetime
 import logging
+from modules.http_session import SessionPool
+from modules.rate_limiter import TokenBucket
+from modules.precise_scheduler import PreciseScheduler
+from modules.punch_parser import PunchParser
 
 # 获取当前目录
 current_directory = os.getcwd()
@@ -221,21 +223,22 @@ def thisTime(hour,minute):
     # 格式化当前时间结构体为字符串
     current_time = time.strftime("%Y-%m-%d %H:%M", current_time_struct)
 
-    # 区分剩余时间的显示逻辑，以优化终端内容的显示阅读体验
-    if remaining_seconds_main < 300:
-        # 如果剩余时间小于5分钟则每秒刷新
-        print("\r当前时间：{}，距离下次任务执行{}:{} 还剩{}分钟{}秒\t\t".format(
-            current_time, target_hour, target_minute, remaining_minutes, remaining_seconds), end="")
-        time.sleep(1)
-    else:
-        # 如果剩余时间大于5分钟则每分钟刷新
-        print("\r当前时间：{}，距离下次任务执行{}:{} 还剩{}小时{}分钟\t\t".format(
-            current_time, target_hour, target_minute, remaining_hours, remaining_minutes), end="")
-        time.sleep(60)
+    # 只在等待开始时显示一次，等待由调度器精确休眠到到期时刻，不再按秒/分钟轮询
+    print("当前时间：{}，距离下次任务执行{}:{} 还剩{}小时{}分钟{}秒".format(
+        current_time, target_hour, target_minute, remaining_hours, remaining_minutes, remaining_seconds))
+
+# 共享连接池，多用户签到及定时任务之间复用到k8n.cn的长连接
+session_pool = SessionPool()
+# 全局令牌桶限流，替代每个用户固定5秒的冷却，总请求速率不超过 rate_limit 次/秒
+rate_limiter = TokenBucket(json_data.get("rate_limit", 5), json_data.get("rate_burst", 10))
+# 页面解析后端：regex（默认）、html.parser、lxml
+page_parser = PunchParser(json_data.get("parser", "regex"))
 
 def qiandao(theCookies):
     # title = '班级魔法自动签到任务'  # 改成你要的标题内容
     url = 'http://k8n.cn/student/course/' + ClassID + '/punchs'
+    session = session_pool.get_session()
+    rate_limiter.reset_stats()
     errorCookie = []
     nullCookie = 0
     # 多用户检测签到
@@ -251,18 +254,8 @@ def qiandao(theCookies):
         else:
             username_string = ""
 
-        # 用户信息显示与5秒冷却
-        print("☆☆☆☆☆ 用户UID：%d%s 即将签到 ☆☆☆☆☆"%(uid+1,username_string),end="")
-        time.sleep(1) #暂停5秒后进行签到
-        print("\r★☆☆☆☆ 用户UID：%d%s 即将签到 ☆☆☆☆★"%(uid+1,username_string),end="")
-        time.sleep(1)
-        print("\r★★☆☆☆ 用户UID：%d%s 即将签到 ☆☆☆★★"%(uid+1,username_string),end="")
-        time.sleep(1)
-        print("\r★★★☆☆ 用户UID：%d%s 即将签到 ☆☆★★★"%(uid+1,username_string),end="")
-        time.sleep(1)
-        print("\r★★★★☆ 用户UID：%d%s 即将签到 ☆★★★★"%(uid+1,username_string),end="")
-        time.sleep(1)
-        print("\r★★★★★ 用户UID：%d%s 开始签到 ★★★★★"%(uid+1,username_string))
+        # 用户信息显示（请求速率由全局限流器控制）
+        print("★★★★★ 用户UID：%d%s 开始签到 ★★★★★"%(uid+1,username_string))
 
         # 使用正则表达式提取目标字符串 - Cookie
         pattern = r'remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d=[^;]+'
@@ -282,30 +275,27 @@ def qiandao(theCookies):
                 'Cookie': extracted_string
             }
 
-            response = requests.get(url, headers=headers)
+            rate_limiter.acquire()
+            response = session.get(url, headers=headers)
             print("响应:", response)
 
-            # 创建 Beautiful Soup 对象解析 HTML
-            soup = BeautifulSoup(response.text, 'html.parser')
-
-            title_tag = soup.find('title')
+            # 单次扫描解析标题与签到任务
+            page = page_parser.parse_page(response.text)
 
             if debug:
                 print("★☆★")
-                print(soup)
+                print(response.text)
                 print("===")
-                print(title_tag)
+                print(page['title'])
                 print("★☆★")
 
-            if title_tag and "出错" not in title_tag.text:
-                # 使用正则表达式从 HTML 文本中提取所有 punch_gps() 中的数字
-                pattern = re.compile(r'punch_gps\((\d+)\)')
-                matches = pattern.findall(response.text)
+            if page['title'] is not None and "出错" not in page['title']:
+                # 页面中所有 punch_gps() 与 punchcard_ 中的数字
+                matches = page['gps']
                 print("找到GPS定位签到:", matches)
-                pattern2 = re.compile(r'punchcard_(\d+)')
-                matches2 = pattern2.findall(response.text)
+                matches2 = page['qr']
                 print("找到扫码签到:", matches2)
-                matches.extend(matches2)
+                matches = matches + matches2
                 if matches:
                     for match in matches:
                         url1 = "http://k8n.cn/student/punchs/course/" + ClassID + "/" + match
@@ -320,27 +310,25 @@ def qiandao(theCookies):
                             'gps_addr': ''  #未知，抓取时该函数为空
                         }
 
-                        response = requests.post(url1, headers=headers, data=payload)
+                        rate_limiter.acquire()
+                        response = session.post(url1, headers=headers, data=payload)
                         print("签到请求已发送： 签到ID[%s] 签到定位[%s,%s] 签到海拔[%s]"%(match, newX, newY, ACC))
                         printLog("info", "用户UID[%d%s] | 签到请求已发送： 签到ID[%s] 签到定位[%s,%s] 签到海拔[%s]"%(uid+1, username_string, match, newX, newY, ACC))
 
                         if response.status_code == 200:
                             print("请求成功，响应:", response)
 
-                            # 解析响应的 HTML 内容
-                            soup_response = BeautifulSoup(response.text, 'html.parser')
-                            # h1_tag = soup_response.find('h1')
-                            div_tag = soup_response.find('div', id='title')
+                            # 解析响应中的签到结果
+                            h1_text = page_parser.parse_sign_result(response.text)
 
                             if debug:
                                 print("★☆★")
-                                print(soup_response)
+                                print(response.text)
                                 print("===")
-                                print(div_tag)
+                                print(h1_text)
                                 print("★☆★")
 
-                            if div_tag:
-                                h1_text = div_tag.text
+                            if h1_text is not None:
                                 print(h1_text)
                                 printLog("info", "用户UID[%d%s] | %s"%(uid+1, username_string, h1_text))
                                 # encoding:utf-8
@@ -365,6 +353,8 @@ def qiandao(theCookies):
         else:
             nullCookie += 1
             print("未找到匹配的字符串，检查Cookie是否错误！")
+    stats = rate_limiter.get_stats()
+    printLog("info", "限流统计: 请求%d次 总等待%.2f秒 最长等待%.2f秒"%(stats['requests'], stats['total_wait'], stats['max_wait']))
     return errorCookie, nullCookie
 def job():
     current_time = datetime.now()
@@ -390,17 +380,18 @@ def job():
 
     if scheduletime:
         print("☆本次签到结束，等待设定的时间%s到达☆\n"%scheduletime)
+        thisTime(*scheduletime.split(":"))
 
 if (scheduletime != ""):
     print("☆等待设定时间" + scheduletime + "到达☆")
-    # 设置定时任务，在每天的早上8点触发
-    schedule.every().day.at(scheduletime).do(job)
+    # 设置定时任务，调度器基于单调时钟休眠到到期时刻，并记录每次触发延迟
+    scheduler = PreciseScheduler(logger=logging.getLogger())
+    scheduler.call_daily(scheduletime, job, "定时签到")
     # 格式化时间
     hour,minute = scheduletime.split(":")
+    thisTime(hour,minute) # 倒计时
 
-    while True:
-        schedule.run_pending()
-        thisTime(hour,minute) # 倒计时
+    scheduler.run_forever()
 else:
     job()
     input("手动签到已结束，敲击回车关闭窗口☆~")
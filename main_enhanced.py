@@ -7,10 +7,11 @@ import sys
 import json
 import time
 import random
-import requests
 import re
-import schedule
-from datetime import datetime
+import socket
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import logging
 import tkinter as tk
 from tkinter import messagebox
@@ -21,11 +22,24 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'modules'))
 
 try:
     from modules.gui_config import ConfigWizard
-    from modules.secure_storage import CookieManager
+    from modules.secure_storage import CookieManager, atomic_write
     from modules.location_manager import LocationManager
     from modules.browser_cookie_extractor import BrowserCookieExtractor
     from modules.auto_login import AutoLogin
     from modules.class_detector import ClassDetector
+    from modules.http_session import SessionPool, build_headers, fetch_streaming
+    from modules.async_engine import AsyncCheckinEngine
+    from modules.rate_limiter import TokenBucket
+    from modules.retry_queue import RetryQueue
+    from modules.punch_index import SignedPunchIndex
+    from modules.punch_watcher import PunchWatcher
+    from modules.punch_history import PunchHistory, AdaptivePollPolicy, parse_timetable
+    from modules.precise_scheduler import PreciseScheduler
+    from modules.job_spec import load_jobs, select_cookies
+    from modules.cookie_prefetch import CookieHealthPrefetch
+    from modules.file_lock import FileLock
+    from modules.punch_parser import PunchParser, BACKENDS, punch_ids, punch_page_decided, sign_result_decided
+    from modules import punch_result
 except ImportError as e:
     print(f"模块导入失败: {e}")
     print("请确保所有依赖模块都已正确安装")
@@ -38,10 +52,30 @@ class EnhancedAutoCheckBJMF:
     def __init__(self):
         self.config = {}
         self.cookie_manager = CookieManager()
+        self.health_prefetch = CookieHealthPrefetch(self.cookie_manager.refresh_cookies)
+        self.session_pool = SessionPool()
+        self.rate_limiter = None
+        self.page_parser = None
+        self.retry_queue = RetryQueue()
+        self.punch_index = SignedPunchIndex(
+            os.path.join(self.cookie_manager.storage.storage_path, "signed_punches.json")
+        )
+        self.punch_history = PunchHistory(
+            os.path.join(self.cookie_manager.storage.storage_path, "punch_history.json")
+        )
+        self.last_results = []
+        self.active_class = None
+        self.first_request_tails = {'warm': [], 'cold': []}
+        self._prewarmed_at = None
+        self._prewarm_thread = None
         self.current_directory = os.getcwd()
         self.config_file = os.path.join(self.current_directory, "config.json")
+        # 最近一次写入config.json的内容，未变化时跳过写入
+        self._saved_config = None
         self.logger = None
         self.setup_logging()
+        self.scheduler = PreciseScheduler(logger=self.logger)
+        self._retry_event = None
         
         print("=" * 50)
         print("AutoCheckBJMF 增强版")
@@ -113,17 +147,25 @@ class EnhancedAutoCheckBJMF:
                     if cookies and user_info.get('class_id'):
                         # 验证配置完整性
                         if self._validate_config_data(user_info, cookies):
-                            self.config = {
+                            # 安全存储只保存账号与位置信息，其余配置项（jobs、engine、watch等）从配置文件合并
+                            config_data = {'debug': False, 'configLock': True}
+                            config_data.update(self._read_config_file() or {})
+                            config_data.update({
                                 'class': str(user_info.get('class_id', '')),
                                 'lat': str(user_info.get('location', {}).get('lat', '')),
                                 'lng': str(user_info.get('location', {}).get('lng', '')),
                                 'acc': str(user_info.get('location', {}).get('alt', '100')),
                                 'cookie': cookies,
                                 'scheduletime': user_info.get('schedule', ''),
-                                'pushplus': user_info.get('push_token', ''),
-                                'debug': False,
-                                'configLock': True
-                            }
+                                'pushplus': user_info.get('push_token', '')
+                            })
+
+                            # 合并后的配置与配置文件使用同样的校验（jobs、解析后端等）
+                            if not self._validate_json_config(config_data):
+                                self.logger.error("合并后的配置验证失败")
+                                print("❌ 配置文件格式错误")
+                                return False
+                            self.config = config_data
                             self.logger.info("从安全存储加载配置成功")
                             print("✅ 从安全存储加载配置成功")
                             return True
@@ -135,8 +177,9 @@ class EnhancedAutoCheckBJMF:
             # 尝试从传统配置文件加载
             if os.path.exists(self.config_file):
                 try:
-                    with open(self.config_file, 'r', encoding='utf-8') as f:
-                        config_data = json.load(f)
+                    with FileLock(self.config_file).shared():
+                        with open(self.config_file, 'r', encoding='utf-8') as f:
+                            config_data = json.load(f)
 
                     # 验证配置文件格式
                     if self._validate_json_config(config_data):
@@ -165,6 +208,19 @@ class EnhancedAutoCheckBJMF:
             self.logger.error(f"加载配置过程中发生未预期错误: {e}", exc_info=True)
             print(f"❌ 加载配置失败: {e}")
             return False
+    
+    def _read_config_file(self) -> dict:
+        """读取传统配置文件，不存在或无法解析时返回None"""
+        if not os.path.exists(self.config_file):
+            return None
+        try:
+            with FileLock(self.config_file).shared():
+                with open(self.config_file, 'r', encoding='utf-8') as f:
+                    config_data = json.load(f)
+            return config_data if isinstance(config_data, dict) else None
+        except Exception as e:
+            self.logger.warning(f"读取配置文件失败: {e}")
+            return None
 
     def _validate_config_data(self, user_info: dict, cookies: list) -> bool:
         """验证配置数据完整性"""
@@ -250,6 +306,18 @@ class EnhancedAutoCheckBJMF:
                     self.logger.warning("时间格式解析失败")
                     return False
 
+            # 检查解析后端
+            if config_data.get('parser', 'regex') not in BACKENDS:
+                self.logger.warning(f"未知的解析后端: {config_data['parser']}，可选 {', '.join(BACKENDS)}")
+                return False
+            
+            # 检查计划任务格式
+            try:
+                load_jobs(config_data.get('jobs', []))
+            except (ValueError, KeyError, TypeError) as e:
+                self.logger.warning(f"计划任务格式无效: {e}")
+                return False
+            
             return True
 
         except Exception as e:
@@ -259,9 +327,12 @@ class EnhancedAutoCheckBJMF:
     def save_config(self):
         """保存配置文件"""
         try:
-            # 保存到传统配置文件
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                json.dump(self.config, f, indent=4, ensure_ascii=False)
+            # 保存到传统配置文件，内容未变化时不重写
+            content = json.dumps(self.config, indent=4, ensure_ascii=False)
+            if content != self._saved_config or not os.path.exists(self.config_file):
+                with FileLock(self.config_file).exclusive():
+                    atomic_write(self.config_file, content.encode('utf-8'))
+                self._saved_config = content
             
             # 保存到安全存储
             if 'cookie' in self.config:
@@ -280,7 +351,8 @@ class EnhancedAutoCheckBJMF:
                     'push_token': self.config.get('pushplus', '')
                 }
                 
-                self.cookie_manager.save_cookies(self.config['cookie'], user_info)
+                # 只写本地存储，Cookie有效性由签到前的刷新与加载时的定期验证负责
+                self.cookie_manager.save_cookies(self.config['cookie'], user_info, validate=False)
             
             print("✅ 配置保存成功")
             
@@ -324,7 +396,7 @@ class EnhancedAutoCheckBJMF:
                 
                 # 2. 自动检测班级
                 print("🏫 正在检测班级信息...")
-                detector = ClassDetector()
+                detector = ClassDetector(self.get_page_parser())
                 class_id = detector.get_class_id_interactive(cookies[0])
                 
                 if class_id:
@@ -444,149 +516,338 @@ class EnhancedAutoCheckBJMF:
         new_num = float(new_num_str)
         return new_num
     
+    def current_class(self):
+        """当前签到的班级ID，多任务计划可临时指定其他班级"""
+        return self.active_class or self.config.get('class', '')
+    
     def qiandao(self, cookies_list):
         """签到函数（增强版）"""
-        class_id = self.config.get('class', '')
+        class_id = self.current_class()
         lat = self.config.get('lat', '')
         lng = self.config.get('lng', '')
         acc = self.config.get('acc', '')
-        push_token = self.config.get('pushplus', '')
         
         if not all([class_id, lat, lng, acc]):
             self.logger.error("配置信息不完整，无法执行签到")
             return [], 1
         
-        url = f'http://k8n.cn/student/course/{class_id}/punchs'
-        error_cookies = []
-        null_cookie = 0
+        workers = max(1, int(self.config.get('workers', 1)))
+        
+        # 同一任务内所有账号共用连接池，获取页面与签到请求复用长连接
+        if workers > self.session_pool.pool_maxsize:
+            self.session_pool.resize(workers)
+        session = self.session_pool.get_session()
         
         self.logger.info(f"开始签到，目标班级: {class_id}")
         
-        for uid, cookie in enumerate(cookies_list):
-            try:
-                # 提取用户备注
-                pattern = r'username=([^;]+)'
-                result = re.search(pattern, cookie)
-                username_string = f" <{result.group(1)}>" if result else ""
-                
-                print(f"🔄 用户UID: {uid+1}{username_string} 正在签到...")
-                self.logger.info(f"用户UID: {uid+1}{username_string} 开始签到")
-                
-                # 提取Cookie值
-                pattern = r'remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d=([^;]+)'
-                result = re.search(pattern, cookie)
-                
-                if not result:
-                    null_cookie += 1
-                    print(f"❌ Cookie格式错误")
-                    continue
-                
-                extracted_cookie = result.group(0)
-                
-                # 设置请求头
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                    'X-Requested-With': 'com.tencent.mm',
-                    'Referer': f'http://k8n.cn/student/course/{class_id}',
-                    'Accept-Encoding': 'gzip, deflate',
-                    'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
-                    'Cookie': extracted_cookie
-                }
-                
-                # 获取签到页面
-                response = requests.get(url, headers=headers, timeout=10)
-                
-                if response.status_code != 200:
-                    print(f"❌ 请求失败，状态码: {response.status_code}")
-                    error_cookies.append(cookie)
-                    continue
-                
-                # 解析页面内容
-                from bs4 import BeautifulSoup
-                soup = BeautifulSoup(response.text, 'html.parser')
-                title_tag = soup.find('title')
-                
-                if title_tag and "出错" in title_tag.text:
-                    print(f"❌ 登录状态异常")
-                    self.logger.error(f"用户UID: {uid+1}{username_string} 登录状态异常")
-                    error_cookies.append(cookie)
+        rate_limiter = self.get_rate_limiter()
+        rate_limiter.reset_stats()
+        
+        results = []
+        accounts = list(enumerate(cookies_list))
+        
+        # 探测模式：先用一个账号获取签到页面，有签到任务时才请求其余账号
+        if self.config.get('probe', False) and len(accounts) > 1:
+            results, accounts = self._probe_class(session, accounts)
+        
+        if workers == 1 or not accounts:
+            for uid, cookie in accounts:
+                record = self._sign_account(session, uid, cookie)
+                self._emit_record(record)
+                results.append(record)
+        else:
+            self.logger.info(f"使用线程池签到，工作线程数: {workers}")
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(self._sign_account, session, uid, cookie)
+                    for uid, cookie in accounts
+                ]
+                # 每个账号的输出在其任务完成后整体输出，避免多线程日志交错
+                for future in as_completed(futures):
+                    record = future.result()
+                    self._emit_record(record)
+                    results.append(record)
+            results.sort(key=lambda r: r['uid'])
+        
+        self.last_results = results
+        error_cookies = [r['cookie'] for r in results if r['status'] == 'error']
+        null_cookie = sum(1 for r in results if r['status'] == 'null')
+        
+        self.punch_index.save()
+        self._log_rate_limit_stats()
+        
+        return error_cookies, null_cookie
+    
+    def _probe_class(self, session, accounts):
+        """用第一个可用账号探测签到任务，返回 (已完成的记录, 仍需签到的账号)"""
+        results = []
+        
+        for index, (uid, cookie) in enumerate(accounts):
+            record = self._sign_account(session, uid, cookie)
+            self._emit_record(record)
+            results.append(record)
+            
+            # Cookie失效的账号无法代表班级状态，换下一个账号继续探测
+            if record['outcome'] in (punch_result.INVALID_COOKIE,
+                                     punch_result.EXPIRED_LOGIN,
+                                     punch_result.CLIENT_ERROR):
+                continue
+            
+            remaining = accounts[index + 1:]
+            if record['outcome'] != punch_result.NO_PUNCH:
+                return results, remaining
+            
+            if remaining:
+                print(f"ℹ️ 探测无签到任务，跳过其余 {len(remaining)} 个账号")
+                self.logger.info(f"探测账号UID: {uid+1} 未发现签到任务，跳过其余 {len(remaining)} 个账号")
+            results.extend({
+                'uid': rest_uid,
+                'cookie': rest_cookie,
+                'status': 'ok',
+                'outcome': punch_result.NO_PUNCH,
+                'punches': [],
+                'logs': []
+            } for rest_uid, rest_cookie in remaining)
+            return results, []
+        
+        return results, []
+    
+    def get_rate_limiter(self):
+        """获取所有签到线程共享的令牌桶限流器"""
+        rate = float(self.config.get('rate_limit', 5))
+        burst = int(self.config.get('rate_burst', 10))
+        
+        if self.rate_limiter is None or \
+                (self.rate_limiter.rate, self.rate_limiter.burst) != (rate, burst):
+            self.rate_limiter = TokenBucket(rate, burst)
+        
+        return self.rate_limiter
+    
+    def _fetch(self, session, method, url, decided, **kwargs):
+        """发起签到相关请求；配置 stream 时流式读取，decided 判断已读内容足够后提前停止"""
+        if not self.config.get('stream', False):
+            return getattr(session, method.lower())(url, **kwargs)
+        return fetch_streaming(session, method, url, decided,
+                               tail_limit=int(self.config.get('stream_tail', 32768)), **kwargs)
+    
+    def get_page_parser(self):
+        """获取按配置 parser 选择后端的页面解析器"""
+        backend = self.config.get('parser', 'regex')
+        if self.page_parser is None or self.page_parser.backend != backend:
+            self.page_parser = PunchParser(backend)
+        return self.page_parser
+    
+    def _log_rate_limit_stats(self):
+        """记录本次签到的限流等待统计"""
+        stats = self.get_rate_limiter().get_stats()
+        self.logger.info(
+            f"限流统计: 请求 {stats['requests']} 次，其中等待 {stats['waited_requests']} 次，"
+            f"总等待 {stats['total_wait']:.2f} 秒，最长等待 {stats['max_wait']:.2f} 秒"
+        )
+    
+    def _emit_record(self, record):
+        """输出单个账号的签到日志"""
+        for level, message in record['logs']:
+            if level == 'print':
+                print(message)
+            else:
+                getattr(self.logger, level)(message)
+    
+    def _sign_account(self, session, uid, cookie):
+        """为单个账号签到，返回该账号的结果记录"""
+        class_id = self.current_class()
+        lat = self.config.get('lat', '')
+        lng = self.config.get('lng', '')
+        acc = self.config.get('acc', '')
+        push_token = self.config.get('pushplus', '')
+        url = f'http://k8n.cn/student/course/{class_id}/punchs'
+        
+        record = {
+            'uid': uid,
+            'cookie': cookie,
+            'status': 'ok',
+            'outcome': punch_result.NO_PUNCH,
+            'punches': [],
+            'first_request_ms': None,
+            'logs': []
+        }
+        logs = record['logs']
+        
+        try:
+            # 提取用户备注
+            pattern = r'username=([^;]+)'
+            result = re.search(pattern, cookie)
+            username_string = f" <{result.group(1)}>" if result else ""
+            
+            logs.append(('print', f"🔄 用户UID: {uid+1}{username_string} 正在签到..."))
+            logs.append(('info', f"用户UID: {uid+1}{username_string} 开始签到"))
+            
+            # 提取Cookie值
+            pattern = r'remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d=([^;]+)'
+            result = re.search(pattern, cookie)
+            
+            if not result:
+                logs.append(('print', f"❌ Cookie格式错误"))
+                return self._finish_record(record, punch_result.INVALID_COOKIE)
+            
+            extracted_cookie = result.group(0)
+            
+            # 设置请求头
+            headers = build_headers(class_id, extracted_cookie)
+            
+            # 获取签到页面
+            rate_limiter = self.get_rate_limiter()
+            rate_limiter.acquire()
+            request_start = time.monotonic()
+            response = self._fetch(session, 'GET', url, punch_page_decided, headers=headers, timeout=10)
+            record['first_request_ms'] = (time.monotonic() - request_start) * 1000
+            
+            if response.status_code != 200:
+                logs.append(('print', f"❌ 请求失败，状态码: {response.status_code}"))
+                return self._finish_record(record, punch_result.classify_page(response.status_code, None))
+            
+            # 单次扫描解析页面标题与签到任务，页面与上次相同时复用解析结果
+            account = SignedPunchIndex.account_key(cookie)
+            page = self.get_page_parser().parse_page(response.text, key=(class_id, account))
+            
+            outcome = punch_result.classify_page(response.status_code, page['title'])
+            if outcome:
+                logs.append(('print', f"❌ 登录状态异常"))
+                logs.append(('error', f"用户UID: {uid+1}{username_string} 登录状态异常"))
+                return self._finish_record(record, outcome)
+            
+            # 查找签到任务
+            all_matches = punch_ids(page)
+            
+            if not all_matches:
+                logs.append(('print', f"ℹ️ 未找到进行中的签到任务"))
+                return self._finish_record(record, punch_result.NO_PUNCH)
+            
+            logs.append(('print', f"📍 找到签到任务: GPS({len(page['gps'])}) 扫码({len(page['qr'])})"))
+            
+            # 执行签到
+            for match in all_matches:
+                # 本地索引中已完成的签到不再重复提交
+                if self.punch_index.is_signed(account, class_id, match):
+                    logs.append(('print', f"⏭️ 签到任务 {match} 已完成，跳过"))
+                    record['punches'].append({'id': match, 'outcome': punch_result.ALREADY_SIGNED, 'text': None})
                     continue
                 
-                # 查找签到任务
-                gps_pattern = re.compile(r'punch_gps\((\d+)\)')
-                qr_pattern = re.compile(r'punchcard_(\d+)')
+                sign_url = f"http://k8n.cn/student/punchs/course/{class_id}/{match}"
                 
-                gps_matches = gps_pattern.findall(response.text)
-                qr_matches = qr_pattern.findall(response.text)
+                # 生成随机坐标偏移
+                new_lat = self.modify_decimal_part(lat)
+                new_lng = self.modify_decimal_part(lng)
                 
-                all_matches = gps_matches + qr_matches
-                
-                if not all_matches:
-                    print(f"ℹ️ 未找到进行中的签到任务")
-                    continue
+                payload = {
+                    'id': match,
+                    'lat': new_lat,
+                    'lng': new_lng,
+                    'acc': acc,
+                    'res': '',
+                    'gps_addr': ''
+                }
                 
-                print(f"📍 找到签到任务: GPS({len(gps_matches)}) 扫码({len(qr_matches)})")
+                rate_limiter.acquire()
+                sign_response = self._fetch(session, 'POST', sign_url, sign_result_decided,
+                                            headers=headers, data=payload, timeout=10)
                 
-                # 执行签到
-                for match in all_matches:
-                    sign_url = f"http://k8n.cn/student/punchs/course/{class_id}/{match}"
-                    
-                    # 生成随机坐标偏移
-                    new_lat = self.modify_decimal_part(lat)
-                    new_lng = self.modify_decimal_part(lng)
-                    
-                    payload = {
-                        'id': match,
-                        'lat': new_lat,
-                        'lng': new_lng,
-                        'acc': acc,
-                        'res': '',
-                        'gps_addr': ''
-                    }
+                result_text = None
+                if sign_response.status_code == 200:
+                    result_text = self.get_page_parser().parse_sign_result(sign_response.text)
                     
-                    sign_response = requests.post(sign_url, headers=headers, data=payload, timeout=10)
-                    
-                    if sign_response.status_code == 200:
-                        sign_soup = BeautifulSoup(sign_response.text, 'html.parser')
-                        div_tag = sign_soup.find('div', id='title')
+                    if result_text is not None:
+                        logs.append(('print', f"✅ 签到结果: {result_text}"))
+                        logs.append(('info', f"用户UID: {uid+1}{username_string} 签到结果: {result_text}"))
                         
-                        if div_tag:
-                            result_text = div_tag.text.strip()
-                            print(f"✅ 签到结果: {result_text}")
-                            self.logger.info(f"用户UID: {uid+1}{username_string} 签到结果: {result_text}")
-                            
-                            # 推送通知
-                            if push_token and result_text == "签到成功":
-                                try:
-                                    push_url = f'http://www.pushplus.plus/send?token={push_token}&title=班级魔法自动签到任务&content={result_text}'
-                                    requests.get(push_url, timeout=5)
-                                except:
-                                    pass
-                        else:
-                            print(f"✅ 签到请求已发送")
+                        # 推送通知
+                        if push_token and result_text == "签到成功":
+                            try:
+                                push_url = f'http://www.pushplus.plus/send?token={push_token}&title=班级魔法自动签到任务&content={result_text}'
+                                session.get(push_url, timeout=5)
+                            except:
+                                pass
                     else:
-                        print(f"❌ 签到请求失败，状态码: {sign_response.status_code}")
-                        error_cookies.append(cookie)
-                        break
+                        logs.append(('print', f"✅ 签到请求已发送"))
+                else:
+                    logs.append(('print', f"❌ 签到请求失败，状态码: {sign_response.status_code}"))
                 
-                # 添加延迟避免请求过快
-                time.sleep(2)
+                outcome = punch_result.classify_sign(sign_response.status_code, result_text)
+                record['punches'].append({'id': match, 'outcome': outcome, 'text': result_text})
                 
-            except Exception as e:
-                self.logger.error(f"用户UID: {uid+1} 签到异常: {e}")
-                error_cookies.append(cookie)
+                if outcome in (punch_result.SIGNED, punch_result.ALREADY_SIGNED):
+                    self.punch_index.mark(account, class_id, match, outcome, result_text)
+                
+                if punch_result.is_retryable(outcome):
+                    break
+            
+            return self._finish_record(record, punch_result.merge_outcomes(
+                punch['outcome'] for punch in record['punches']
+            ))
+            
+        except Exception as e:
+            logs.append(('error', f"用户UID: {uid+1} 签到异常: {e}"))
+            return self._finish_record(record, punch_result.classify_exception(e))
+    
+    def _finish_record(self, record, outcome):
+        """写入账号的最终结果代码与状态"""
+        record['outcome'] = outcome
+        record['status'] = punch_result.status_for(outcome)
+        if record['status'] == 'failed':
+            label = punch_result.OUTCOME_LABELS.get(outcome, outcome)
+            record['logs'].append(('warning', f"用户UID: {record['uid']+1} {label}，本轮不再重试"))
+        return record
+    
+    def run_checkin(self, cookies_list):
+        """按配置选择签到引擎执行签到"""
+        engine = self.config.get('engine', 'sync')
         
-        return error_cookies, null_cookie
+        if engine == 'async':
+            if AsyncCheckinEngine.is_available():
+                async_engine = AsyncCheckinEngine(
+                    self.current_class(),
+                    self.config.get('lat', ''),
+                    self.config.get('lng', ''),
+                    self.config.get('acc', ''),
+                    concurrency=self.config.get('concurrency', 10),
+                    coord_offset=self.modify_decimal_part,
+                    push_token=self.config.get('pushplus', ''),
+                    rate_limiter=self.get_rate_limiter(),
+                    punch_index=self.punch_index,
+                    parser=self.get_page_parser(),
+                    logger=self.logger
+                )
+                self.logger.info(f"使用异步签到引擎，并发数: {async_engine.concurrency}")
+                self.rate_limiter.reset_stats()
+                result = async_engine.run(cookies_list)
+                self.last_results = async_engine.results
+                self._log_rate_limit_stats()
+                return result
+            
+            self.logger.warning("未安装aiohttp，回退到同步签到引擎")
+            print("⚠️ 未安装aiohttp，使用同步签到")
+        
+        return self.qiandao(cookies_list)
     
-    def job(self):
-        """签到任务（增强版）"""
+    def job(self, cookies=None):
+        """签到任务（增强版），cookies 为None时为全部账号签到"""
         current_time = datetime.now()
         print(f"\n🚀 开始执行签到任务，当前时间: {current_time.strftime('%Y-%m-%d %H:%M:%S')}")
         self.logger.info(f"开始执行签到任务")
         
-        # 刷新Cookie有效性
-        cookies = self.cookie_manager.refresh_cookies(self.config.get('cookie', []))
+        target_cookies = self.config.get('cookie', []) if cookies is None else cookies
+        
+        # 优先使用触发前后台预取的健康检查结果，预取未完成时直接签到，不再逐个验证
+        cookies = self.health_prefetch.take(target_cookies)
+        if cookies is not None:
+            print(f"✅ 使用预取的Cookie检查结果: 有效 {len(cookies)}/{len(target_cookies)}")
+        elif self.health_prefetch.is_running(target_cookies):
+            print("⏳ Cookie检查尚未完成，直接开始签到")
+            self.logger.info("Cookie健康检查预取未完成，跳过签到前验证")
+            cookies = list(target_cookies)
+        else:
+            # 刷新Cookie有效性
+            cookies = self.cookie_manager.refresh_cookies(target_cookies)
         
         if not cookies:
             print("❌ 没有有效的Cookie，请重新配置")
@@ -594,29 +855,34 @@ class EnhancedAutoCheckBJMF:
             return
         
         # 执行签到
-        error_cookies, null_cookie = self.qiandao(cookies)
+        error_cookies, null_cookie = self.run_checkin(cookies)
+        self._report_first_request_latency()
         
-        # 处理重试
-        retry_count = 0
-        max_retries = 2
-        retry_delays = [300, 900]  # 5分钟，15分钟
-        
-        while error_cookies and retry_count < max_retries:
-            delay = retry_delays[retry_count]
-            print(f"⏳ 检测到 {len(error_cookies)} 个Cookie签到失败，{delay//60}分钟后重试...")
-            self.logger.warning(f"重试队列: {len(error_cookies)} 个Cookie，等待 {delay} 秒")
-            
-            time.sleep(delay)
-            
-            print(f"🔄 开始第 {retry_count + 1} 次重试...")
-            error_cookies, _ = self.qiandao(error_cookies)
-            retry_count += 1
+        # 失败的Cookie进入延迟重试队列，由主循环按到期时间处理，不阻塞其他任务
+        self._configure_retry_queue()
+        retry_cookies = self._schedule_retries(error_cookies)
         
         # 签到结果统计
-        total_cookies = len(self.config.get('cookie', []))
-        success_count = total_cookies - len(error_cookies) - null_cookie
+        failed_results = [r for r in self.last_results if r['status'] == 'failed']
         
-        if error_cookies:
+        # 签到时发现登录失效的Cookie，其验证缓存不再可信
+        for record in failed_results:
+            if record['outcome'] == punch_result.EXPIRED_LOGIN:
+                self.cookie_manager.invalidate(record['cookie'])
+        total_cookies = len(target_cookies)
+        success_count = total_cookies - len(error_cookies) - null_cookie - len(failed_results)
+        
+        self._log_outcome_summary()
+        
+        if failed_results:
+            print(f"⚠️ 有 {len(failed_results)} 个账号本轮无法签到（如登录失效），不会重试")
+            self.logger.warning(f"不可重试的失败账号数量: {len(failed_results)}")
+        
+        if retry_cookies:
+            delay = self.retry_queue.delay_for(0)
+            print(f"⏳ 检测到 {len(retry_cookies)} 个Cookie签到失败，{delay / 60:g}分钟后重试...")
+            self.logger.warning(f"重试队列: {len(retry_cookies)} 个Cookie，等待 {delay:g} 秒")
+        elif error_cookies:
             print(f"❌ 仍有 {len(error_cookies)} 个Cookie签到失败，请检查Cookie是否过期")
             self.logger.error(f"最终失败Cookie数量: {len(error_cookies)}")
         elif null_cookie > 0:
@@ -629,12 +895,371 @@ class EnhancedAutoCheckBJMF:
         print(f"📊 签到统计: 成功 {success_count}/{total_cookies}")
         print("=" * 50)
         
-        # 更新Cookie存储
+        # 更新Cookie存储（等待重试的Cookie暂时保留，登录失效的Cookie移除）
         if success_count > 0:
-            valid_cookies = [c for c in self.config.get('cookie', []) if c not in error_cookies]
+            expired_cookies = [r['cookie'] for r in failed_results
+                               if r['outcome'] == punch_result.EXPIRED_LOGIN]
+            valid_cookies = [c for c in self.config.get('cookie', [])
+                             if (c not in error_cookies or c in self.retry_queue)
+                             and c not in expired_cookies]
             self.config['cookie'] = valid_cookies
             self.save_config()
     
+    def start_prewarm(self, job=None, deadline=None):
+        """在后台线程预热，不占用调度线程；上一次预热仍在进行时跳过"""
+        if self._prewarm_thread and self._prewarm_thread.is_alive():
+            self.logger.warning("上一次预热尚未结束，跳过本次预热")
+            return False
+        self._prewarm_thread = threading.Thread(target=self.prewarm, args=(job, deadline), daemon=True)
+        self._prewarm_thread.start()
+        return True
+    
+    def prewarm(self, job=None, deadline=None):
+        """定时任务触发前预热：解析域名、建立连接池中的连接并访问各账号会话
+        
+        deadline 为预热可用的秒数（即触发前的提前量），到时未访问的账号直接跳过，不拖延签到
+        """
+        if self.config.get('engine', 'sync') == 'async':
+            # 异步引擎使用自己的连接，预热同步连接池没有意义
+            self.logger.warning("异步签到引擎不使用连接池，跳过预热")
+            return
+        
+        class_id = (job or {}).get('class') or self.config.get('class', '')
+        cookies = select_cookies(self.config.get('cookie', []), (job or {}).get('accounts', []))
+        start = time.monotonic()
+        end = start + deadline if deadline else float('inf')
+        
+        try:
+            socket.getaddrinfo('k8n.cn', 80, proto=socket.IPPROTO_TCP)
+        except OSError as e:
+            self.logger.warning(f"预热DNS解析失败: {e}")
+        
+        # 并发访问各账号会话，同时建立与签到线程数相同的长连接
+        workers = max(1, int(self.config.get('workers', 1)))
+        if workers > self.session_pool.pool_maxsize:
+            self.session_pool.resize(workers)
+        session = self.session_pool.get_session()
+        rate_limiter = self.get_rate_limiter()
+        
+        def touch(cookie):
+            result = re.search(r'remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d=([^;]+)', cookie)
+            if not result:
+                return False
+            try:
+                # 限流等待会超出预热时限时不再占用令牌，留给到点的签到请求
+                if not rate_limiter.try_acquire(end - time.monotonic()):
+                    return False
+                response = session.get('http://k8n.cn/student',
+                                       headers=build_headers(class_id, result.group(0)),
+                                       timeout=min(10, max(0.1, end - time.monotonic())))
+                return response.status_code == 200
+            except Exception:
+                return False
+        
+        with ThreadPoolExecutor(max_workers=min(workers, max(1, len(cookies)))) as executor:
+            touched = sum(executor.map(touch, cookies))
+        
+        self._prewarmed_at = time.monotonic()
+        elapsed = (self._prewarmed_at - start) * 1000
+        print(f"🔥 预热完成: {touched}/{len(cookies)} 个账号会话，耗时 {elapsed:.0f} ms")
+        self.logger.info(f"预热完成: {touched}/{len(cookies)} 个账号会话，耗时 {elapsed:.0f} ms")
+        if time.monotonic() >= end:
+            self.logger.warning(f"预热超过 {deadline:g} 秒时限，部分账号未预热")
+    
+    def prefetch_cookie_health(self, job=None):
+        """定时任务触发前在后台验证任务账号的Cookie"""
+        cookies = select_cookies(self.config.get('cookie', []), (job or {}).get('accounts', []))
+        self.health_prefetch.max_age = float(self.config.get('health_prefetch', 0)) + 300
+        if self.health_prefetch.start(cookies):
+            self.logger.info(f"开始后台检查 {len(cookies)} 个Cookie")
+    
+    def _report_first_request_latency(self):
+        """记录本轮各账号首个请求的尾延迟，区分是否经过预热"""
+        latencies = [r['first_request_ms'] for r in self.last_results
+                     if r.get('first_request_ms') is not None]
+        
+        # 预热后一分钟内（加上预热提前量）触发的任务视为已预热
+        prewarm = float(self.config.get('prewarm', 0))
+        warm = self._prewarmed_at is not None and time.monotonic() - self._prewarmed_at <= prewarm + 60
+        self._prewarmed_at = None
+        if not latencies:
+            return
+        
+        tail = max(latencies)
+        self.first_request_tails['warm' if warm else 'cold'].append(tail)
+        
+        history = "，".join(
+            f"{label}平均 {sum(tails) / len(tails):.0f} ms（{len(tails)}次）"
+            for label, tails in (('已预热', self.first_request_tails['warm']),
+                                 ('未预热', self.first_request_tails['cold']))
+            if tails
+        )
+        self.logger.info(f"首个请求尾延迟（{'已预热' if warm else '未预热'}）: {tail:.0f} ms；{history}")
+    
+    def _schedule_recurring(self, next_time, func, name, job=None):
+        """加入重复定时任务，并按配置在触发前预热连接、后台检查Cookie"""
+        self.scheduler.call_recurring(next_time, func, name)
+        
+        prewarm = float(self.config.get('prewarm', 0))
+        if prewarm > 0:
+            offset = timedelta(seconds=prewarm)
+            self.scheduler.call_recurring(
+                lambda after: next_time(after + offset) - offset,
+                lambda: self.start_prewarm(job, prewarm),
+                f"{name}预热"
+            )
+        
+        health_prefetch = float(self.config.get('health_prefetch', 0))
+        if health_prefetch > 0:
+            offset = timedelta(seconds=health_prefetch)
+            self.scheduler.call_recurring(
+                lambda after: next_time(after + offset) - offset,
+                lambda: self.prefetch_cookie_health(job),
+                f"{name}Cookie检查"
+            )
+    
+    def _schedule_daily_job(self, schedule_time):
+        """加入每日定时签到"""
+        self._schedule_recurring(
+            lambda after: after + timedelta(seconds=PreciseScheduler.seconds_until(schedule_time, after)),
+            self.job,
+            "定时签到"
+        )
+    
+    def run_scheduled_job(self, job):
+        """执行配置中的一个计划任务：为绑定的账号组在指定班级签到"""
+        cookies = select_cookies(self.config.get('cookie', []), job['accounts'])
+        if not cookies:
+            print(f"⚠️ 计划任务 {job['name']} 没有匹配的账号")
+            self.logger.warning(f"计划任务 {job['name']} 没有匹配的账号: {job['accounts']}")
+            return
+        
+        print(f"\n📅 执行计划任务: {job['name']}")
+        self.logger.info(f"执行计划任务: {job['name']}，账号数: {len(cookies)}")
+        
+        self.active_class = job['class']
+        try:
+            self.job(cookies)
+        finally:
+            self.active_class = None
+    
+    def register_jobs(self):
+        """将配置中的计划任务加入调度器，返回任务列表"""
+        jobs = load_jobs(self.config.get('jobs', []))
+        for job in jobs:
+            self._schedule_recurring(
+                job['spec'].next_after,
+                lambda job=job: self.run_scheduled_job(job),
+                job['name'],
+                job
+            )
+        return jobs
+    
+    def _log_outcome_summary(self):
+        """按结果代码统计本轮各账号的签到结果"""
+        counts = {}
+        for record in self.last_results:
+            counts[record['outcome']] = counts.get(record['outcome'], 0) + 1
+        
+        if counts:
+            summary = "，".join(
+                f"{punch_result.OUTCOME_LABELS.get(outcome, outcome)} {count}"
+                for outcome, count in sorted(counts.items(), key=lambda item: -item[1])
+            )
+            print(f"📋 结果分类: {summary}")
+            self.logger.info(f"结果分类: {summary}")
+    
+    def _configure_retry_queue(self):
+        """按配置更新重试队列的退避参数"""
+        self.retry_queue.base_delay = float(self.config.get('retry_delay', 300))
+        self.retry_queue.backoff = float(self.config.get('retry_backoff', 3))
+        self.retry_queue.max_retries = int(self.config.get('max_retries', 2))
+    
+    def _schedule_retries(self, cookies, attempt=0):
+        """将失败的Cookie加入重试队列，返回成功入队的Cookie"""
+        scheduled = [cookie for cookie in cookies
+                     if self.retry_queue.schedule(cookie, attempt=attempt,
+                                                  class_id=self.active_class) is not None]
+        self._sync_retry_event()
+        return scheduled
+    
+    def _sync_retry_event(self):
+        """让调度器在重试队列最早到期时执行重试"""
+        due = self.retry_queue.next_due()
+        if self._retry_event and (due is None or self._retry_event['due'] != due):
+            self.scheduler.cancel(self._retry_event)
+            self._retry_event = None
+        if due is not None and self._retry_event is None:
+            self._retry_event = self.scheduler.call_at(due, self._run_retry_event, "重试签到")
+    
+    def _run_retry_event(self):
+        """调度器触发的重试事件"""
+        self._retry_event = None
+        self.process_retries()
+        self._sync_retry_event()
+    
+    def process_retries(self):
+        """执行所有已到期的重试任务"""
+        tasks = self.retry_queue.pop_due()
+        if not tasks:
+            return
+        
+        attempts = {task['cookie']: task['attempt'] for task in tasks}
+        
+        print(f"\n🔄 开始重试 {len(attempts)} 个Cookie...")
+        self.logger.info(f"执行重试: {len(attempts)} 个Cookie")
+        
+        # 按签到时的班级分组重试，计划任务指定的班级保持不变
+        groups = {}
+        for task in tasks:
+            groups.setdefault(task.get('class_id'), []).append(task['cookie'])
+        
+        error_cookies = []
+        error_classes = {}
+        for class_id, cookies in groups.items():
+            self.active_class = class_id
+            try:
+                group_errors, _ = self.run_checkin(cookies)
+            finally:
+                self.active_class = None
+            error_cookies.extend(group_errors)
+            error_classes.update((cookie, class_id) for cookie in group_errors)
+        
+        # 每个账号按自己的重试次数退避，重试次数用尽的不再入队
+        exhausted = []
+        for cookie in error_cookies:
+            next_attempt = attempts[cookie] + 1
+            if self.retry_queue.schedule(cookie, attempt=next_attempt,
+                                         class_id=error_classes[cookie]) is None:
+                exhausted.append(cookie)
+            else:
+                delay = self.retry_queue.delay_for(next_attempt)
+                self.logger.warning(f"Cookie第 {next_attempt + 1} 次重试将在 {delay:g} 秒后执行")
+        
+        if len(exhausted) < len(error_cookies):
+            print(f"⏳ 仍有 {len(error_cookies) - len(exhausted)} 个Cookie签到失败，稍后再次重试")
+        
+        if exhausted:
+            print(f"❌ 仍有 {len(exhausted)} 个Cookie签到失败，请检查Cookie是否过期")
+            self.logger.error(f"最终失败Cookie数量: {len(exhausted)}")
+            
+            # 至少保留一个Cookie，避免网络故障时清空配置
+            remaining = [c for c in self.config.get('cookie', []) if c not in exhausted]
+            if remaining:
+                self.config['cookie'] = remaining
+                self.save_config()
+        elif not error_cookies:
+            print("🎉 重试签到成功！")
+            self.logger.info("重试签到全部成功")
+    
+    def wait_for_retries(self):
+        """手动模式下等待并执行剩余的重试任务"""
+        while len(self.retry_queue):
+            wait = self.retry_queue.seconds_until_due()
+            if wait:
+                print(f"⏳ 等待 {wait:.0f} 秒后执行重试...")
+                time.sleep(wait)
+            self.process_retries()
+    
+    def _watch_interval(self):
+        """监视模式的轮询间隔（秒），沿用配置中的 time 字段"""
+        interval = float(self.config.get('time', 0) or 30)
+        return max(5.0, interval)
+    
+    def _fetch_punch_ids(self, session, cookies):
+        """用第一个可用账号获取签到页面，返回进行中的签到ID；无法获取时返回None"""
+        class_id = self.config.get('class', '')
+        url = f'http://k8n.cn/student/course/{class_id}/punchs'
+        
+        for cookie in cookies:
+            result = re.search(r'remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d=([^;]+)', cookie)
+            if not result:
+                continue
+            
+            try:
+                self.get_rate_limiter().acquire()
+                response = self._fetch(session, 'GET', url, punch_page_decided,
+                                       headers=build_headers(class_id, result.group(0)), timeout=10)
+            except Exception as e:
+                self.logger.warning(f"轮询签到页面失败: {e}")
+                return None
+            
+            key = (class_id, SignedPunchIndex.account_key(cookie))
+            page = self.get_page_parser().parse_page(response.text, key=key) if response.status_code == 200 else None
+            outcome = punch_result.classify_page(response.status_code, page['title'] if page else None)
+            if outcome in (punch_result.EXPIRED_LOGIN, punch_result.CLIENT_ERROR):
+                continue
+            if outcome:
+                self.logger.warning(f"轮询签到页面失败: {punch_result.OUTCOME_LABELS.get(outcome, outcome)}")
+                return None
+            
+            return punch_ids(page)
+        
+        self.logger.error("没有可用于轮询的Cookie")
+        return None
+    
+    def poll_once(self, watcher):
+        """轮询一次签到页面，发现新签到时立即为所有账号签到"""
+        cookies = self.config.get('cookie', [])
+        punch_ids = self._fetch_punch_ids(self.session_pool.get_session(), cookies)
+        if punch_ids is None:
+            return []
+        
+        new_ids = watcher.observe(punch_ids)
+        if not new_ids:
+            return []
+        
+        print(f"\n👀 发现新的签到任务: {', '.join(new_ids)}，立即签到")
+        self.logger.info(f"监视模式发现新签到: {new_ids}")
+        
+        # 记录签到出现时间，用于推算之后的轮询窗口
+        self.punch_history.record(self.config.get('class', ''))
+        self.punch_history.save()
+        
+        error_cookies, _ = self.run_checkin(cookies)
+        self._configure_retry_queue()
+        self._schedule_retries(error_cookies)
+        self._log_outcome_summary()
+        
+        for punch_id in new_ids:
+            latency = watcher.mark_signed(punch_id)
+            print(f"⏱️ 签到任务 {punch_id} 从发现到签到完成耗时 {latency:.2f} 秒")
+            self.logger.info(f"签到任务 {punch_id} 发现到签到延迟: {latency:.2f} 秒")
+        
+        return new_ids
+    
+    def _build_poll_policy(self):
+        """根据签到历史与课表生成自适应轮询策略"""
+        interval = self._watch_interval()
+        if not self.config.get('watch_adaptive', True):
+            return AdaptivePollPolicy(base_interval=interval)
+        
+        return AdaptivePollPolicy(
+            windows=self.punch_history.windows(self.config.get('class', '')),
+            timetable=parse_timetable(self.config.get('timetable', [])),
+            bucket_minutes=self.punch_history.bucket_minutes,
+            base_interval=interval,
+            max_interval=float(self.config.get('watch_max_interval', 600))
+        )
+    
+    def watch(self):
+        """监视模式：按间隔轮询签到页面，同时处理定时任务与重试"""
+        watcher = PunchWatcher(self._watch_interval())
+        policy = self._build_poll_policy()
+        print(f"👀 监视模式，轮询间隔: {watcher.interval:g} 秒")
+        self.logger.info(f"进入监视模式，轮询间隔: {watcher.interval:g} 秒")
+        if policy.has_windows:
+            print(f"📈 已启用自适应轮询，签到窗口外间隔最长 {policy.max_interval:g} 秒")
+        
+        def poll():
+            nonlocal policy
+            if self.poll_once(watcher):
+                policy = self._build_poll_policy()
+            self.scheduler.call_later(policy.next_interval(), poll, "轮询签到页面")
+        
+        self.scheduler.call_later(0, poll, "轮询签到页面")
+        self.scheduler.run_forever()
+    
     def run(self):
         """主运行函数"""
         try:
@@ -645,23 +1270,44 @@ class EnhancedAutoCheckBJMF:
             
             print("🎯 程序启动成功！")
             
+            self.cookie_manager.validation_ttl = float(
+                self.config.get('validation_ttl', self.cookie_manager.validation_ttl)
+            )
+            self.cookie_manager.max_workers = int(
+                self.config.get('validation_workers', self.cookie_manager.max_workers)
+            )
+            self.cookie_manager.deadline = float(
+                self.config.get('validation_deadline', self.cookie_manager.deadline)
+            )
+            self.cookie_manager.storage.flush_delay = float(self.config.get('flush_delay', 1.0))
+            
             # 检查定时设置
             schedule_time = self.config.get('scheduletime', '')
             
-            if schedule_time:
-                print(f"⏰ 定时签到模式，设定时间: {schedule_time}")
-                
-                # 设置定时任务
-                schedule.every().day.at(schedule_time).do(self.job)
-                
-                print(f"⏳ 等待定时时间到达...")
+            # 所有计划任务共用一个调度器，由同一个循环按到期顺序执行
+            jobs = self.register_jobs()
+            for job in jobs:
+                print(f"📅 计划任务 {job['name']}: 下次执行 {job['spec'].next_after(datetime.now()):%Y-%m-%d %H:%M}")
+            
+            if self.config.get('watch', False):
+                if schedule_time:
+                    self._schedule_daily_job(schedule_time)
+                self.watch()
+            elif schedule_time or jobs:
+                if schedule_time:
+                    print(f"⏰ 定时签到模式，设定时间: {schedule_time}")
+                    
+                    # 设置定时任务，调度器休眠到到期时刻，重试任务也作为调度事件执行
+                    self._schedule_daily_job(schedule_time)
+                    
+                    remaining = int(PreciseScheduler.seconds_until(schedule_time))
+                    print(f"⏳ 等待定时时间到达，还剩 {remaining // 3600} 小时 {remaining % 3600 // 60} 分钟")
                 
-                while True:
-                    schedule.run_pending()
-                    time.sleep(60)  # 每分钟检查一次
+                self.scheduler.run_forever()
             else:
                 print("🚀 手动签到模式，立即执行")
                 self.job()
+                self.wait_for_retries()
                 input("\n✅ 手动签到已完成，按回车键退出...")
         
         except KeyboardInterrupt:
@@ -670,6 +1316,8 @@ class EnhancedAutoCheckBJMF:
             self.logger.error(f"程序运行异常: {e}")
             print(f"❌ 程序运行异常: {e}")
         finally:
+            self.cookie_manager.storage.flush()
+            self.session_pool.close()
             print("👋 程序结束")
 
 
@@ -0,0 +1,180 @@
+"""
+账号记录存储模块
+基于SQLite的按账号加密存储，每个账号一行，按账号ID与状态建立索引；
+单个账号的更新只改写该行，账号数量增长时存储开销保持平稳
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+from cryptography.fernet import Fernet
+
+
+class AccountStore:
+    """账号记录存储 - 记录内容用Fernet加密，状态与更新时间明文保存以便索引查询"""
+
+    def __init__(self, db_file: str, cipher: Fernet):
+        self.db_file = db_file
+        self.cipher = cipher
+        self._lock = threading.RLock()
+        self._depth = 0
+
+        os.makedirs(os.path.dirname(self.db_file) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(self.db_file, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS accounts ("
+            " account_id TEXT PRIMARY KEY,"
+            " status TEXT NOT NULL DEFAULT 'unknown',"
+            " updated_at REAL NOT NULL,"
+            " payload BLOB NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_accounts_status ON accounts(status)")
+
+        # 设置文件权限（仅所有者可读写）
+        if os.name != 'nt':
+            os.chmod(self.db_file, 0o600)
+
+    def _encrypt(self, record: Dict) -> bytes:
+        return self.cipher.encrypt(json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+    def _decrypt(self, payload: bytes) -> Dict:
+        return json.loads(self.cipher.decrypt(payload).decode('utf-8'))
+
+    @contextmanager
+    def transaction(self):
+        """批量写入事务，块内的全部写入一起提交，出现异常时整体回滚；可嵌套"""
+        with self._lock:
+            if self._depth == 0:
+                self._conn.execute("BEGIN")
+            self._depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._conn.execute("ROLLBACK")
+                raise
+            else:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._conn.execute("COMMIT")
+
+    def put(self, account_id: str, record: Dict, status: str = 'unknown'):
+        """写入或覆盖单个账号的记录"""
+        with self.transaction():
+            self._conn.execute(
+                "INSERT OR REPLACE INTO accounts (account_id, status, updated_at, payload) VALUES (?, ?, ?, ?)",
+                (account_id, status, time.time(), self._encrypt(record))
+            )
+
+    def put_many(self, items: Iterable[Tuple[str, Dict, str]]):
+        """在一个事务内写入多个 (账号ID, 记录, 状态)"""
+        with self.transaction():
+            for account_id, record, status in items:
+                self.put(account_id, record, status)
+
+    def update_status(self, account_id: str, status: str) -> bool:
+        """只更新账号状态与更新时间，不重新加密记录；账号不存在时返回False"""
+        with self.transaction():
+            cursor = self._conn.execute(
+                "UPDATE accounts SET status = ?, updated_at = ? WHERE account_id = ?",
+                (status, time.time(), account_id)
+            )
+            return cursor.rowcount > 0
+
+    def get(self, account_id: str) -> Optional[Dict]:
+        """读取单个账号的记录"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM accounts WHERE account_id = ?", (account_id,)
+            ).fetchone()
+        return self._decrypt(row[0]) if row else None
+
+    def status(self, account_id: str) -> Optional[str]:
+        """读取单个账号的状态"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status FROM accounts WHERE account_id = ?", (account_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def delete(self, account_id: str) -> bool:
+        """删除单个账号"""
+        with self.transaction():
+            return self._conn.execute("DELETE FROM accounts WHERE account_id = ?", (account_id,)).rowcount > 0
+
+    def clear(self):
+        """删除全部账号"""
+        with self.transaction():
+            self._conn.execute("DELETE FROM accounts")
+
+    def iter_records(self, status: str = None, batch_size: int = 200) -> Iterator[Tuple[str, str, Dict]]:
+        """按账号ID顺序分批读取 (账号ID, 状态, 记录)，可按状态筛选，不一次性加载全部账号"""
+        last_id = ''
+        while True:
+            query = "SELECT account_id, status, payload FROM accounts WHERE account_id > ?"
+            params = [last_id]
+            if status is not None:
+                query += " AND status = ?"
+                params.append(status)
+            query += " ORDER BY account_id LIMIT ?"
+            params.append(batch_size)
+
+            with self._lock:
+                rows = self._conn.execute(query, params).fetchall()
+            if not rows:
+                return
+            for account_id, row_status, payload in rows:
+                yield account_id, row_status, self._decrypt(payload)
+            last_id = rows[-1][0]
+
+    def count(self, status: str = None) -> int:
+        """账号数量，可按状态筛选"""
+        with self._lock:
+            if status is None:
+                return self._conn.execute("SELECT COUNT(*) FROM accounts").fetchone()[0]
+            return self._conn.execute("SELECT COUNT(*) FROM accounts WHERE status = ?", (status,)).fetchone()[0]
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self):
+        return self.count()
+
+
+def test_account_store():
+    """对比单个账号更新时整体加密与按行存储的耗时"""
+    import tempfile
+    temp_dir = tempfile.mkdtemp()
+    cipher = Fernet(Fernet.generate_key())
+    store = AccountStore(os.path.join(temp_dir, "accounts.db"), cipher)
+
+    accounts = {f"{i:06d}": {'cookie': f"remember_student=token{i}", 'remark': f"用户{i}"} for i in range(2000)}
+    store.put_many((account_id, record, 'valid') for account_id, record in accounts.items())
+
+    start = time.perf_counter()
+    for i in range(100):
+        cipher.encrypt(json.dumps({'accounts': accounts}, ensure_ascii=False, indent=2).encode('utf-8'))
+    blob_ms = (time.perf_counter() - start) * 10
+
+    start = time.perf_counter()
+    for i in range(100):
+        store.update_status(f"{i:06d}", 'invalid')
+    row_ms = (time.perf_counter() - start) * 10
+
+    print(f"账号数: {len(store)}，失效账号: {store.count('invalid')}")
+    print(f"整体加密单次更新: {blob_ms:.2f} ms，按行更新: {row_ms:.2f} ms")
+    print(f"第一个失效账号: {next(store.iter_records('invalid'))[0]}")
+    store.close()
+
+
+if __name__ == "__main__":
+    test_account_store()
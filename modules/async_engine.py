@@ -0,0 +1,219 @@
+"""
+异步签到引擎模块
+基于asyncio并发处理多个账号的签到，适用于账号数量较多、签到窗口较短的场景
+"""
+import asyncio
+import logging
+import re
+from typing import Callable, Dict, List, Tuple
+
+from modules import punch_result
+from modules.http_session import build_headers
+from modules.punch_index import SignedPunchIndex
+from modules.punch_parser import PunchParser, punch_ids
+from modules.rate_limiter import TokenBucket
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+COOKIE_PATTERN = re.compile(r'remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d=([^;]+)')
+USERNAME_PATTERN = re.compile(r'username=([^;]+)')
+
+
+class AsyncCheckinEngine:
+    """异步签到引擎 - 在有界并发下同时为多个账号签到"""
+
+    def __init__(self, class_id: str, lat: str, lng: str, acc: str,
+                 concurrency: int = 10, timeout: int = 10,
+                 coord_offset: Callable = None, push_token: str = '',
+                 rate_limiter: TokenBucket = None, punch_index: SignedPunchIndex = None,
+                 parser: PunchParser = None, logger: logging.Logger = None):
+        self.class_id = class_id
+        self.lat = lat
+        self.lng = lng
+        self.acc = acc
+        self.concurrency = max(1, int(concurrency))
+        self.timeout = timeout
+        self.coord_offset = coord_offset or float
+        self.push_token = push_token
+        self.rate_limiter = rate_limiter
+        self.punch_index = punch_index
+        self.parser = parser or PunchParser()
+        self.logger = logger or logging.getLogger('AutoCheckBJMF')
+        self.results = []
+
+    @staticmethod
+    def is_available() -> bool:
+        """检查异步HTTP依赖是否可用"""
+        return aiohttp is not None
+
+    def run(self, cookies_list: List[str]) -> Tuple[List[str], int]:
+        """执行签到，返回 (失败Cookie列表, 格式错误Cookie数量)"""
+        if not self.is_available():
+            raise RuntimeError("未安装aiohttp，无法使用异步签到引擎")
+
+        if not all([self.class_id, self.lat, self.lng, self.acc]):
+            self.logger.error("配置信息不完整，无法执行签到")
+            return [], 1
+
+        result = asyncio.run(self._run_all(cookies_list))
+        if self.punch_index is not None:
+            self.punch_index.save()
+        return result
+
+    async def _run_all(self, cookies_list: List[str]) -> Tuple[List[str], int]:
+        """并发执行所有账号的签到"""
+        # 连接数与并发数一致，保证同一时刻对k8n.cn的请求数有上限
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrency,
+            limit_per_host=self.concurrency,
+            ttl_dns_cache=300
+        )
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                         cookie_jar=aiohttp.DummyCookieJar()) as session:
+            self.results = await asyncio.gather(*[
+                self._sign_account(session, semaphore, uid, cookie)
+                for uid, cookie in enumerate(cookies_list)
+            ])
+
+        error_cookies = [r['cookie'] for r in self.results if r['status'] == 'error']
+        null_cookie = sum(1 for r in self.results if r['status'] == 'null')
+        return error_cookies, null_cookie
+
+    async def _request(self, session, method: str, url: str, **kwargs) -> Tuple[int, str]:
+        """发送请求并返回 (状态码, 响应文本)"""
+        if self.rate_limiter and url.startswith('http://k8n.cn'):
+            await self.rate_limiter.acquire_async()
+        async with session.request(method, url, **kwargs) as response:
+            return response.status, await response.text()
+
+    async def _sign_account(self, session, semaphore: asyncio.Semaphore,
+                            uid: int, cookie: str) -> Dict:
+        """为单个账号签到，返回该账号的结果记录"""
+        record = {
+            'uid': uid,
+            'cookie': cookie,
+            'status': 'ok',
+            'outcome': punch_result.NO_PUNCH,
+            'punches': []
+        }
+
+        result = USERNAME_PATTERN.search(cookie)
+        username_string = f" <{result.group(1)}>" if result else ""
+        label = f"用户UID: {uid+1}{username_string}"
+
+        result = COOKIE_PATTERN.search(cookie)
+        if not result:
+            print(f"❌ {label} Cookie格式错误")
+            return self._finish_record(record, punch_result.INVALID_COOKIE)
+
+        headers = build_headers(self.class_id, result.group(0))
+        url = f'http://k8n.cn/student/course/{self.class_id}/punchs'
+
+        async with semaphore:
+            try:
+                self.logger.info(f"{label} 开始签到")
+
+                status, text = await self._request(session, 'GET', url, headers=headers)
+                if status != 200:
+                    print(f"❌ {label} 请求失败，状态码: {status}")
+                    return self._finish_record(record, punch_result.classify_page(status, None))
+
+                account = SignedPunchIndex.account_key(cookie)
+                page = self.parser.parse_page(text, key=(self.class_id, account))
+                outcome = punch_result.classify_page(status, page['title'])
+                if outcome:
+                    print(f"❌ {label} 登录状态异常")
+                    self.logger.error(f"{label} 登录状态异常")
+                    return self._finish_record(record, outcome)
+
+                all_matches = punch_ids(page)
+
+                if not all_matches:
+                    print(f"ℹ️ {label} 未找到进行中的签到任务")
+                    return self._finish_record(record, punch_result.NO_PUNCH)
+
+                print(f"📍 {label} 找到签到任务: GPS({len(page['gps'])}) 扫码({len(page['qr'])})")
+
+                for match in all_matches:
+                    # 本地索引中已完成的签到不再重复提交
+                    if self.punch_index is not None and self.punch_index.is_signed(account, self.class_id, match):
+                        print(f"⏭️ {label} 签到任务 {match} 已完成，跳过")
+                        record['punches'].append({'id': match, 'outcome': punch_result.ALREADY_SIGNED, 'text': None})
+                        continue
+
+                    sign_url = f"http://k8n.cn/student/punchs/course/{self.class_id}/{match}"
+                    payload = {
+                        'id': match,
+                        'lat': self.coord_offset(self.lat),
+                        'lng': self.coord_offset(self.lng),
+                        'acc': self.acc,
+                        'res': '',
+                        'gps_addr': ''
+                    }
+
+                    status, text = await self._request(session, 'POST', sign_url,
+                                                       headers=headers, data=payload)
+
+                    result_text = None
+                    if status == 200:
+                        result_text = self.parser.parse_sign_result(text)
+                        if result_text is not None:
+                            print(f"✅ {label} 签到结果: {result_text}")
+                            self.logger.info(f"{label} 签到结果: {result_text}")
+
+                            if self.push_token and result_text == "签到成功":
+                                try:
+                                    push_url = f'http://www.pushplus.plus/send?token={self.push_token}&title=班级魔法自动签到任务&content={result_text}'
+                                    await self._request(session, 'GET', push_url)
+                                except Exception:
+                                    pass
+                        else:
+                            print(f"✅ {label} 签到请求已发送")
+                    else:
+                        print(f"❌ {label} 签到请求失败，状态码: {status}")
+
+                    outcome = punch_result.classify_sign(status, result_text)
+                    record['punches'].append({'id': match, 'outcome': outcome, 'text': result_text})
+
+                    if self.punch_index is not None and outcome in (punch_result.SIGNED, punch_result.ALREADY_SIGNED):
+                        self.punch_index.mark(account, self.class_id, match, outcome, result_text)
+
+                    if punch_result.is_retryable(outcome):
+                        break
+
+                return self._finish_record(record, punch_result.merge_outcomes(
+                    punch['outcome'] for punch in record['punches']
+                ))
+
+            except Exception as e:
+                self.logger.error(f"{label} 签到异常: {e}")
+                return self._finish_record(record, punch_result.classify_exception(e))
+
+    @staticmethod
+    def _finish_record(record: Dict, outcome: str) -> Dict:
+        """写入账号的最终结果代码与状态"""
+        record['outcome'] = outcome
+        record['status'] = punch_result.status_for(outcome)
+        return record
+
+
+def test_async_engine():
+    """测试异步签到引擎"""
+    if not AsyncCheckinEngine.is_available():
+        print("❌ 未安装aiohttp")
+        return
+
+    engine = AsyncCheckinEngine('12345', '39.90469700', '116.40717800', '100', concurrency=5)
+    error_cookies, null_cookie = engine.run(['invalid_cookie'])
+    print(f"失败: {len(error_cookies)} 格式错误: {null_cookie}")
+
+
+if __name__ == "__main__":
+    test_async_engine()
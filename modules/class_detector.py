@@ -5,17 +5,19 @@
 import requests
 import re
 import json
-from bs4 import BeautifulSoup
 from typing import List, Dict, Optional
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
 
+from modules.punch_parser import PunchParser
+
 
 class ClassDetector:
     """班级ID检测器 - 自动检测和获取班级ID"""
     
-    def __init__(self):
+    def __init__(self, parser: PunchParser = None):
         self.base_url = "http://k8n.cn"
+        self.parser = parser or PunchParser('html.parser')
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
@@ -43,7 +45,7 @@ class ClassDetector:
             if response.status_code != 200:
                 return []
             
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = self.parser.soup(response.text)
             classes = []
             
             # 查找课程链接
@@ -78,7 +80,7 @@ class ClassDetector:
         try:
             response = self.session.get(f"{self.base_url}/student/course/{class_id}")
             if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
+                soup = self.parser.soup(response.text)
                 
                 # 提取班级详细信息
                 details = {
@@ -132,7 +134,7 @@ class ClassDetector:
             response = self.session.post(search_url, data={'keyword': keyword})
             
             if response.status_code == 200:
-                soup = BeautifulSoup(response.text, 'html.parser')
+                soup = self.parser.soup(response.text)
                 classes = []
                 
                 # 解析搜索结果
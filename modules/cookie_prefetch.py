@@ -0,0 +1,89 @@
+"""
+Cookie健康检查预取模块
+在定时任务触发前于后台线程验证Cookie，任务触发时直接使用已知有效的账号集合
+"""
+import threading
+import time
+from typing import Callable, List, Optional
+
+
+class CookieHealthPrefetch:
+    """Cookie健康检查预取 - 每次预取结果只被使用一次，超过 max_age 秒作废"""
+
+    def __init__(self, refresh: Callable[[List[str]], List[str]], max_age: float = 600):
+        self.refresh = refresh
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._thread = None
+        self._cookies = None
+        self._valid = None
+        self._finished_at = None
+
+    def start(self, cookies: List[str]) -> bool:
+        """在后台开始验证，已有相同Cookie集合的预取在进行时返回False"""
+        key = tuple(cookies)
+        with self._lock:
+            if self._thread and self._thread.is_alive() and self._cookies == key:
+                return False
+            self._cookies = key
+            self._valid = None
+            self._finished_at = None
+            self._thread = threading.Thread(target=self._run, args=(key,), daemon=True)
+            self._thread.start()
+        return True
+
+    def _run(self, key):
+        try:
+            valid = self.refresh(list(key))
+        except Exception as e:
+            print(f"Cookie健康检查预取失败: {e}")
+            return
+
+        with self._lock:
+            # 预取期间可能已开始了另一组Cookie的预取
+            if self._cookies == key:
+                self._valid = valid
+                self._finished_at = time.monotonic()
+
+    def is_running(self, cookies: List[str]) -> bool:
+        """该Cookie集合的预取是否仍在进行"""
+        with self._lock:
+            return bool(self._thread and self._thread.is_alive() and self._cookies == tuple(cookies))
+
+    def take(self, cookies: List[str]) -> Optional[List[str]]:
+        """取出该Cookie集合的预取结果，没有可用结果时返回None"""
+        with self._lock:
+            if self._cookies != tuple(cookies) or self._finished_at is None:
+                return None
+            if time.monotonic() - self._finished_at > self.max_age:
+                return None
+
+            valid = self._valid
+            self._cookies = None
+            self._valid = None
+            self._finished_at = None
+            return valid
+
+    def wait(self, timeout: float = None):
+        """等待当前预取完成"""
+        thread = self._thread
+        if thread:
+            thread.join(timeout)
+
+
+def test_cookie_prefetch():
+    """测试Cookie健康检查预取"""
+    def slow_refresh(cookies):
+        time.sleep(0.1)
+        return [c for c in cookies if 'valid' in c]
+
+    prefetch = CookieHealthPrefetch(slow_refresh)
+    cookies = ['valid_a', 'expired_b']
+    prefetch.start(cookies)
+    print(f"预取进行中: {prefetch.is_running(cookies)}")
+    prefetch.wait()
+    print(f"预取结果: {prefetch.take(cookies)}")
+
+
+if __name__ == "__main__":
+    test_cookie_prefetch()
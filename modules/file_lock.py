@@ -0,0 +1,103 @@
+"""
+跨进程文件锁模块
+为安全存储与config.json提供读写锁：读锁之间互不阻塞，写锁互斥；
+POSIX使用fcntl.flock，Windows使用msvcrt（不支持共享锁，读锁退化为互斥锁）
+"""
+import os
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+
+class FileLock:
+    """读写文件锁 - 锁定与目标文件同目录的 .lock 文件，不影响目标文件的原子替换"""
+
+    def __init__(self, path: str, timeout: float = 10, poll: float = 0.05):
+        self.lock_file = f"{path}.lock"
+        self.timeout = timeout
+        self.poll = poll
+
+    def _open(self) -> int:
+        os.makedirs(os.path.dirname(os.path.abspath(self.lock_file)), exist_ok=True)
+        return os.open(self.lock_file, os.O_RDWR | os.O_CREAT, 0o600)
+
+    def _try_lock(self, fd: int, exclusive: bool) -> bool:
+        try:
+            if fcntl:
+                fcntl.flock(fd, (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except (BlockingIOError, PermissionError, OSError):
+            return False
+
+    def _unlock(self, fd: int):
+        if fcntl:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        else:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+    @contextmanager
+    def _acquire(self, exclusive: bool):
+        fd = self._open()
+        try:
+            deadline = time.monotonic() + self.timeout
+            while not self._try_lock(fd, exclusive):
+                if time.monotonic() >= deadline:
+                    raise TimeoutError(f"等待文件锁超时: {self.lock_file}")
+                time.sleep(self.poll)
+            try:
+                yield
+            finally:
+                self._unlock(fd)
+        finally:
+            os.close(fd)
+
+    def shared(self):
+        """读锁，多个读者可同时持有"""
+        return self._acquire(False)
+
+    def exclusive(self):
+        """写锁，与其他读锁、写锁互斥"""
+        return self._acquire(True)
+
+
+def test_file_lock():
+    """测试读锁共享、写锁互斥"""
+    import tempfile
+    import threading
+    path = os.path.join(tempfile.mkdtemp(), "config.json")
+    lock = FileLock(path, timeout=0.2)
+
+    with lock.shared(), FileLock(path).shared():
+        print("两个读锁可同时持有")
+        try:
+            with lock.exclusive():
+                pass
+        except TimeoutError as e:
+            print(f"持有读锁时写锁等待: {e}")
+
+    order = []
+
+    def writer(name):
+        with FileLock(path).exclusive():
+            order.append(f"{name}开始")
+            time.sleep(0.05)
+            order.append(f"{name}结束")
+
+    threads = [threading.Thread(target=writer, args=(f"写者{i}",)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    print(f"写锁串行: {order}")
+
+
+if __name__ == "__main__":
+    test_file_lock()
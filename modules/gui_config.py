@@ -12,7 +12,8 @@ try:
     from .browser_cookie_extractor import BrowserCookieExtractor
     from .auto_login import AutoLogin
     from .class_detector import ClassDetector
-    from .secure_storage import CookieManager
+    from .secure_storage import CookieManager, atomic_write
+    from .file_lock import FileLock
 except ImportError:
     # 如果作为独立模块运行，使用绝对导入
     import sys
@@ -22,7 +23,8 @@ except ImportError:
     from modules.browser_cookie_extractor import BrowserCookieExtractor
     from modules.auto_login import AutoLogin
     from modules.class_detector import ClassDetector
-    from modules.secure_storage import CookieManager
+    from modules.secure_storage import CookieManager, atomic_write
+    from modules.file_lock import FileLock
 
 
 class ConfigWizard:
@@ -668,8 +670,8 @@ class ConfigWizard:
             # 保存到传统配置文件（兼容性）
             import os
             config_path = os.path.join(os.getcwd(), "config.json")
-            with open(config_path, 'w', encoding='utf-8') as f:
-                json.dump(final_config, f, indent=4, ensure_ascii=False)
+            with FileLock(config_path).exclusive():
+                atomic_write(config_path, json.dumps(final_config, indent=4, ensure_ascii=False).encode('utf-8'))
             
             self.config_data['final_config'] = final_config
             
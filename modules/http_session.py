@@ -0,0 +1,154 @@
+"""
+HTTP会话池模块
+为签到流程提供共享的长连接会话，避免每次请求重新建立TCP连接
+"""
+import codecs
+import threading
+from http import cookiejar
+from typing import Callable, Dict, NamedTuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class _NoCookiePolicy(cookiejar.DefaultCookiePolicy):
+    """拒绝写入会话Cookie罐，多账号共用连接时避免Cookie串号"""
+
+    def set_ok(self, cookie, request):
+        return False
+
+    def return_ok(self, cookie, request):
+        return False
+
+
+class SessionPool:
+    """会话池 - 管理带连接池的共享requests会话"""
+
+    def __init__(self, pool_connections: int = 4, pool_maxsize: int = 10,
+                 max_retries: int = 0):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.max_retries = max_retries
+        self._session = None
+        self._lock = threading.Lock()
+
+    def _create_session(self) -> requests.Session:
+        """创建挂载了有界连接池的会话"""
+        session = requests.Session()
+
+        # 每个主机最多保持 pool_maxsize 个长连接，超出时阻塞等待空闲连接
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_connections,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=self.max_retries,
+            pool_block=True
+        )
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        # Cookie通过请求头按账号传入，会话本身不保存任何Cookie
+        session.cookies.set_policy(_NoCookiePolicy())
+        session.headers.update({'Connection': 'keep-alive'})
+
+        return session
+
+    def get_session(self) -> requests.Session:
+        """获取共享会话（首次调用时创建）"""
+        with self._lock:
+            if self._session is None:
+                self._session = self._create_session()
+            return self._session
+
+    def resize(self, pool_maxsize: int):
+        """调整连接池大小，已有会话会在下次获取时重建"""
+        with self._lock:
+            if pool_maxsize == self.pool_maxsize:
+                return
+            self.pool_maxsize = pool_maxsize
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+    def close(self):
+        """关闭会话并释放所有连接"""
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+                self._session = None
+
+
+class StreamedPage(NamedTuple):
+    """流式读取的页面，complete 为False表示读到足以判断结果时提前停止"""
+    status_code: int
+    text: str
+    complete: bool
+    bytes_read: int
+
+
+def fetch_streaming(session: requests.Session, method: str, url: str,
+                    decided: Callable[[str], bool] = None, chunk_size: int = 4096,
+                    tail_limit: int = 32768, **kwargs) -> StreamedPage:
+    """边下载边检查页面，decided(已读文本) 为True时停止解码
+
+    提前停止后最多再读取 tail_limit 字节把响应读完，使连接能回到连接池；
+    剩余内容更多时直接关闭连接，避免为复用连接下载整个页面
+    """
+    response = getattr(session, method.lower())(url, stream=True, **kwargs)
+    try:
+        if response.status_code != 200:
+            # 非200的响应不需要内容
+            _drain(response, chunk_size, tail_limit)
+            return StreamedPage(response.status_code, '', False, 0)
+
+        decoder = codecs.getincrementaldecoder(response.encoding or 'utf-8')(errors='replace')
+        text = ''
+        bytes_read = 0
+        chunks = response.iter_content(chunk_size)
+        for chunk in chunks:
+            bytes_read += len(chunk)
+            text += decoder.decode(chunk)
+            if decided and decided(text):
+                _drain(response, chunk_size, tail_limit, chunks)
+                return StreamedPage(response.status_code, text, False, bytes_read)
+
+        text += decoder.decode(b'', final=True)
+        return StreamedPage(response.status_code, text, True, bytes_read)
+    finally:
+        # 已读完的响应其连接已归还连接池，close只释放未读完的连接
+        response.close()
+
+
+def _drain(response: requests.Response, chunk_size: int, limit: int, chunks=None) -> bool:
+    """读完剩余内容以便复用连接，超过 limit 字节时放弃，返回是否读完"""
+    drained = 0
+    for chunk in chunks if chunks is not None else response.iter_content(chunk_size):
+        drained += len(chunk)
+        if drained > limit:
+            return False
+    return True
+
+
+def build_headers(class_id: str, cookie: str, user_agent: str = None) -> Dict[str, str]:
+    """构造访问签到页面所需的请求头"""
+    return {
+        'User-Agent': user_agent or 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'X-Requested-With': 'com.tencent.mm',
+        'Referer': f'http://k8n.cn/student/course/{class_id}',
+        'Accept-Encoding': 'gzip, deflate',
+        'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+        'Cookie': cookie
+    }
+
+
+def test_session_pool():
+    """测试会话池"""
+    pool = SessionPool()
+    session = pool.get_session()
+    print(f"会话已创建: {session}")
+    print(f"重复获取为同一会话: {pool.get_session() is session}")
+    pool.close()
+
+
+if __name__ == "__main__":
+    test_session_pool()
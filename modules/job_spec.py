@@ -0,0 +1,171 @@
+"""
+签到任务计划模块
+解析配置中的多个签到任务（cron表达式或星期+时间列表），每个任务绑定班级与账号组
+"""
+import re
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set
+
+
+def _parse_field(field: str, low: int, high: int) -> Set[int]:
+    """解析cron的单个字段，支持 *、a-b、a,b 与 /n 步长"""
+    values = set()
+    for part in field.split(','):
+        match = re.fullmatch(r'(\*|\d+(?:-\d+)?)(?:/(\d+))?', part.strip())
+        if not match:
+            raise ValueError(f"无效的cron字段: {field}")
+
+        range_part, step = match.group(1), int(match.group(2) or 1)
+        if range_part == '*':
+            start, end = low, high
+        elif '-' in range_part:
+            start, end = (int(v) for v in range_part.split('-'))
+        else:
+            start = end = int(range_part)
+            if match.group(2):
+                end = high
+
+        if start < low or end > high or start > end or step < 1:
+            raise ValueError(f"cron字段超出范围: {field}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+def _parse_time(value: str) -> tuple:
+    """解析 HH:MM 时间，返回 (时, 分)"""
+    match = re.fullmatch(r'(\d{1,2}):(\d{2})', str(value).strip())
+    if not match:
+        raise ValueError(f"时间格式应为HH:MM: {value}")
+    hour, minute = int(match.group(1)), int(match.group(2))
+    if hour > 23 or minute > 59:
+        raise ValueError(f"时间超出范围: {value}")
+    return hour, minute
+
+
+class CronSpec:
+    """cron表达式: 分 时 日 月 星期（0或7为周日）"""
+
+    def __init__(self, expr: str):
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError(f"cron表达式需要5个字段: {expr}")
+
+        self.expr = expr
+        self.minutes = _parse_field(fields[0], 0, 59)
+        self.hours = _parse_field(fields[1], 0, 23)
+        self.days = _parse_field(fields[2], 1, 31)
+        self.months = _parse_field(fields[3], 1, 12)
+        self.weekdays = {d % 7 for d in _parse_field(fields[4], 0, 7)}
+
+        # 与标准cron一致：日与星期都有限制时，满足其一即可
+        self._any_day = fields[2] == '*'
+        self._any_weekday = fields[4] == '*'
+
+    def _day_matches(self, when: datetime) -> bool:
+        day_ok = when.day in self.days
+        weekday_ok = (when.weekday() + 1) % 7 in self.weekdays
+        if self._any_day or self._any_weekday:
+            return day_ok and weekday_ok
+        return day_ok or weekday_ok
+
+    def next_after(self, after: datetime) -> datetime:
+        """严格晚于 after 的下一次触发时间"""
+        when = after.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = after + timedelta(days=366 * 4)
+
+        while when < limit:
+            if when.month not in self.months:
+                when = (when.replace(day=1) + timedelta(days=32)).replace(day=1, hour=0, minute=0)
+            elif not self._day_matches(when):
+                when = (when + timedelta(days=1)).replace(hour=0, minute=0)
+            elif when.hour not in self.hours:
+                when = (when + timedelta(hours=1)).replace(minute=0)
+            elif when.minute not in self.minutes:
+                when += timedelta(minutes=1)
+            else:
+                return when
+        raise ValueError(f"cron表达式没有可用的触发时间: {self.expr}")
+
+
+class WeeklySpec:
+    """星期+时间列表，星期1为周一"""
+
+    def __init__(self, weekdays: Iterable[int], times: Iterable[str]):
+        self.weekdays = {int(d) for d in weekdays}
+        self.times = sorted(_parse_time(t) for t in times)
+        if not self.weekdays or not self.times:
+            raise ValueError("星期与时间列表不能为空")
+        if not self.weekdays <= set(range(1, 8)):
+            raise ValueError(f"星期取值应为1-7: {sorted(self.weekdays)}")
+
+    def next_after(self, after: datetime) -> datetime:
+        """严格晚于 after 的下一次触发时间"""
+        for offset in range(8):
+            day = after + timedelta(days=offset)
+            if day.isoweekday() not in self.weekdays:
+                continue
+            for hour, minute in self.times:
+                when = day.replace(hour=hour, minute=minute, second=0, microsecond=0)
+                if when > after:
+                    return when
+        raise ValueError("星期与时间列表没有可用的触发时间")
+
+
+def parse_job(entry: Dict, index: int = 0) -> Dict:
+    """解析单个任务配置
+
+    支持 {"cron": "25 8 * * 1,3"} 或 {"weekdays": [1, 3], "times": ["08:25"]}，
+    可选 "name"、"class"（默认使用全局班级）与 "accounts"（UID序号或用户备注，默认全部账号）
+    """
+    if 'cron' in entry:
+        spec = CronSpec(entry['cron'])
+    elif 'times' in entry:
+        spec = WeeklySpec(entry.get('weekdays', range(1, 8)), entry['times'])
+    else:
+        raise ValueError(f"任务缺少 cron 或 times: {entry}")
+
+    return {
+        'name': entry.get('name') or f"任务{index + 1}",
+        'spec': spec,
+        'class': str(entry['class']) if entry.get('class') else None,
+        'accounts': list(entry.get('accounts', []))
+    }
+
+
+def load_jobs(entries: Iterable[Dict]) -> List[Dict]:
+    """解析配置中的全部任务"""
+    return [parse_job(entry, index) for index, entry in enumerate(entries or [])]
+
+
+def select_cookies(cookies: List[str], accounts: List) -> List[str]:
+    """按账号组筛选Cookie，整数为UID（从1开始），字符串匹配Cookie中的username备注"""
+    if not accounts:
+        return list(cookies)
+
+    selected = []
+    for uid, cookie in enumerate(cookies):
+        match = re.search(r'username=([^;]+)', cookie)
+        username = match.group(1) if match else None
+        if (uid + 1) in accounts or (username and username in accounts):
+            selected.append(cookie)
+    return selected
+
+
+def next_fire(job: Dict, after: Optional[datetime] = None) -> datetime:
+    """任务的下一次触发时间"""
+    return job['spec'].next_after(after or datetime.now())
+
+
+def test_job_spec():
+    """测试任务计划解析"""
+    jobs = load_jobs([
+        {'name': '早课', 'cron': '25 8 * * 1,3', 'accounts': [1]},
+        {'weekdays': [2, 4], 'times': ['14:00', '16:00'], 'class': '54321'}
+    ])
+    now = datetime(2024, 1, 1, 9, 0)
+    for job in jobs:
+        print(f"{job['name']} 下次触发: {next_fire(job, now)}")
+
+
+if __name__ == "__main__":
+    test_job_spec()
@@ -0,0 +1,197 @@
+"""
+精确定时调度模块
+基于单调时钟的最小堆调度器，空闲时休眠到最近一个事件到期，并记录每次触发的延迟；
+每次休眠不超过 max_wait 秒，醒来后按本地时间重新计算定时事件的剩余时间，系统休眠唤醒后最多延迟 max_wait 秒触发
+"""
+import heapq
+import itertools
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+
+class PreciseScheduler:
+    """精确调度器 - 按到期时间（time.monotonic）排序执行事件"""
+
+    def __init__(self, logger: logging.Logger = None, spin: float = 0.002, max_wait: float = 60):
+        self.logger = logger or logging.getLogger('AutoCheckBJMF')
+        self.spin = spin
+        self.max_wait = max_wait
+        self._heap = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._running = False
+
+        # 触发延迟统计（毫秒）
+        self._fired = 0
+        self._total_lag = 0.0
+        self._max_lag = 0.0
+
+    @staticmethod
+    def seconds_until(at: str, now: datetime = None) -> float:
+        """距离下一次 HH:MM 的秒数（按本地时间）"""
+        now = now or datetime.now()
+        hour, minute = (int(part) for part in at.split(':'))
+        target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if target <= now:
+            target += timedelta(days=1)
+        return (target - now).total_seconds()
+
+    def call_at(self, due: float, func: Callable, name: str = '') -> Dict:
+        """在单调时钟时间 due 执行 func，返回可用于取消的事件"""
+        event = {'due': due, 'func': func, 'name': name or getattr(func, '__name__', 'event'),
+                 'next_time': None, 'wall_due': None, 'cancelled': False}
+        self._push(event)
+        return event
+
+    def call_later(self, delay: float, func: Callable, name: str = '') -> Dict:
+        """在 delay 秒后执行 func"""
+        return self.call_at(time.monotonic() + max(0.0, delay), func, name)
+
+    def call_recurring(self, next_time: Callable[[datetime], datetime], func: Callable, name: str = '') -> Dict:
+        """按 next_time(当前时间) 给出的本地时间重复执行 func，每次触发后重新计算下次时间"""
+        now = datetime.now()
+        wall_due = next_time(now)
+        event = self.call_at(time.monotonic() + (wall_due - now).total_seconds(), func, name)
+        event['next_time'] = next_time
+        event['wall_due'] = wall_due
+        return event
+
+    def call_daily(self, at: str, func: Callable, name: str = '') -> Dict:
+        """每天 HH:MM 执行 func"""
+        return self.call_recurring(
+            lambda after: after + timedelta(seconds=self.seconds_until(at, after)), func, name
+        )
+
+    def cancel(self, event: Dict):
+        """取消事件（惰性删除，到期时跳过）"""
+        event['cancelled'] = True
+
+    def _push(self, event: Dict):
+        with self._lock:
+            heapq.heappush(self._heap, (event['due'], next(self._counter), event))
+        # 新事件可能比当前等待的事件更早，唤醒调度循环重新计算休眠时间
+        self._wakeup.set()
+
+    def next_due(self) -> Optional[float]:
+        """最近一个未取消事件的到期时间"""
+        with self._lock:
+            while self._heap and self._heap[0][2]['cancelled']:
+                heapq.heappop(self._heap)
+            return self._heap[0][0] if self._heap else None
+
+    def run_pending(self, now: float = None) -> int:
+        """执行所有已到期的事件，返回执行数量"""
+        fired = 0
+        # 本轮只执行调用前已加入的事件，回调中新加入的事件留到下一轮，避免死循环
+        limit = next(self._counter)
+        while True:
+            current = time.monotonic() if now is None else now
+            with self._lock:
+                if not self._heap or self._heap[0][0] > current or self._heap[0][1] > limit:
+                    break
+                _, _, event = heapq.heappop(self._heap)
+            if event['cancelled']:
+                continue
+
+            lag = (time.monotonic() - event['due']) * 1000
+            self._record_lag(lag)
+            self.logger.info(f"定时事件 {event['name']} 触发，延迟 {lag:.1f} ms")
+
+            # 重复事件按本地时间重新计算下次到期，避免累计漂移；
+            # 从本次计划时间之后计算，防止时钟微小偏差导致同一时刻重复触发
+            if event['next_time'] and not event['cancelled']:
+                self._reschedule(event)
+
+            try:
+                event['func']()
+            except Exception as e:
+                self.logger.error(f"定时事件 {event['name']} 执行异常: {e}")
+            fired += 1
+        return fired
+
+    def _reschedule(self, event: Dict):
+        """计算重复事件的下次到期时间并重新入堆"""
+        now = datetime.now()
+        event['wall_due'] = event['next_time'](max(now, event['wall_due']))
+        event['due'] = time.monotonic() + max(0.0, (event['wall_due'] - now).total_seconds())
+        self._push(event)
+
+    def resync(self, tolerance: float = 0.05):
+        """按本地时间重新计算定时事件的到期时间
+
+        单调时钟在系统休眠期间不前进，唤醒后按原到期时间会晚触发；偏差超过 tolerance 秒时修正
+        """
+        now = datetime.now()
+        current = time.monotonic()
+        with self._lock:
+            changed = False
+            entries = []
+            for due, seq, event in self._heap:
+                if event['wall_due'] is not None and not event['cancelled']:
+                    expected = current + max(0.0, (event['wall_due'] - now).total_seconds())
+                    if abs(expected - due) > tolerance:
+                        self.logger.info(f"定时事件 {event['name']} 按本地时间修正到期时间 {expected - due:+.1f} 秒")
+                        event['due'] = due = expected
+                        changed = True
+                entries.append((due, seq, event))
+            if changed:
+                heapq.heapify(entries)
+                self._heap = entries
+
+    def run_forever(self):
+        """调度循环：休眠到最近事件到期，每次最多休眠 max_wait 秒，醒来后按本地时间修正到期时间"""
+        self._running = True
+        while self._running:
+            self.resync()
+            due = self.next_due()
+            wait = None if due is None else due - time.monotonic()
+
+            if wait is None or wait > self.spin:
+                # 提前 spin 秒醒来，剩余部分用短休眠补齐，减少唤醒抖动
+                self._wakeup.wait(self.max_wait if wait is None else min(wait - self.spin, self.max_wait))
+                self._wakeup.clear()
+                continue
+            if wait > 0:
+                time.sleep(wait)
+            self.run_pending()
+
+    def stop(self):
+        """停止调度循环"""
+        self._running = False
+        self._wakeup.set()
+
+    def _record_lag(self, lag: float):
+        self._fired += 1
+        self._total_lag += lag
+        self._max_lag = max(self._max_lag, lag)
+
+    def get_stats(self) -> Dict:
+        """获取触发延迟统计（毫秒）"""
+        return {
+            'fired': self._fired,
+            'avg_lag_ms': self._total_lag / self._fired if self._fired else 0.0,
+            'max_lag_ms': self._max_lag
+        }
+
+    def __len__(self):
+        with self._lock:
+            return sum(1 for _, _, event in self._heap if not event['cancelled'])
+
+
+def test_precise_scheduler():
+    """测试精确调度器的触发延迟"""
+    logging.basicConfig(level=logging.INFO)
+    scheduler = PreciseScheduler()
+    for delay in (0.05, 0.1, 0.2):
+        scheduler.call_later(delay, lambda: None, f"{delay}秒")
+    scheduler.call_later(0.25, scheduler.stop, "停止")
+    scheduler.run_forever()
+    print(f"触发统计: {scheduler.get_stats()}")
+
+
+if __name__ == "__main__":
+    test_precise_scheduler()
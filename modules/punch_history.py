@@ -0,0 +1,201 @@
+"""
+签到历史与自适应轮询模块
+记录每个班级签到任务首次出现的时间，按星期×时段统计出可能的签到窗口；
+监视模式在窗口内密集轮询，窗口外按指数退避放宽间隔
+"""
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Set, Tuple
+
+
+class PunchHistory:
+    """签到出现时间历史 - 按班级保存，超过保留天数的记录自动清理"""
+
+    def __init__(self, history_file: str, bucket_minutes: int = 15, retention_days: int = 90):
+        self.history_file = history_file
+        self.bucket_minutes = bucket_minutes
+        self.retention_days = retention_days
+        self._events = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        """从文件加载历史并清理过期记录"""
+        try:
+            if os.path.exists(self.history_file):
+                with open(self.history_file, 'r', encoding='utf-8') as f:
+                    self._events = json.load(f).get('events', {})
+        except Exception as e:
+            print(f"加载签到历史失败: {e}")
+            self._events = {}
+
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).isoformat()
+        for class_id in list(self._events):
+            self._events[class_id] = [t for t in self._events[class_id] if t >= cutoff]
+
+    def record(self, class_id: str, when: datetime = None):
+        """记录一次签到任务首次出现的时间"""
+        when = when or datetime.now()
+        with self._lock:
+            self._events.setdefault(str(class_id), []).append(when.isoformat(timespec='seconds'))
+
+    def events(self, class_id: str) -> List[datetime]:
+        """获取班级的签到出现时间"""
+        with self._lock:
+            return [datetime.fromisoformat(t) for t in self._events.get(str(class_id), [])]
+
+    def histogram(self, class_id: str) -> Dict[Tuple[int, int], int]:
+        """按 (星期, 时段) 统计签到出现次数，星期从0（周一）开始"""
+        counts = {}
+        for when in self.events(class_id):
+            key = (when.weekday(), (when.hour * 60 + when.minute) // self.bucket_minutes)
+            counts[key] = counts.get(key, 0) + 1
+        return counts
+
+    def windows(self, class_id: str, min_count: int = 1, padding: int = 1) -> Set[Tuple[int, int]]:
+        """出现次数不少于 min_count 的时段，前后各扩展 padding 个时段"""
+        buckets_per_day = 24 * 60 // self.bucket_minutes
+        total = 7 * buckets_per_day
+        result = set()
+
+        for (weekday, bucket), count in self.histogram(class_id).items():
+            if count < min_count:
+                continue
+            index = weekday * buckets_per_day + bucket
+            for offset in range(-padding, padding + 1):
+                result.add(divmod((index + offset) % total, buckets_per_day))
+        return result
+
+    def save(self) -> bool:
+        """将历史写回文件"""
+        with self._lock:
+            data = {'version': 1, 'events': dict(self._events)}
+
+        try:
+            os.makedirs(os.path.dirname(self.history_file) or '.', exist_ok=True)
+            temp_file = f"{self.history_file}.tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_file, self.history_file)
+            return True
+        except Exception as e:
+            print(f"保存签到历史失败: {e}")
+            return False
+
+
+def parse_timetable(entries: Iterable[Dict]) -> List[Tuple[int, int, int]]:
+    """解析课表配置为 (星期, 开始分钟, 结束分钟) 列表
+
+    配置格式: [{"weekdays": [1, 3], "start": "08:00", "end": "09:40"}]，星期1为周一
+    """
+    def to_minutes(text):
+        hour, minute = text.split(':')
+        return int(hour) * 60 + int(minute)
+
+    periods = []
+    for entry in entries or []:
+        start, end = to_minutes(entry['start']), to_minutes(entry['end'])
+        for weekday in entry.get('weekdays', range(1, 8)):
+            periods.append((int(weekday) - 1, start, end))
+    return periods
+
+
+class AdaptivePollPolicy:
+    """自适应轮询策略 - 窗口内使用基础间隔，窗口外指数退避且不越过下一个窗口"""
+
+    def __init__(self, windows: Set[Tuple[int, int]] = None, timetable: List[Tuple[int, int, int]] = None,
+                 bucket_minutes: int = 15, base_interval: float = 30,
+                 max_interval: float = 600, backoff: float = 2):
+        self.windows = windows or set()
+        self.timetable = timetable or []
+        self.bucket_minutes = bucket_minutes
+        self.base_interval = base_interval
+        self.max_interval = max(base_interval, max_interval)
+        self.backoff = backoff
+        self._idle_polls = 0
+
+    @property
+    def has_windows(self) -> bool:
+        """是否有可用的签到窗口，没有时退化为固定间隔"""
+        return bool(self.windows or self.timetable)
+
+    def in_window(self, when: datetime) -> bool:
+        """给定时间是否处于可能的签到窗口内"""
+        minutes = when.hour * 60 + when.minute
+        if (when.weekday(), minutes // self.bucket_minutes) in self.windows:
+            return True
+        return any(weekday == when.weekday() and start <= minutes < end
+                   for weekday, start, end in self.timetable)
+
+    def seconds_to_window(self, when: datetime, horizon: float) -> float:
+        """距离下一个窗口开始的秒数，horizon 内没有窗口时返回 horizon"""
+        step = timedelta(minutes=1)
+        probe = when.replace(second=0, microsecond=0) + step
+        limit = when + timedelta(seconds=horizon)
+
+        while probe < limit:
+            if self.in_window(probe):
+                return (probe - when).total_seconds()
+            probe += step
+        return horizon
+
+    def next_interval(self, when: datetime = None) -> float:
+        """计算本次轮询后到下次轮询的间隔秒数"""
+        when = when or datetime.now()
+        if not self.has_windows or self.in_window(when):
+            self._idle_polls = 0
+            return self.base_interval
+
+        self._idle_polls += 1
+        interval = min(self.max_interval, self.base_interval * (self.backoff ** self._idle_polls))
+        return max(self.base_interval, self.seconds_to_window(when, interval))
+
+
+def simulate_polling(next_interval: Callable[[datetime], float], punch_times: List[datetime],
+                     start: datetime, end: datetime) -> Dict:
+    """模拟一段时间内的轮询，统计请求次数与发现签到的平均延迟"""
+    polls = []
+    now = start
+    while now < end:
+        polls.append(now)
+        now += timedelta(seconds=next_interval(now))
+
+    latencies = []
+    for punch_time in punch_times:
+        detected = next((poll for poll in polls if poll >= punch_time), None)
+        if detected is not None:
+            latencies.append((detected - punch_time).total_seconds())
+
+    return {
+        'polls': len(polls),
+        'detected': len(latencies),
+        'avg_latency': sum(latencies) / len(latencies) if latencies else 0.0
+    }
+
+
+def test_punch_history():
+    """对比固定间隔与自适应轮询"""
+    import tempfile
+    history = PunchHistory(os.path.join(tempfile.mkdtemp(), "punch_history.json"))
+
+    # 过去四周的周一、周三 08:05 出现签到
+    monday = datetime(2024, 1, 1, 8, 5)
+    for week in range(4):
+        history.record('12345', monday + timedelta(weeks=week))
+        history.record('12345', monday + timedelta(weeks=week, days=2))
+
+    policy = AdaptivePollPolicy(history.windows('12345'), base_interval=30, max_interval=900)
+    start = datetime(2024, 1, 29)
+    end = start + timedelta(days=7)
+    punches = [datetime(2024, 1, 29, 8, 7, 13), datetime(2024, 1, 31, 8, 3, 41)]
+
+    fixed = simulate_polling(lambda now: 120, punches, start, end)
+    adaptive = simulate_polling(policy.next_interval, punches, start, end)
+    print(f"固定间隔120秒: 请求 {fixed['polls']} 次，平均发现延迟 {fixed['avg_latency']:.1f} 秒")
+    print(f"自适应轮询:   请求 {adaptive['polls']} 次，平均发现延迟 {adaptive['avg_latency']:.1f} 秒")
+
+
+if __name__ == "__main__":
+    test_punch_history()
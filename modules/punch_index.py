@@ -0,0 +1,109 @@
+"""
+已签到记录索引模块
+记录 (账号, 班级, 签到ID) 的签到结果并持久化，重复运行时跳过已完成的签到请求
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+
+class SignedPunchIndex:
+    """已签到索引 - 线程安全，按保留天数自动清理旧记录"""
+
+    def __init__(self, index_file: str, retention_days: int = 7):
+        self.index_file = index_file
+        self.retention_days = retention_days
+        self._entries = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    @staticmethod
+    def account_key(cookie: str) -> str:
+        """由Cookie生成账号标识，只保存摘要，不落盘明文Cookie"""
+        match = re.search(r'remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d=([^;]+)', cookie)
+        value = match.group(1) if match else cookie
+        return hashlib.sha256(value.encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def _key(account: str, class_id: str, punch_id: str) -> str:
+        return f"{account}|{class_id}|{punch_id}"
+
+    def _load(self):
+        """从文件加载索引并清理过期记录"""
+        try:
+            if os.path.exists(self.index_file):
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                self._entries = data.get('entries', {})
+        except Exception as e:
+            print(f"加载签到索引失败: {e}")
+            self._entries = {}
+
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).isoformat()
+        expired = [key for key, entry in self._entries.items() if entry.get('time', '') < cutoff]
+        for key in expired:
+            del self._entries[key]
+        self._dirty = bool(expired)
+
+    def get(self, account: str, class_id: str, punch_id: str) -> Optional[Dict]:
+        """获取签到记录"""
+        with self._lock:
+            return self._entries.get(self._key(account, class_id, str(punch_id)))
+
+    def is_signed(self, account: str, class_id: str, punch_id: str) -> bool:
+        """该账号是否已完成此签到"""
+        return self.get(account, class_id, punch_id) is not None
+
+    def mark(self, account: str, class_id: str, punch_id: str, outcome: str, text: str = None):
+        """记录一次已完成的签到"""
+        with self._lock:
+            self._entries[self._key(account, class_id, str(punch_id))] = {
+                'outcome': outcome,
+                'text': text,
+                'time': datetime.now().isoformat()
+            }
+            self._dirty = True
+
+    def save(self) -> bool:
+        """将索引写回文件（无变更时跳过）"""
+        with self._lock:
+            if not self._dirty:
+                return True
+            entries = dict(self._entries)
+            self._dirty = False
+
+        try:
+            os.makedirs(os.path.dirname(self.index_file) or '.', exist_ok=True)
+            temp_file = f"{self.index_file}.tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump({'version': 1, 'entries': entries}, f, ensure_ascii=False)
+            os.replace(temp_file, self.index_file)
+            return True
+        except Exception as e:
+            print(f"保存签到索引失败: {e}")
+            with self._lock:
+                self._dirty = True
+            return False
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def test_punch_index():
+    """测试已签到索引"""
+    import tempfile
+    index_file = os.path.join(tempfile.mkdtemp(), "signed_punches.json")
+    index = SignedPunchIndex(index_file)
+    account = SignedPunchIndex.account_key("username=test;remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d=abc")
+    index.mark(account, "12345", "678", "signed", "签到成功")
+    index.save()
+    print(f"重新加载后已签到: {SignedPunchIndex(index_file).is_signed(account, '12345', '678')}")
+
+
+if __name__ == "__main__":
+    test_punch_index()
@@ -0,0 +1,284 @@
+"""
+签到页面解析模块
+单次正则扫描签到页面，提取标题、GPS签到ID与扫码签到ID，以及签到结果文本；
+页面结构不符合预期时回退到BeautifulSoup完整解析。
+可通过配置在 regex、html.parser、lxml 三种解析后端间切换
+"""
+import glob
+import hashlib
+import html as html_lib
+import os
+import re
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Optional
+
+try:
+    import lxml  # noqa: F401  仅用于检测BeautifulSoup的lxml后端是否可用
+except ImportError:
+    lxml = None
+
+# 可选的解析后端，regex 为单次扫描的快速解析
+BACKENDS = ('regex', 'html.parser', 'lxml')
+
+# 一次扫描同时匹配标题、GPS签到与扫码签到
+_PAGE_PATTERN = re.compile(
+    r'<title\b[^>]*>(?P<title>.*?)</title\s*>|punch_gps\((?P<gps>\d+)\)|punchcard_(?P<qr>\d+)',
+    re.S | re.I
+)
+_TITLE_TAG = re.compile(r'<title\b', re.I)
+_TITLE_PATTERN = re.compile(r'<title\b[^>]*>(.*?)</title\s*>', re.S | re.I)
+_RESULT_PATTERN = re.compile(
+    r'<div\b[^>]*?\sid\s*=\s*(["\']?)title\1(?=[\s/>])[^>]*>(?P<text>.*?)</div\s*>',
+    re.S | re.I
+)
+_RESULT_ID = re.compile(r'\bid\s*=\s*["\']?title\b', re.I)
+_TAG = re.compile(r'<[^>]+>')
+
+
+def parse_punch_page(text: str) -> Dict:
+    """解析签到页面，返回 {'title': 标题或None, 'gps': [ID], 'qr': [ID]}，ID按页面出现顺序"""
+    title = None
+    gps = []
+    qr = []
+
+    for match in _PAGE_PATTERN.finditer(text):
+        kind = match.lastgroup
+        if kind == 'gps':
+            gps.append(match.group('gps'))
+        elif kind == 'qr':
+            qr.append(match.group('qr'))
+        elif title is None:
+            title = html_lib.unescape(match.group('title'))
+
+    # 有标题标签却没能匹配（如未闭合），交给完整解析器处理
+    if title is None and _TITLE_TAG.search(text):
+        return parse_punch_page_soup(text)
+
+    return {'title': title, 'gps': gps, 'qr': qr}
+
+
+def parse_punch_page_soup(text: str, features: str = 'html.parser') -> Dict:
+    """使用BeautifulSoup完整解析签到页面"""
+    from bs4 import BeautifulSoup
+    title_tag = BeautifulSoup(text, features).find('title')
+    return {
+        'title': title_tag.text if title_tag else None,
+        'gps': re.findall(r'punch_gps\((\d+)\)', text),
+        'qr': re.findall(r'punchcard_(\d+)', text)
+    }
+
+
+def punch_ids(page: Dict) -> List[str]:
+    """页面中的全部签到ID，GPS签到在前"""
+    return page['gps'] + page['qr']
+
+
+def parse_sign_result(text: str) -> Optional[str]:
+    """提取签到响应中 div#title 的文本，没有时返回None"""
+    match = _RESULT_PATTERN.search(text)
+    if not match:
+        # 属性顺序或引号等与预期不同时，用完整解析器确认
+        return parse_sign_result_soup(text) if _RESULT_ID.search(text) else None
+
+    inner = match.group('text')
+    if '<div' in inner.lower():
+        # 嵌套div时非贪婪匹配会提前截断
+        return parse_sign_result_soup(text)
+    return html_lib.unescape(_TAG.sub('', inner)).strip()
+
+
+def parse_sign_result_soup(text: str, features: str = 'html.parser') -> Optional[str]:
+    """使用BeautifulSoup提取签到结果文本"""
+    from bs4 import BeautifulSoup
+    div_tag = BeautifulSoup(text, features).find('div', id='title')
+    return div_tag.text.strip() if div_tag else None
+
+
+def punch_page_decided(text: str) -> bool:
+    """流式读取签到页面时，已读部分的标题表明登录失效即可停止，无需读取签到列表"""
+    match = _TITLE_PATTERN.search(text)
+    return bool(match and "出错" in match.group(1))
+
+
+def sign_result_decided(text: str) -> bool:
+    """流式读取签到响应时，div#title 已完整读到即可停止"""
+    match = _RESULT_PATTERN.search(text)
+    return bool(match and '<div' not in match.group('text').lower())
+
+
+def available_backends() -> List[str]:
+    """当前环境可用的解析后端"""
+    return [backend for backend in BACKENDS if backend != 'lxml' or lxml is not None]
+
+
+class ParseCache:
+    """解析结果缓存 - 每个 (班级, 账号) 保存最近一次页面的内容摘要与解析结果，按LRU淘汰"""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def digest(text: str) -> bytes:
+        return hashlib.blake2b(text.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+    def get_or_parse(self, key: Hashable, text: str, parse: Callable[[str], Dict]) -> Dict:
+        """页面内容与上次相同时直接返回上次的解析结果，否则重新解析并缓存"""
+        digest = self.digest(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == digest:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return _copy_page(entry[1])
+            self.misses += 1
+
+        page = parse(text)
+        with self._lock:
+            self._entries[key] = (digest, _copy_page(page))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return page
+
+    def get_stats(self) -> Dict:
+        """获取缓存命中统计"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': len(self)
+        }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+def _copy_page(page: Dict) -> Dict:
+    """复制解析结果，调用方修改ID列表不影响缓存"""
+    return {'title': page['title'], 'gps': list(page['gps']), 'qr': list(page['qr'])}
+
+
+class PunchParser:
+    """签到页面解析器 - 按配置的后端解析签到页面、签到结果与其他页面"""
+
+    def __init__(self, backend: str = 'regex', cache_size: int = 256):
+        if backend not in available_backends():
+            print(f"⚠️ 解析后端 {backend} 不可用，使用 regex")
+            backend = 'regex'
+        self.backend = backend
+        self.cache = ParseCache(cache_size)
+
+    @property
+    def features(self) -> str:
+        """构建BeautifulSoup树时使用的解析器，regex 后端使用 html.parser"""
+        return 'lxml' if self.backend == 'lxml' else 'html.parser'
+
+    def parse_page(self, text: str, key: Hashable = None) -> Dict:
+        """解析签到页面，返回 {'title', 'gps', 'qr'}；指定 key（如 (班级, 账号)）时复用内容相同页面的结果"""
+        if key is not None:
+            return self.cache.get_or_parse(key, text, self._parse_page)
+        return self._parse_page(text)
+
+    def _parse_page(self, text: str) -> Dict:
+        if self.backend == 'regex':
+            return parse_punch_page(text)
+        return parse_punch_page_soup(text, self.features)
+
+    def parse_sign_result(self, text: str) -> Optional[str]:
+        """提取签到结果文本"""
+        if self.backend == 'regex':
+            return parse_sign_result(text)
+        return parse_sign_result_soup(text, self.features)
+
+    def soup(self, text: str):
+        """需要完整文档树的页面（如课程列表）使用BeautifulSoup解析"""
+        from bs4 import BeautifulSoup
+        return BeautifulSoup(text, self.features)
+
+
+def load_corpus(directory: str) -> List[str]:
+    """读取目录中录制的 .html 页面"""
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, '*.html'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            pages.append(f.read())
+    return pages
+
+
+def benchmark_parsers(pages: List[str], repeat: int = 50, backends: List[str] = None) -> Dict[str, Dict]:
+    """对比各后端解析每页的CPU时间（微秒）、每秒页数与峰值内存（KB）"""
+    results = {}
+    for backend in backends or available_backends():
+        parser = PunchParser(backend)
+
+        def parse(page):
+            parser.parse_page(page)
+            parser.parse_sign_result(page)
+
+        start = time.process_time()
+        for _ in range(repeat):
+            for page in pages:
+                parse(page)
+        elapsed = max(time.process_time() - start, 1e-9)
+
+        tracemalloc.start()
+        for page in pages:
+            parse(page)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        results[backend] = {
+            'cpu_us': elapsed / (repeat * len(pages)) * 1e6,
+            'pages_per_sec': repeat * len(pages) / elapsed,
+            'peak_kb': peak / 1024
+        }
+    return results
+
+
+def sample_punch_page(punches: int = 2, courses: int = 30) -> str:
+    """生成与签到页面结构相近的示例HTML"""
+    rows = ''.join(
+        f'<div class="card"><div class="card-body"><h5>课程{i}</h5>'
+        f'<p class="text-muted">教师{i} · 教室{i}</p></div></div>'
+        for i in range(courses)
+    )
+    cards = ''.join(
+        f'<div class="punch" onclick="punch_gps({3000 + i})">GPS签到 {i}</div>'
+        f'<div id="punchcard_{4000 + i}" class="qr">扫码签到 {i}</div>'
+        for i in range(punches)
+    )
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>签到列表 - 班级魔法</title>'
+        '<link rel="stylesheet" href="/css/app.css"><script src="/js/app.js"></script></head>'
+        f'<body><div class="container">{rows}{cards}</div></body></html>'
+    )
+
+
+def test_punch_parser(corpus_dir: str = None):
+    """测试签到页面解析，并在录制的页面上对比各解析后端"""
+    page = sample_punch_page()
+    parsed = parse_punch_page(page)
+    print(f"标题: {parsed['title']}，GPS签到: {parsed['gps']}，扫码签到: {parsed['qr']}")
+    result = parse_sign_result('<div class="box" id="title"> 签到成功 </div>')
+    print(f"签到结果: {result}")
+
+    corpus_dir = corpus_dir or os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tests', 'data')
+    pages = load_corpus(corpus_dir) or [page, sample_punch_page(0, 60)]
+    print(f"基准页面: {len(pages)} 个，可用后端: {', '.join(available_backends())}")
+    for backend, stats in benchmark_parsers(pages).items():
+        print(f"{backend:>12}: 每秒 {stats['pages_per_sec']:.0f} 页，"
+              f"每页 {stats['cpu_us']:.1f} 微秒，峰值内存 {stats['peak_kb']:.1f} KB")
+
+
+if __name__ == "__main__":
+    import sys
+    test_punch_parser(sys.argv[1] if len(sys.argv) > 1 else None)
@@ -0,0 +1,160 @@
+"""
+签到结果分类模块
+将HTTP状态码、页面标题和签到结果文本归类为统一的结果代码，决定账号是否需要重试
+"""
+import asyncio
+from typing import Iterable, Optional
+
+import requests
+
+try:
+    import aiohttp
+    _AIOHTTP_NETWORK_ERRORS = (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError)
+except ImportError:
+    _AIOHTTP_NETWORK_ERRORS = ()
+
+
+# 结果代码
+SIGNED = 'signed'                        # 签到成功
+ALREADY_SIGNED = 'already_signed'        # 此前已签到
+NO_PUNCH = 'no_punch'                    # 没有进行中的签到
+SUBMITTED = 'submitted'                  # 请求已发送但未返回结果文本
+EXPIRED_LOGIN = 'expired_login'          # 登录状态失效，需要更新Cookie
+INVALID_COOKIE = 'invalid_cookie'        # Cookie格式错误
+PUNCH_CLOSED = 'punch_closed'            # 签到已结束
+SIGN_REJECTED = 'sign_rejected'          # 服务器拒绝本次签到（如不在范围内）
+CLIENT_ERROR = 'client_error'            # 其他4xx错误
+SERVER_ERROR = 'server_error'            # 5xx错误
+TRANSIENT_NETWORK = 'transient_network'  # 超时、连接中断等网络异常
+UNKNOWN_ERROR = 'unknown_error'          # 未预期的异常
+
+# 只有这些结果在稍后重试时可能成功
+RETRYABLE = frozenset({SERVER_ERROR, TRANSIENT_NETWORK, UNKNOWN_ERROR})
+
+# 不重试也不算成功的结果
+FAILED = frozenset({EXPIRED_LOGIN, PUNCH_CLOSED, SIGN_REJECTED, CLIENT_ERROR})
+
+OUTCOME_LABELS = {
+    SIGNED: '签到成功',
+    ALREADY_SIGNED: '已签到',
+    NO_PUNCH: '无签到任务',
+    SUBMITTED: '请求已发送',
+    EXPIRED_LOGIN: '登录失效',
+    INVALID_COOKIE: 'Cookie格式错误',
+    PUNCH_CLOSED: '签到已结束',
+    SIGN_REJECTED: '签到被拒绝',
+    CLIENT_ERROR: '请求错误',
+    SERVER_ERROR: '服务器错误',
+    TRANSIENT_NETWORK: '网络异常',
+    UNKNOWN_ERROR: '未知异常'
+}
+
+# 合并多个结果时的严重程度，数值越大越优先
+_SEVERITY = {
+    NO_PUNCH: 0,
+    SIGNED: 1,
+    ALREADY_SIGNED: 1,
+    SUBMITTED: 2,
+    PUNCH_CLOSED: 3,
+    SIGN_REJECTED: 4,
+    CLIENT_ERROR: 5,
+    EXPIRED_LOGIN: 6,
+    INVALID_COOKIE: 7,
+    UNKNOWN_ERROR: 8,
+    SERVER_ERROR: 9,
+    TRANSIENT_NETWORK: 10
+}
+
+
+def classify_status(status_code: int) -> Optional[str]:
+    """根据非200状态码分类，200时返回None"""
+    if status_code == 200:
+        return None
+    if status_code in (401, 403, 419):
+        return EXPIRED_LOGIN
+    if status_code in (408, 429):
+        return TRANSIENT_NETWORK
+    if status_code >= 500:
+        return SERVER_ERROR
+    return CLIENT_ERROR
+
+
+def classify_page(status_code: int, title: Optional[str]) -> Optional[str]:
+    """分类签到页面的获取结果，页面正常时返回None"""
+    outcome = classify_status(status_code)
+    if outcome:
+        return outcome
+    if title and "出错" in title:
+        return EXPIRED_LOGIN
+    return None
+
+
+def classify_sign(status_code: int, result_text: Optional[str]) -> str:
+    """分类签到请求的结果"""
+    outcome = classify_status(status_code)
+    if outcome:
+        return outcome
+    if result_text is None:
+        return SUBMITTED
+
+    text = result_text.strip()
+    if text == "签到成功":
+        return SIGNED
+    if "已签" in text or "签过" in text:
+        return ALREADY_SIGNED
+    if "结束" in text or "过期" in text or "不存在" in text:
+        return PUNCH_CLOSED
+    if "登录" in text or "出错" in text:
+        return EXPIRED_LOGIN
+    return SIGN_REJECTED
+
+
+def classify_exception(error: BaseException) -> str:
+    """分类请求过程中的异常"""
+    network_errors = (
+        requests.exceptions.Timeout,
+        requests.exceptions.ConnectionError,
+        asyncio.TimeoutError,
+        TimeoutError,
+        ConnectionError
+    ) + _AIOHTTP_NETWORK_ERRORS
+
+    if isinstance(error, network_errors):
+        return TRANSIENT_NETWORK
+    return UNKNOWN_ERROR
+
+
+def merge_outcomes(outcomes: Iterable[str]) -> str:
+    """合并一个账号多个签到任务的结果，取最严重的一个"""
+    outcomes = list(outcomes)
+    if not outcomes:
+        return NO_PUNCH
+    return max(outcomes, key=lambda outcome: _SEVERITY.get(outcome, 0))
+
+
+def is_retryable(outcome: str) -> bool:
+    """结果是否值得在稍后重试"""
+    return outcome in RETRYABLE
+
+
+def status_for(outcome: str) -> str:
+    """将结果代码映射为账号状态: ok / error / failed / null"""
+    if outcome == INVALID_COOKIE:
+        return 'null'
+    if outcome in RETRYABLE:
+        return 'error'
+    if outcome in FAILED:
+        return 'failed'
+    return 'ok'
+
+
+def test_punch_result():
+    """测试签到结果分类"""
+    print(classify_page(200, "出错了"))
+    print(classify_sign(200, "签到成功"))
+    print(classify_sign(502, None))
+    print(merge_outcomes([SIGNED, SERVER_ERROR]))
+
+
+if __name__ == "__main__":
+    test_punch_result()
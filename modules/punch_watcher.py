@@ -0,0 +1,65 @@
+"""
+签到任务监视模块
+持续轮询时记录已发现的签到ID，只对新出现的签到触发签到，并统计从发现到签到完成的延迟
+"""
+import time
+from typing import Dict, Iterable, List, Optional
+
+
+class PunchWatcher:
+    """签到任务监视器 - 跟踪签到ID的出现与完成时间"""
+
+    def __init__(self, interval: float = 30):
+        self.interval = interval
+        self._active = {}
+        self._latencies = []
+
+    def observe(self, punch_ids: Iterable[str], now: float = None) -> List[str]:
+        """记录本次轮询看到的签到ID，返回新出现的ID"""
+        now = time.monotonic() if now is None else now
+        current = [str(punch_id) for punch_id in punch_ids]
+
+        # 已从页面消失的签到不再跟踪，重新开启时可再次触发
+        for punch_id in list(self._active):
+            if punch_id not in current:
+                del self._active[punch_id]
+
+        new_ids = []
+        for punch_id in current:
+            if punch_id not in self._active:
+                self._active[punch_id] = {'detected': now, 'latency': None}
+                new_ids.append(punch_id)
+        return new_ids
+
+    def mark_signed(self, punch_id: str, now: float = None) -> Optional[float]:
+        """记录签到完成，返回从发现到完成的秒数"""
+        entry = self._active.get(str(punch_id))
+        if entry is None or entry['latency'] is not None:
+            return None
+
+        now = time.monotonic() if now is None else now
+        entry['latency'] = now - entry['detected']
+        self._latencies.append(entry['latency'])
+        return entry['latency']
+
+    def get_stats(self) -> Dict:
+        """获取发现到签到完成的延迟统计"""
+        count = len(self._latencies)
+        return {
+            'punches': count,
+            'avg_latency': sum(self._latencies) / count if count else 0.0,
+            'max_latency': max(self._latencies) if count else 0.0
+        }
+
+
+def test_punch_watcher():
+    """测试签到任务监视器"""
+    watcher = PunchWatcher(interval=10)
+    print(f"新签到: {watcher.observe(['101'], now=0)}")
+    print(f"新签到: {watcher.observe(['101', '102'], now=10)}")
+    print(f"签到延迟: {watcher.mark_signed('102', now=12.5)} 秒")
+    print(f"统计: {watcher.get_stats()}")
+
+
+if __name__ == "__main__":
+    test_punch_watcher()
@@ -0,0 +1,106 @@
+"""
+请求限流模块
+基于令牌桶算法限制对k8n.cn的总请求速率，供所有签到线程/协程共享
+"""
+import asyncio
+import threading
+import time
+from typing import Dict, Optional
+
+
+class TokenBucket:
+    """令牌桶限流器 - 线程安全，按 rate 个/秒补充令牌，最多积攒 burst 个"""
+
+    def __init__(self, rate: float = 5.0, burst: int = 10):
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+        # 等待统计
+        self._requests = 0
+        self._waited_requests = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def reserve(self, tokens: int = 1, max_wait: float = None) -> Optional[float]:
+        """预占令牌，返回调用方需要等待的秒数（不阻塞）；需要等待超过 max_wait 时不预占并返回None"""
+        with self._lock:
+            if self.rate <= 0:
+                wait = 0.0
+            else:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+
+                # 令牌不足时允许透支，按透支量排队，保证先到先得
+                remaining = self._tokens - tokens
+                wait = -remaining / self.rate if remaining < 0 else 0.0
+                if max_wait is not None and wait > max_wait:
+                    return None
+                self._tokens = remaining
+
+            self._requests += 1
+            if wait > 0:
+                self._waited_requests += 1
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+
+            return wait
+
+    def acquire(self, tokens: int = 1) -> float:
+        """获取令牌，必要时阻塞等待，返回实际等待秒数"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def try_acquire(self, timeout: float, tokens: int = 1) -> bool:
+        """在 timeout 秒内能拿到令牌时等待并返回True，否则不占用令牌直接返回False"""
+        wait = self.reserve(tokens, max_wait=timeout)
+        if wait is None:
+            return False
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+    async def acquire_async(self, tokens: int = 1) -> float:
+        """异步获取令牌，等待期间不阻塞事件循环"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+    def get_stats(self) -> Dict:
+        """获取等待统计"""
+        with self._lock:
+            return {
+                'requests': self._requests,
+                'waited_requests': self._waited_requests,
+                'total_wait': self._total_wait,
+                'max_wait': self._max_wait,
+                'avg_wait': self._total_wait / self._requests if self._requests else 0.0
+            }
+
+    def reset_stats(self):
+        """清空等待统计"""
+        with self._lock:
+            self._requests = 0
+            self._waited_requests = 0
+            self._total_wait = 0.0
+            self._max_wait = 0.0
+
+
+def test_rate_limiter():
+    """测试令牌桶限流"""
+    bucket = TokenBucket(rate=5, burst=2)
+    start = time.monotonic()
+    for _ in range(7):
+        bucket.acquire()
+    print(f"7次请求耗时: {time.monotonic() - start:.2f} 秒")
+    print(f"等待统计: {bucket.get_stats()}")
+
+
+if __name__ == "__main__":
+    test_rate_limiter()
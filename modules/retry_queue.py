@@ -0,0 +1,90 @@
+"""
+延迟重试队列模块
+按到期时间排序保存签到失败的账号，每个账号独立计时并指数退避，不阻塞主循环
+"""
+import heapq
+import itertools
+import time
+from typing import Dict, List, Optional
+
+
+class RetryQueue:
+    """延迟重试队列 - 以到期时间为键的最小堆"""
+
+    def __init__(self, base_delay: float = 300, backoff: float = 3, max_retries: int = 2):
+        self.base_delay = base_delay
+        self.backoff = backoff
+        self.max_retries = max_retries
+        self._heap = []
+        self._pending = set()
+        self._counter = itertools.count()
+
+    def delay_for(self, attempt: int) -> float:
+        """第 attempt 次重试（从0开始）前的等待秒数"""
+        return self.base_delay * (self.backoff ** attempt)
+
+    def schedule(self, cookie: str, attempt: int = 0, now: float = None,
+                 class_id: str = None) -> Optional[float]:
+        """安排一次重试，返回到期时间；重试次数用尽或已在队列中时返回None
+
+        class_id 为该次签到使用的班级，为None时使用全局配置的班级
+        """
+        if attempt >= self.max_retries or cookie in self._pending:
+            return None
+
+        now = time.monotonic() if now is None else now
+        due = now + self.delay_for(attempt)
+        task = {'cookie': cookie, 'attempt': attempt, 'due': due, 'class_id': class_id}
+
+        heapq.heappush(self._heap, (due, next(self._counter), task))
+        self._pending.add(cookie)
+        return due
+
+    def pop_due(self, now: float = None) -> List[Dict]:
+        """取出所有已到期的重试任务"""
+        now = time.monotonic() if now is None else now
+        tasks = []
+
+        while self._heap and self._heap[0][0] <= now:
+            _, _, task = heapq.heappop(self._heap)
+            self._pending.discard(task['cookie'])
+            tasks.append(task)
+
+        return tasks
+
+    def next_due(self) -> Optional[float]:
+        """最近一个重试任务的到期时间"""
+        return self._heap[0][0] if self._heap else None
+
+    def seconds_until_due(self, now: float = None) -> Optional[float]:
+        """距离最近一个重试任务到期的秒数"""
+        due = self.next_due()
+        if due is None:
+            return None
+        now = time.monotonic() if now is None else now
+        return max(0.0, due - now)
+
+    def clear(self):
+        """清空队列"""
+        self._heap.clear()
+        self._pending.clear()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __contains__(self, cookie):
+        return cookie in self._pending
+
+
+def test_retry_queue():
+    """测试延迟重试队列"""
+    queue = RetryQueue(base_delay=1, backoff=2, max_retries=3)
+    for attempt in range(4):
+        due = queue.schedule(f"cookie_{attempt}", attempt=attempt, now=0)
+        print(f"第{attempt + 1}次重试到期时间: {due}")
+    print(f"到期任务: {queue.pop_due(now=2)}")
+    print(f"剩余任务数: {len(queue)}")
+
+
+if __name__ == "__main__":
+    test_retry_queue()
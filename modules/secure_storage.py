@@ -6,20 +6,67 @@ import os
 import json
 import platform
 import base64
+import copy
 import hashlib
+import re
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 import requests
 from pathlib import Path
 
+from modules.account_store import AccountStore
+from modules.file_lock import FileLock
+
+
+# 进程内共享的解密数据缓存: (数据文件, 密钥文件) -> (mtime_ns, size, data)
+_data_cache = {}
+_data_cache_lock = threading.Lock()
+
+
+def atomic_write(path: str, content: bytes, mode: int = None):
+    """先写同目录临时文件并fsync，再原子替换目标文件，崩溃时不会留下写了一半的文件"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_file = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        if mode is not None and os.name != 'nt':
+            os.chmod(temp_file, mode)
+        os.replace(temp_file, path)
+    except BaseException:
+        try:
+            os.remove(temp_file)
+        except OSError:
+            pass
+        raise
+    
+    # 同步目录项，确保重命名本身落盘（Windows不支持打开目录）
+    if os.name != 'nt':
+        try:
+            dir_fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        except OSError:
+            pass
+
 
 class SecureStorage:
     """安全存储管理器"""
     
-    def __init__(self, app_name: str = "AutoCheckBJMF"):
+    def __init__(self, app_name: str = "AutoCheckBJMF", flush_delay: float = 0.0):
         self.app_name = app_name
         self.system = platform.system()
         self.storage_path = self._get_storage_path()
@@ -31,6 +78,13 @@ class SecureStorage:
         
         # 初始化加密密钥
         self.cipher = self._get_or_create_cipher()
+        
+        # 延迟写入：flush_delay 秒内的多次保存合并为一次落盘，为0时立即写入
+        self.flush_delay = flush_delay
+        self._pending = None
+        self._flush_timer = None
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
     
     def _get_storage_path(self) -> str:
         """获取存储路径"""
@@ -113,59 +167,186 @@ class SecureStorage:
         return f"{getpass.getuser()}@{socket.gethostname()}"
     
     def save_data(self, data: Dict[str, Any]) -> bool:
-        """保存加密数据"""
+        """保存加密数据，启用延迟写入时先进入缓冲区，由定时器或 flush() 落盘"""
+        # 添加时间戳
+        data['_timestamp'] = datetime.now().isoformat()
+        data['_version'] = "1.0"
+        
+        if self.flush_delay <= 0:
+            with self._flush_lock:
+                with self._pending_lock:
+                    self._discard_pending()
+                return self._write(data)
+        
+        with self._pending_lock:
+            self._pending = copy.deepcopy(data)
+            self._schedule_flush()
+        return True
+    
+    def _schedule_flush(self):
+        """重新开始延迟写入的计时，调用方需持有 _pending_lock"""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+        # 非守护线程：正常退出时也会等到缓冲区落盘
+        self._flush_timer = threading.Timer(self.flush_delay, self.flush)
+        self._flush_timer.start()
+    
+    def flush(self) -> bool:
+        """立即写入缓冲区中的数据，程序退出前调用"""
+        with self._flush_lock:
+            with self._pending_lock:
+                data = self._pending
+                self._discard_pending()
+            if data is None:
+                return True
+            return self._write(data)
+    
+    def _discard_pending(self):
+        """清空缓冲区并取消定时器"""
+        if self._flush_timer is not None:
+            self._flush_timer.cancel()
+        self._flush_timer = None
+        self._pending = None
+    
+    @property
+    def lock(self) -> FileLock:
+        """数据文件的跨进程读写锁"""
+        return FileLock(self.data_file)
+    
+    def _write(self, data: Dict[str, Any], locked: bool = False) -> bool:
+        """加密并原子写入数据文件，locked 表示调用方已持有写锁"""
         try:
-            # 添加时间戳
-            data['_timestamp'] = datetime.now().isoformat()
-            data['_version'] = "1.0"
-            
             # 序列化数据
             json_data = json.dumps(data, ensure_ascii=False, indent=2)
             
             # 加密数据
             encrypted_data = self.cipher.encrypt(json_data.encode('utf-8'))
             
-            # 保存到文件
-            with open(self.data_file, 'wb') as f:
-                f.write(encrypted_data)
-            
-            # 设置文件权限
-            if self.system != "Windows":
-                os.chmod(self.data_file, 0o600)
+            with nullcontext() if locked else self.lock.exclusive():
+                # 写入临时文件后替换，仅所有者可读写
+                atomic_write(self.data_file, encrypted_data, 0o600)
+                
+                # 自己写入的数据直接更新缓存，下次读取无需解密
+                self._cache_put(copy.deepcopy(data))
             
             return True
             
         except Exception as e:
+            self._cache_drop()
             print(f"保存数据失败: {e}")
             return False
     
+    def _cache_key(self):
+        return (os.path.abspath(self.data_file), os.path.abspath(self.key_file))
+    
+    def _cache_put(self, data: Dict[str, Any]):
+        """以当前文件的 mtime/size 缓存解密数据"""
+        stat = os.stat(self.data_file)
+        with _data_cache_lock:
+            _data_cache[self._cache_key()] = (stat.st_mtime_ns, stat.st_size, data)
+    
+    def _cache_drop(self):
+        with _data_cache_lock:
+            _data_cache.pop(self._cache_key(), None)
+    
     def load_data(self) -> Optional[Dict[str, Any]]:
-        """加载解密数据"""
+        """加载解密数据，文件的 mtime/size 未变化时直接返回缓存的副本"""
+        with self._pending_lock:
+            if self._pending is not None:
+                return copy.deepcopy(self._pending)
+        return self._load_committed()
+    
+    def _load_committed(self) -> Optional[Dict[str, Any]]:
+        """加载已落盘的数据，不含缓冲区中尚未写入的修改"""
         try:
-            if not os.path.exists(self.data_file):
+            try:
+                stat = os.stat(self.data_file)
+            except FileNotFoundError:
+                self._cache_drop()
                 return None
             
-            # 读取加密数据
-            with open(self.data_file, 'rb') as f:
-                encrypted_data = f.read()
+            with _data_cache_lock:
+                cached = _data_cache.get(self._cache_key())
+            if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+                return copy.deepcopy(cached[2])
             
-            # 解密数据
-            decrypted_data = self.cipher.decrypt(encrypted_data)
-            
-            # 反序列化数据
-            data = json.loads(decrypted_data.decode('utf-8'))
-            
-            return data
+            # 缓存未命中时在读锁内读取，与其他进程的写入互斥
+            with self.lock.shared():
+                return self._read_file()
             
         except Exception as e:
             print(f"加载数据失败: {e}")
             return None
     
+    def _read_file(self) -> Optional[Dict[str, Any]]:
+        """读取并解密数据文件，调用方负责加锁"""
+        try:
+            stat = os.stat(self.data_file)
+        except FileNotFoundError:
+            self._cache_drop()
+            return None
+        
+        # 读取加密数据
+        with open(self.data_file, 'rb') as f:
+            encrypted_data = f.read()
+        
+        # 解密数据
+        decrypted_data = self.cipher.decrypt(encrypted_data)
+        
+        # 反序列化数据
+        data = json.loads(decrypted_data.decode('utf-8'))
+        
+        with _data_cache_lock:
+            _data_cache[self._cache_key()] = (stat.st_mtime_ns, stat.st_size, copy.deepcopy(data))
+        
+        return data
+    
+    def update(self, mutator: Callable[[Dict[str, Any]], None]) -> bool:
+        """在写锁内读取最新数据、修改并写回，避免多个进程的读-改-写互相覆盖
+
+        启用延迟写入时修改缓冲区中的数据（没有缓冲时先读取最新数据）并重新计时，
+        写锁只在 flush() 落盘时持有，flush_delay 内的多次更新合并为一次写入
+        """
+        if self.flush_delay > 0:
+            try:
+                with self._pending_lock:
+                    if self._pending is not None:
+                        data = copy.deepcopy(self._pending)
+                    else:
+                        data = self._load_committed() or {}
+                    mutator(data)
+                    data['_timestamp'] = datetime.now().isoformat()
+                    data['_version'] = "1.0"
+                    self._pending = data
+                    self._schedule_flush()
+                return True
+            except Exception as e:
+                print(f"更新数据失败: {e}")
+                return False
+        
+        with self._flush_lock:
+            with self._pending_lock:
+                pending = self._pending
+                self._discard_pending()
+            try:
+                with self.lock.exclusive():
+                    data = pending if pending is not None else (self._read_file() or {})
+                    mutator(data)
+                    data['_timestamp'] = datetime.now().isoformat()
+                    data['_version'] = "1.0"
+                    return self._write(data, locked=True)
+            except Exception as e:
+                print(f"更新数据失败: {e}")
+                return False
+    
     def clear_data(self) -> bool:
         """清除存储的数据"""
         try:
+            with self._pending_lock:
+                self._discard_pending()
             if os.path.exists(self.data_file):
                 os.remove(self.data_file)
+            self._cache_drop()
             return True
         except Exception as e:
             print(f"清除数据失败: {e}")
@@ -175,34 +356,119 @@ class SecureStorage:
 class CookieManager:
     """Cookie管理器 - 提供Cookie的存储、验证和刷新功能"""
     
-    def __init__(self):
+    def __init__(self, validation_ttl: float = 3600, max_workers: int = 8, deadline: float = 30):
         self.storage = SecureStorage()
         self.target_domain = "k8n.cn"
         self.target_cookie = "remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d"
+        
+        # 验证结果缓存: Cookie指纹 -> (是否有效, 验证时间)，TTL内同一Cookie只验证一次
+        self.validation_ttl = validation_ttl
+        self._validation_cache = {}
+        self._cache_lock = threading.Lock()
+        
+        # 批量验证的并发数与总时限
+        self.max_workers = max_workers
+        self.deadline = deadline
+        
+        # Cookie按账号保存在SQLite中，每个账号一行；安全存储只保留用户信息与验证时间
+        self._account_store = None
+        self._migrated = False
+    
+    @property
+    def account_store(self) -> AccountStore:
+        """按账号加密存储，首次使用时在安全存储目录下打开"""
+        if self._account_store is None:
+            self._account_store = AccountStore(
+                os.path.join(self.storage.storage_path, "accounts.db"), self.storage.cipher
+            )
+        return self._account_store
+    
+    def _migrate_legacy_cookies(self):
+        """把旧版本保存在加密数据文件中的Cookie列表迁移到账号存储"""
+        if self._migrated:
+            return
+        self._migrated = True
+        data = self.storage.load_data()
+        if not data or 'cookies' not in data:
+            return
+        if not len(self.account_store):
+            self.account_store.put_many(
+                (self._fingerprint(cookie), {'cookie': cookie, 'position': position}, 'unknown')
+                for position, cookie in enumerate(dict.fromkeys(data['cookies']))
+            )
+        self.storage.update(lambda data: data.pop('cookies', None))
+    
+    def stored_cookies(self) -> List[str]:
+        """账号存储中的全部Cookie，按保存时的顺序"""
+        self._migrate_legacy_cookies()
+        records = [record for _, _, record in self.account_store.iter_records()]
+        records.sort(key=lambda record: record.get('position', 0))
+        return [record['cookie'] for record in records]
+    
+    def _fingerprint(self, cookie: str) -> str:
+        """Cookie指纹，只取登录凭据部分，备注变化不影响缓存"""
+        match = re.search(rf'{self.target_cookie}=([^;]+)', cookie)
+        value = match.group(1) if match else cookie
+        return hashlib.sha256(value.encode('utf-8')).hexdigest()
+    
+    def invalidate(self, cookie: str = None):
+        """使Cookie的验证缓存失效，不指定Cookie时清空全部缓存"""
+        with self._cache_lock:
+            if cookie is None:
+                self._validation_cache.clear()
+            else:
+                self._validation_cache.pop(self._fingerprint(cookie), None)
     
-    def save_cookies(self, cookies: List[str], user_info: Dict = None) -> bool:
-        """保存Cookie到安全存储"""
+    def save_cookies(self, cookies: List[str], user_info: Dict = None, validate: bool = True) -> bool:
+        """保存Cookie到安全存储
+
+        validate=False 时只写本地存储、不发网络请求，Cookie的有效性由 validate_stored_cookies 单独验证
+        """
         try:
-            data = self.storage.load_data() or {}
-            
-            # 更新Cookie数据
-            data['cookies'] = cookies
-            data['user_info'] = user_info or {}
-            data['last_updated'] = datetime.now().isoformat()
+            self._migrate_legacy_cookies()
+            existing = {account_id: (status, record)
+                        for account_id, status, record in self.account_store.iter_records()}
             
-            # 验证Cookie有效性
-            valid_cookies = []
-            for cookie in cookies:
-                if self.validate_cookie(cookie):
-                    valid_cookies.append(cookie)
-                    print(f"✅ Cookie验证通过")
-                else:
-                    print(f"❌ Cookie验证失败")
+            if not validate:
+                # 内容未变化时不写入
+                stored = [record['cookie'] for _, record in
+                          sorted(existing.values(), key=lambda item: item[1].get('position', 0))]
+                data = self.storage.load_data() or {}
+                if stored == list(dict.fromkeys(cookies)) and data.get('user_info') == (user_info or {}):
+                    return True
+                results = {}
+                valid_cookies = list(cookies)
+            else:
+                # 验证Cookie有效性，网络请求在写入之外进行
+                results = self.validate_cookies(cookies, on_result=lambda cookie, valid: print(
+                    "✅ Cookie验证通过" if valid else
+                    "❌ Cookie验证失败" if valid is False else
+                    "⏳ Cookie验证超时，暂时保留"
+                ))
+                valid_cookies = [cookie for cookie in cookies if results.get(cookie) is not False]
             
-            data['cookies'] = valid_cookies
-            data['validation_time'] = datetime.now().isoformat()
+            # 一个事务内只写入新增或变化的账号，并删除不再保存的账号
+            with self.account_store.transaction() as store:
+                kept = set()
+                for position, cookie in enumerate(dict.fromkeys(valid_cookies)):
+                    account_id = self._fingerprint(cookie)
+                    kept.add(account_id)
+                    record = {'cookie': cookie, 'position': position}
+                    if results.get(cookie):
+                        status = 'valid'
+                    else:
+                        status = existing.get(account_id, ('unknown',))[0]
+                    if existing.get(account_id) != (status, record):
+                        store.put(account_id, record, status)
+                for account_id in existing.keys() - kept:
+                    store.delete(account_id)
             
-            return self.storage.save_data(data)
+            def apply(data):
+                data['user_info'] = user_info or {}
+                data['last_updated'] = datetime.now().isoformat()
+                if validate:
+                    data['validation_time'] = datetime.now().isoformat()
+            return self.storage.update(apply)
             
         except Exception as e:
             print(f"保存Cookie失败: {e}")
@@ -211,20 +477,18 @@ class CookieManager:
     def load_cookies(self) -> List[str]:
         """从安全存储加载Cookie"""
         try:
-            data = self.storage.load_data()
-            if not data:
+            cookies = self.stored_cookies()
+            if not cookies:
                 return []
             
-            cookies = data.get('cookies', [])
-            
             # 检查Cookie是否需要验证
-            last_validation = data.get('validation_time')
+            last_validation = (self.storage.load_data() or {}).get('validation_time')
             if last_validation:
                 last_time = datetime.fromisoformat(last_validation)
                 if datetime.now() - last_time > timedelta(hours=1):
                     # 超过1小时，重新验证
                     print("🔍 Cookie已超过1小时未验证，正在重新验证...")
-                    cookies = self.refresh_cookies(cookies)
+                    cookies = self.validate_stored_cookies()
             
             return cookies
             
@@ -232,11 +496,29 @@ class CookieManager:
             print(f"加载Cookie失败: {e}")
             return []
     
-    def validate_cookie(self, cookie: str) -> bool:
-        """验证Cookie有效性"""
+    def validate_cookie(self, cookie: str, use_cache: bool = True) -> bool:
+        """验证Cookie有效性，TTL内直接返回缓存的结果"""
+        fingerprint = self._fingerprint(cookie)
+        
+        if use_cache:
+            with self._cache_lock:
+                cached = self._validation_cache.get(fingerprint)
+            if cached and time.monotonic() - cached[1] < self.validation_ttl:
+                return cached[0]
+        
+        valid = self._check_cookie(cookie)
+        if valid is None:
+            # 网络异常不缓存，下次重新验证
+            return False
+        
+        with self._cache_lock:
+            self._validation_cache[fingerprint] = (valid, time.monotonic())
+        return valid
+    
+    def _check_cookie(self, cookie: str) -> Optional[bool]:
+        """请求k8n.cn验证Cookie，网络异常时返回None"""
         try:
             # 提取Cookie值
-            import re
             pattern = r'remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d=([^;]+)'
             match = re.search(pattern, cookie)
             
@@ -264,28 +546,79 @@ class CookieManager:
             
         except Exception as e:
             print(f"验证Cookie失败: {e}")
-            return False
+            return None
+    
+    def validate_cookies(self, cookies: List[str],
+                         on_result: Callable[[str, Optional[bool]], None] = None) -> Dict[str, Optional[bool]]:
+        """并发验证多个Cookie，返回 Cookie -> 是否有效；超过总时限仍未完成的为None
+
+        每个Cookie验证完成时立即回调 on_result，未完成的在超时后以None回调
+        """
+        results = {}
+        pending = list(dict.fromkeys(cookies))
+        if not pending:
+            return results
+        
+        executor = ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(pending))))
+        futures = {executor.submit(self.validate_cookie, cookie): cookie for cookie in pending}
+        
+        try:
+            for future in as_completed(futures, timeout=self.deadline):
+                cookie = futures[future]
+                results[cookie] = future.result()
+                if on_result:
+                    on_result(cookie, results[cookie])
+        except FutureTimeoutError:
+            print(f"⏳ Cookie验证超过 {self.deadline:g} 秒，{len(pending) - len(results)} 个未完成")
+            for future, cookie in futures.items():
+                if cookie not in results:
+                    future.cancel()
+                    results[cookie] = None
+                    if on_result:
+                        on_result(cookie, None)
+        finally:
+            # 不等待仍在进行的请求，避免超时后继续阻塞
+            executor.shutdown(wait=False)
+        
+        return results
     
     def refresh_cookies(self, cookies: List[str]) -> List[str]:
-        """刷新Cookie有效性"""
-        valid_cookies = []
+        """刷新Cookie有效性，超时未完成验证的Cookie暂时保留"""
+        return self._refresh(cookies, stamp=False)
+    
+    def _refresh(self, cookies: List[str], stamp: bool) -> List[str]:
+        """验证Cookie并在一次写入中移除已确认失效的Cookie；stamp 为True时即使没有变化也更新验证时间"""
+        results = self.validate_cookies(cookies, on_result=lambda cookie, valid: print(
+            "✅ Cookie仍然有效" if valid else
+            "❌ Cookie已失效" if valid is False else
+            "⏳ Cookie验证超时，暂时保留"
+        ))
+        valid_cookies = [cookie for cookie in cookies if results.get(cookie) is not False]
         
-        for cookie in cookies:
-            if self.validate_cookie(cookie):
-                valid_cookies.append(cookie)
-                print(f"✅ Cookie仍然有效")
-            else:
-                print(f"❌ Cookie已失效")
+        # 按账号更新：删除已确认失效的账号，记录仍然有效的账号状态，不影响其他账号
+        try:
+            with self.account_store.transaction() as store:
+                for cookie, valid in results.items():
+                    if valid is False:
+                        store.delete(self._fingerprint(cookie))
+                    elif valid:
+                        store.update_status(self._fingerprint(cookie), 'valid')
+        except Exception as e:
+            print(f"更新账号状态失败: {e}")
         
-        # 更新存储
-        if valid_cookies != cookies:
-            data = self.storage.load_data() or {}
-            data['cookies'] = valid_cookies
-            data['validation_time'] = datetime.now().isoformat()
-            self.storage.save_data(data)
+        if stamp or valid_cookies != cookies:
+            self.storage.update(lambda data: data.update(validation_time=datetime.now().isoformat()))
         
         return valid_cookies
     
+    def validate_stored_cookies(self) -> List[str]:
+        """验证已保存的Cookie，移除失效的Cookie并更新验证时间，返回有效Cookie"""
+        cookies = self.stored_cookies()
+        if not cookies:
+            return []
+        
+        return self._refresh(cookies, stamp=True)
+    
     def get_user_info(self) -> Dict:
         """获取用户信息"""
         try:
@@ -298,6 +631,11 @@ class CookieManager:
     
     def clear_all_data(self) -> bool:
         """清除所有存储的数据"""
+        try:
+            self.account_store.clear()
+        except Exception as e:
+            print(f"清除账号存储失败: {e}")
+            return False
         return self.storage.clear_data()
 
 
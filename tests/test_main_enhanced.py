@@ -12,6 +12,9 @@ from unittest.mock import Mock, patch, MagicMock
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from main_enhanced import EnhancedAutoCheckBJMF
+from modules.punch_index import SignedPunchIndex
+from modules.punch_history import PunchHistory
+from modules.retry_queue import RetryQueue
 
 
 class TestEnhancedAutoCheckBJMF(unittest.TestCase):
@@ -23,6 +26,8 @@ class TestEnhancedAutoCheckBJMF(unittest.TestCase):
         self.app = EnhancedAutoCheckBJMF()
         self.app.current_directory = self.temp_dir
         self.app.config_file = os.path.join(self.temp_dir, "config.json")
+        self.app.punch_index = SignedPunchIndex(os.path.join(self.temp_dir, "signed_punches.json"))
+        self.app.punch_history = PunchHistory(os.path.join(self.temp_dir, "punch_history.json"))
     
     def tearDown(self):
         """测试后清理"""
@@ -140,6 +145,9 @@ class TestEnhancedAutoCheckBJMF(unittest.TestCase):
             
             self.assertEqual(saved_config['class'], '12345')
             self.assertEqual(saved_config['lat'], '39.904697')
+            
+            # 保存配置不触发Cookie的网络验证
+            self.assertFalse(mock_save.call_args.kwargs.get('validate', True))
     
     def test_load_config_from_file(self):
         """测试从文件加载配置"""
@@ -167,6 +175,82 @@ class TestEnhancedAutoCheckBJMF(unittest.TestCase):
             self.assertTrue(result)
             self.assertEqual(self.app.config['class'], '12345')
     
+    def test_config_round_trip_keeps_extra_keys(self):
+        """测试从安全存储重新加载配置时保留配置文件中的其他配置项"""
+        self.app.config = {
+            'class': '12345',
+            'lat': '39.904697',
+            'lng': '116.407178',
+            'acc': '100',
+            'cookie': ['username=test;remember_student_xxx=test_cookie'],
+            'scheduletime': '08:30',
+            'pushplus': '',
+            'debug': True,
+            'configLock': True,
+            'engine': 'async',
+            'watch': True,
+            'jobs': [{'name': '上午课', 'weekdays': [1], 'times': ['08:30'], 'class': '12345'}]
+        }
+        
+        with patch.object(self.app.cookie_manager, 'save_cookies') as mock_save:
+            self.app.save_config()
+        user_info = mock_save.call_args.args[1]
+        
+        saved = dict(self.app.config)
+        self.app.config = {}
+        with patch.object(self.app.cookie_manager.storage, 'load_data', return_value={'user_info': user_info}), \
+             patch.object(self.app.cookie_manager, 'load_cookies', return_value=saved['cookie']):
+            self.assertTrue(self.app.load_config())
+        
+        for key in ('jobs', 'engine', 'watch', 'debug'):
+            self.assertEqual(self.app.config[key], saved[key])
+        self.assertEqual(self.app.config['class'], '12345')
+        self.assertEqual(self.app.config['scheduletime'], '08:30')
+    
+    def test_secure_storage_config_validated_after_merge(self):
+        """测试从安全存储加载时合并的配置文件项同样经过校验"""
+        user_info = {'class_id': '12345', 'location': {'lat': 39.904697, 'lng': 116.407178, 'alt': 100}}
+        cookies = ['username=test;remember_student_xxx=test_cookie']
+        
+        for extra in ({'parser': 'unknown'}, {'jobs': [{'name': '坏任务', 'times': ['25:00']}]}):
+            with open(self.app.config_file, 'w', encoding='utf-8') as f:
+                json.dump(extra, f)
+            self.app.config = {}
+            with patch.object(self.app.cookie_manager.storage, 'load_data', return_value={'user_info': user_info}), \
+                 patch.object(self.app.cookie_manager, 'load_cookies', return_value=cookies):
+                self.assertFalse(self.app.load_config())
+            self.assertEqual(self.app.config, {})
+    
+    def test_run_coalesces_storage_writes(self):
+        """测试 run() 默认启用延迟写入，运行期间的多次保存在退出时合并为一次写入"""
+        from modules import secure_storage
+        storage = self.app.cookie_manager.storage
+        storage.storage_path = self.temp_dir
+        storage.key_file = os.path.join(self.temp_dir, "test.key")
+        storage.data_file = os.path.join(self.temp_dir, "test_data.enc")
+        storage.cipher = storage._get_or_create_cipher()
+        cookies = ['username=a;remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d=x']
+        self.app.config = {'cookie': cookies}
+        
+        def job():
+            for i in range(3):
+                self.app.cookie_manager.save_cookies(cookies, {'class_id': str(i)}, validate=False)
+            with patch.object(self.app.cookie_manager, 'validate_cookie', return_value=True):
+                self.app.cookie_manager.validate_stored_cookies()
+        
+        with patch.object(self.app, 'check_and_setup_config', return_value=True), \
+             patch.object(self.app, 'job', side_effect=job), \
+             patch.object(self.app, 'wait_for_retries'), \
+             patch('builtins.input', return_value=''), \
+             patch('modules.secure_storage.atomic_write', wraps=secure_storage.atomic_write) as mock_write:
+            self.app.run()
+        
+        self.assertEqual(storage.flush_delay, 1.0)
+        self.assertEqual(mock_write.call_count, 1)
+        data = storage._load_committed()
+        self.assertEqual(data['user_info'], {'class_id': '2'})
+        self.assertIn('validation_time', data)
+    
     def test_load_config_invalid_json(self):
         """测试加载无效JSON配置"""
         # 创建无效JSON文件
@@ -191,7 +275,7 @@ class TestEnhancedAutoCheckBJMF(unittest.TestCase):
         diff = abs(modified - original)
         self.assertLess(diff, 0.01)  # 偏移应该很小
     
-    @patch('requests.get')
+    @patch('requests.Session.get')
     def test_qiandao_success(self, mock_get):
         """测试签到成功"""
         # 设置配置
@@ -214,7 +298,7 @@ class TestEnhancedAutoCheckBJMF(unittest.TestCase):
         mock_get.return_value = mock_response
         
         # Mock POST请求
-        with patch('requests.post') as mock_post:
+        with patch('requests.Session.post') as mock_post:
             mock_post_response = Mock()
             mock_post_response.status_code = 200
             mock_post_response.text = '<div id="title">签到成功</div>'
@@ -226,7 +310,112 @@ class TestEnhancedAutoCheckBJMF(unittest.TestCase):
             self.assertEqual(len(error_cookies), 0)
             self.assertEqual(null_cookie, 0)
     
-    @patch('requests.get')
+    @patch('requests.Session.post')
+    @patch('requests.Session.get')
+    def test_qiandao_skips_signed_punches(self, mock_get, mock_post):
+        """测试重复运行时已签到的任务不再提交"""
+        self.app.config = {
+            'class': '12345',
+            'lat': '39.904697',
+            'lng': '116.407178',
+            'acc': '100'
+        }
+        
+        mock_get.return_value = Mock(status_code=200, text='<html><title>课程页面</title><script>punch_gps(67890)</script></html>')
+        mock_post.return_value = Mock(status_code=200, text='<div id="title">签到成功</div>')
+        
+        cookies = ['username=test;remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d=test_cookie']
+        self.app.qiandao(cookies)
+        self.app.punch_index = SignedPunchIndex(self.app.punch_index.index_file)
+        error_cookies, null_cookie = self.app.qiandao(cookies)
+        
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(mock_post.call_count, 1)
+        self.assertEqual(error_cookies, [])
+        self.assertEqual(self.app.last_results[0]['outcome'], 'already_signed')
+    
+    @patch('requests.Session.get')
+    def test_qiandao_probe_skips_idle_accounts(self, mock_get):
+        """测试探测模式下无签到任务时只请求一次签到页面"""
+        self.app.config = {
+            'class': '12345',
+            'lat': '39.904697',
+            'lng': '116.407178',
+            'acc': '100',
+            'probe': True
+        }
+        
+        def fake_get(url, headers=None, timeout=None):
+            if headers['Cookie'].endswith('expired'):
+                return Mock(status_code=200, text='<html><title>出错啦</title></html>')
+            return Mock(status_code=200, text='<html><title>课程页面</title></html>')
+        mock_get.side_effect = fake_get
+        
+        prefix = 'remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d='
+        cookies = [f'{prefix}expired', f'{prefix}a', f'{prefix}b', f'{prefix}c']
+        error_cookies, null_cookie = self.app.qiandao(cookies)
+        
+        # 失效账号不作为探测结果，由下一个账号继续探测
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(error_cookies, [])
+        self.assertEqual([r['outcome'] for r in self.app.last_results],
+                         ['expired_login', 'no_punch', 'no_punch', 'no_punch'])
+    
+    @patch('requests.Session.post')
+    @patch('requests.Session.get')
+    def test_qiandao_probe_fans_out_on_punch(self, mock_get, mock_post):
+        """测试探测到签到任务后为所有账号签到"""
+        self.app.config = {
+            'class': '12345',
+            'lat': '39.904697',
+            'lng': '116.407178',
+            'acc': '100',
+            'probe': True,
+            'workers': 2
+        }
+        
+        mock_get.return_value = Mock(status_code=200, text='<html><title>课程页面</title><script>punch_gps(67890)</script></html>')
+        mock_post.return_value = Mock(status_code=200, text='<div id="title">签到成功</div>')
+        
+        prefix = 'remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d='
+        cookies = [f'{prefix}a', f'{prefix}b', f'{prefix}c']
+        self.app.qiandao(cookies)
+        
+        self.assertEqual(mock_get.call_count, 3)
+        self.assertEqual(mock_post.call_count, 3)
+        self.assertEqual([r['uid'] for r in self.app.last_results], [0, 1, 2])
+    
+    @patch('requests.Session.get')
+    def test_qiandao_reuses_pooled_session(self, mock_get):
+        """测试多账号签到共用同一连接池会话"""
+        self.app.config = {
+            'class': '12345',
+            'lat': '39.904697',
+            'lng': '116.407178',
+            'acc': '100'
+        }
+        
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.text = '<html><title>课程页面</title></html>'
+        mock_get.return_value = mock_response
+        
+        session = self.app.session_pool.get_session()
+        cookies = [
+            'username=a;remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d=cookie_a',
+            'username=b;remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d=cookie_b'
+        ]
+        self.app.qiandao(cookies)
+        
+        self.assertIs(self.app.session_pool.get_session(), session)
+        self.assertEqual(mock_get.call_count, 2)
+        sent_cookies = [c.kwargs['headers']['Cookie'] for c in mock_get.call_args_list]
+        self.assertEqual(sent_cookies, [
+            'remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d=cookie_a',
+            'remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d=cookie_b'
+        ])
+    
+    @patch('requests.Session.get')
     def test_qiandao_no_tasks(self, mock_get):
         """测试无签到任务"""
         # 设置配置
@@ -254,6 +443,415 @@ class TestEnhancedAutoCheckBJMF(unittest.TestCase):
         self.assertEqual(len(error_cookies), 0)
         self.assertEqual(null_cookie, 0)
     
+    @patch('requests.Session.get')
+    def test_qiandao_thread_pool(self, mock_get):
+        """测试线程池模式合并结果并保持账号顺序"""
+        self.app.config = {
+            'class': '12345',
+            'lat': '39.904697',
+            'lng': '116.407178',
+            'acc': '100',
+            'workers': 4
+        }
+        
+        def fake_get(url, headers=None, timeout=None):
+            response = Mock()
+            response.status_code = 500 if headers['Cookie'].endswith(('c1', 'c4')) else 200
+            response.text = '<html><title>课程页面</title></html>'
+            return response
+        
+        mock_get.side_effect = fake_get
+        prefix = 'remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d='
+        cookies = [f'{prefix}c{i}' for i in range(6)] + ['invalid_cookie']
+        
+        error_cookies, null_cookie = self.app.qiandao(cookies)
+        
+        self.assertEqual(error_cookies, [f'{prefix}c1', f'{prefix}c4'])
+        self.assertEqual(null_cookie, 1)
+        self.assertEqual(mock_get.call_count, 6)
+    
+    @patch('requests.Session.get')
+    def test_qiandao_expired_login_not_retried(self, mock_get):
+        """测试登录失效的账号不进入重试列表"""
+        self.app.config = {
+            'class': '12345',
+            'lat': '39.904697',
+            'lng': '116.407178',
+            'acc': '100'
+        }
+        
+        mock_response = Mock()
+        mock_response.status_code = 200
+        mock_response.text = '<html><title>出错啦</title></html>'
+        mock_get.return_value = mock_response
+        
+        cookies = ['username=test;remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d=expired']
+        error_cookies, null_cookie = self.app.qiandao(cookies)
+        
+        self.assertEqual(error_cookies, [])
+        self.assertEqual(null_cookie, 0)
+        self.assertEqual(self.app.last_results[0]['outcome'], 'expired_login')
+        self.assertEqual(self.app.last_results[0]['status'], 'failed')
+    
+    @patch('requests.Session.get')
+    def test_qiandao_network_error_retried(self, mock_get):
+        """测试网络异常的账号进入重试列表"""
+        import requests
+        self.app.config = {
+            'class': '12345',
+            'lat': '39.904697',
+            'lng': '116.407178',
+            'acc': '100'
+        }
+        mock_get.side_effect = requests.exceptions.ConnectTimeout()
+        
+        cookies = ['username=test;remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d=slow']
+        error_cookies, _ = self.app.qiandao(cookies)
+        
+        self.assertEqual(error_cookies, cookies)
+        self.assertEqual(self.app.last_results[0]['outcome'], 'transient_network')
+    
+    def test_qiandao_thread_pool_logs_grouped_per_account(self):
+        """测试线程池模式下每个账号的输出连续不交错"""
+        self.app.config = {
+            'class': '12345',
+            'lat': '39.904697',
+            'lng': '116.407178',
+            'acc': '100',
+            'workers': 3
+        }
+        
+        def fake_sign(session, uid, cookie):
+            return {
+                'uid': uid,
+                'cookie': cookie,
+                'status': 'ok',
+                'logs': [('print', f'{uid}-start'), ('print', f'{uid}-end')]
+            }
+        
+        with patch.object(self.app, '_sign_account', side_effect=fake_sign), \
+             patch('builtins.print') as mock_print:
+            self.app.qiandao(['a', 'b', 'c'])
+        
+        lines = [c.args[0] for c in mock_print.call_args_list]
+        for uid in range(3):
+            index = lines.index(f'{uid}-start')
+            self.assertEqual(lines[index + 1], f'{uid}-end')
+    
+    def test_rate_limiter_follows_config(self):
+        """测试限流器按配置创建并在配置不变时复用"""
+        self.app.config = {'rate_limit': 3, 'rate_burst': 4}
+        limiter = self.app.get_rate_limiter()
+        self.assertEqual((limiter.rate, limiter.burst), (3.0, 4))
+        self.assertIs(self.app.get_rate_limiter(), limiter)
+        
+        self.app.config['rate_limit'] = 6
+        self.assertEqual(self.app.get_rate_limiter().rate, 6.0)
+    
+    def test_run_checkin_selects_async_engine(self):
+        """测试按配置选择异步签到引擎"""
+        self.app.config = {
+            'class': '12345',
+            'lat': '39.904697',
+            'lng': '116.407178',
+            'acc': '100',
+            'engine': 'async',
+            'concurrency': 20
+        }
+        
+        with patch('main_enhanced.AsyncCheckinEngine') as mock_engine_cls, \
+             patch.object(self.app, 'qiandao') as mock_qiandao:
+            mock_engine_cls.is_available.return_value = True
+            mock_engine_cls.return_value.run.return_value = (['bad'], 0)
+            
+            result = self.app.run_checkin(['bad'])
+            
+            self.assertEqual(result, (['bad'], 0))
+            self.assertEqual(mock_engine_cls.call_args.kwargs['concurrency'], 20)
+            mock_qiandao.assert_not_called()
+    
+    def test_run_checkin_async_fallback(self):
+        """测试缺少aiohttp时回退到同步签到"""
+        self.app.config = {'engine': 'async'}
+        
+        with patch('main_enhanced.AsyncCheckinEngine') as mock_engine_cls, \
+             patch.object(self.app, 'qiandao', return_value=([], 0)) as mock_qiandao:
+            mock_engine_cls.is_available.return_value = False
+            
+            self.assertEqual(self.app.run_checkin(['c']), ([], 0))
+            mock_qiandao.assert_called_once_with(['c'])
+    
+    @patch('requests.Session.get')
+    def test_poll_once_signs_new_punches(self, mock_get):
+        """测试监视模式只在出现新签到时触发签到"""
+        from modules.punch_watcher import PunchWatcher
+        prefix = 'remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d='
+        self.app.config = {
+            'class': '12345',
+            'cookie': [f'{prefix}expired', f'{prefix}a'],
+            'time': 15
+        }
+        
+        def fake_get(url, headers=None, timeout=None):
+            if headers['Cookie'].endswith('expired'):
+                return Mock(status_code=200, text='<html><title>出错啦</title></html>')
+            return Mock(status_code=200, text='<html><title>课程</title><script>punch_gps(678)</script></html>')
+        mock_get.side_effect = fake_get
+        
+        watcher = PunchWatcher(self.app._watch_interval())
+        self.assertEqual(watcher.interval, 15)
+        
+        with patch.object(self.app, 'run_checkin', return_value=([], 0)) as mock_checkin:
+            self.assertEqual(self.app.poll_once(watcher), ['678'])
+            self.assertEqual(self.app.poll_once(watcher), [])
+            
+            mock_checkin.assert_called_once_with(self.app.config['cookie'])
+        
+        # 第二次轮询的页面与第一次相同，直接复用解析结果
+        self.assertEqual(self.app.get_page_parser().cache.get_stats()['hits'], 2)
+        self.assertEqual(watcher.get_stats()['punches'], 1)
+        self.assertEqual(len(self.app.punch_history.events('12345')), 1)
+        self.assertTrue(self.app._build_poll_policy().has_windows)
+    
+    @patch('requests.Session.get')
+    def test_poll_once_fetch_failure(self, mock_get):
+        """测试轮询失败时不触发签到"""
+        from modules.punch_watcher import PunchWatcher
+        self.app.config = {
+            'class': '12345',
+            'cookie': ['remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d=a']
+        }
+        mock_get.return_value = Mock(status_code=502, text='')
+        
+        with patch.object(self.app, 'run_checkin') as mock_checkin:
+            self.assertEqual(self.app.poll_once(PunchWatcher()), [])
+            mock_checkin.assert_not_called()
+        self.assertEqual(self.app._watch_interval(), 30)
+    
+    def test_job_queues_failures_without_blocking(self):
+        """测试签到失败的Cookie进入重试队列而不阻塞"""
+        self.app.config = {
+            'class': '12345',
+            'lat': '39.904697',
+            'lng': '116.407178',
+            'acc': '100',
+            'cookie': ['good', 'bad']
+        }
+        
+        with patch.object(self.app.cookie_manager, 'refresh_cookies', return_value=['good', 'bad']), \
+             patch.object(self.app, 'run_checkin', return_value=(['bad'], 0)), \
+             patch.object(self.app, 'save_config'), \
+             patch('time.sleep') as mock_sleep:
+            self.app.job()
+        
+        mock_sleep.assert_not_called()
+        self.assertIn('bad', self.app.retry_queue)
+        self.assertEqual(self.app.config['cookie'], ['good', 'bad'])
+    
+    def test_process_retries_backoff_and_exhaustion(self):
+        """测试重试按账号退避，次数用尽后移出配置"""
+        self.app.config = {'cookie': ['a', 'b', 'c'], 'max_retries': 2}
+        self.app._configure_retry_queue()
+        self.app.retry_queue.schedule('a', attempt=0, now=0)
+        self.app.retry_queue.schedule('b', attempt=1, now=0)
+        
+        with patch('time.monotonic', return_value=10000), \
+             patch.object(self.app, 'run_checkin', return_value=(['a', 'b'], 0)) as mock_run, \
+             patch.object(self.app, 'save_config') as mock_save:
+            self.app.process_retries()
+        
+        mock_run.assert_called_once_with(['a', 'b'])
+        self.assertIn('a', self.app.retry_queue)
+        self.assertNotIn('b', self.app.retry_queue)
+        self.assertEqual(self.app.retry_queue.next_due(), 10000 + 900)
+        self.assertEqual(self.app.config['cookie'], ['a', 'c'])
+        mock_save.assert_called_once()
+    
+    def test_retries_run_as_scheduler_events(self):
+        """测试重试任务作为调度事件在到期时执行"""
+        self.app.retry_queue = RetryQueue(base_delay=0, backoff=2, max_retries=2)
+        
+        self.app._schedule_retries(['a'])
+        event = self.app._retry_event
+        self.assertEqual(event['due'], self.app.retry_queue.next_due())
+        self.assertEqual(self.app.scheduler.next_due(), event['due'])
+        
+        with patch.object(self.app, 'run_checkin', return_value=([], 0)) as mock_checkin:
+            self.assertEqual(self.app.scheduler.run_pending(), 1)
+            mock_checkin.assert_called_once_with(['a'])
+        
+        self.assertEqual(len(self.app.retry_queue), 0)
+        self.assertIsNone(self.app._retry_event)
+        self.assertIsNone(self.app.scheduler.next_due())
+    
+    @patch('requests.Session.get')
+    def test_scheduled_job_uses_bound_class_and_accounts(self, mock_get):
+        """测试计划任务只为绑定的账号在指定班级签到，重试沿用该班级"""
+        prefix = 'remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d='
+        self.app.config = {
+            'class': '12345',
+            'lat': '39.904697',
+            'lng': '116.407178',
+            'acc': '100',
+            'cookie': [f'username=a;{prefix}a', f'username=b;{prefix}b'],
+            'jobs': [{'name': '下午课', 'weekdays': [2], 'times': ['14:00'], 'class': '54321', 'accounts': ['b']}]
+        }
+        mock_get.return_value = Mock(status_code=502, text='')
+        
+        jobs = self.app.register_jobs()
+        self.assertEqual(len(self.app.scheduler), 1)
+        
+        with patch.object(self.app.cookie_manager, 'refresh_cookies', side_effect=lambda c: c):
+            self.app.run_scheduled_job(jobs[0])
+        
+        self.assertEqual(mock_get.call_count, 1)
+        self.assertIn('/course/54321/', mock_get.call_args.args[0])
+        self.assertIsNone(self.app.active_class)
+        
+        task = self.app.retry_queue.pop_due(now=float('inf'))[0]
+        self.assertEqual((task['cookie'], task['class_id']), (f'username=b;{prefix}b', '54321'))
+    
+    @patch('socket.getaddrinfo')
+    @patch('requests.Session.get')
+    def test_prewarm_touches_accounts_and_marks_warm(self, mock_get, mock_dns):
+        """测试预热解析域名并访问各账号会话，之后的任务记为已预热"""
+        prefix = 'remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d='
+        self.app.config = {
+            'class': '12345',
+            'cookie': [f'{prefix}a', f'{prefix}b', 'invalid'],
+            'workers': 2,
+            'prewarm': 30
+        }
+        mock_get.return_value = Mock(status_code=200, text='')
+        
+        self.app.prewarm()
+        
+        mock_dns.assert_called_once()
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(mock_get.call_args.args[0], 'http://k8n.cn/student')
+        
+        self.app.last_results = [{'first_request_ms': 12.0}, {'first_request_ms': 30.0}]
+        self.app._report_first_request_latency()
+        self.app.last_results = [{'first_request_ms': 80.0}]
+        self.app._report_first_request_latency()
+        self.assertEqual(self.app.first_request_tails, {'warm': [30.0], 'cold': [80.0]})
+    
+    def test_prewarm_scheduled_before_fire_time(self):
+        """测试预热事件安排在任务触发前 prewarm 秒"""
+        self.app.config = {'prewarm': 30}
+        self.app._schedule_daily_job('08:30')
+        
+        events = sorted(entry[2]['wall_due'] for entry in self.app.scheduler._heap)
+        self.assertEqual(len(events), 2)
+        self.assertEqual((events[1] - events[0]).total_seconds(), 30)
+    
+    @patch('socket.getaddrinfo')
+    @patch('requests.Session.get')
+    def test_prewarm_stops_at_deadline(self, mock_get, mock_dns):
+        """测试限流等待超出预热时限的账号直接跳过"""
+        prefix = 'remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d='
+        self.app.config = {
+            'cookie': [f'{prefix}{i}' for i in range(5)],
+            'rate_limit': 1,
+            'rate_burst': 2
+        }
+        mock_get.return_value = Mock(status_code=200, text='')
+        
+        self.app.prewarm(deadline=0.5)
+        
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertLessEqual(mock_get.call_args.kwargs['timeout'], 0.5)
+        # 跳过的账号没有透支令牌，到点的签到请求最多等待一个令牌的间隔
+        self.assertLessEqual(self.app.get_rate_limiter().reserve(), 1.0)
+    
+    @patch('socket.getaddrinfo')
+    @patch('requests.Session.get')
+    def test_prewarm_skipped_for_async_engine(self, mock_get, mock_dns):
+        """测试异步引擎不预热连接池"""
+        self.app.config = {'engine': 'async', 'cookie': ['a']}
+        self.app.prewarm()
+        mock_dns.assert_not_called()
+        mock_get.assert_not_called()
+    
+    def test_prewarm_runs_off_scheduler_thread(self):
+        """测试预热事件在后台线程执行，并以提前量作为时限"""
+        import threading
+        self.app.config = {'prewarm': 30}
+        started = threading.Event()
+        calls = []
+        
+        def fake_prewarm(job, deadline):
+            calls.append((threading.current_thread(), deadline))
+            started.wait(1)
+        
+        with patch.object(self.app, 'prewarm', side_effect=fake_prewarm):
+            self.assertTrue(self.app.start_prewarm(None, 30))
+            self.assertFalse(self.app.start_prewarm(None, 30))
+            started.set()
+            self.app._prewarm_thread.join(1)
+        
+        self.assertEqual(len(calls), 1)
+        self.assertIsNot(calls[0][0], threading.current_thread())
+        self.assertEqual(calls[0][1], 30)
+    
+    def test_job_uses_prefetched_cookie_health(self):
+        """测试任务直接使用后台预取的Cookie检查结果"""
+        self.app.config = {'cookie': ['a', 'b'], 'health_prefetch': 120}
+        
+        with patch.object(self.app.health_prefetch, 'refresh', return_value=['a']) as mock_prefetch, \
+             patch.object(self.app.cookie_manager, 'refresh_cookies') as mock_refresh:
+            self.app.prefetch_cookie_health()
+            self.app.health_prefetch.wait(1)
+            mock_prefetch.assert_called_once_with(['a', 'b'])
+            
+            with patch.object(self.app, 'run_checkin', return_value=([], 0)) as mock_checkin, \
+                 patch.object(self.app, 'save_config'):
+                self.app.job()
+            
+            mock_refresh.assert_not_called()
+            mock_checkin.assert_called_once_with(['a'])
+    
+    def test_validate_json_config_invalid_jobs(self):
+        """测试无效计划任务验证"""
+        config_data = {
+            'class': '12345',
+            'lat': '39.904697',
+            'lng': '116.407178',
+            'acc': '100',
+            'cookie': [],
+            'jobs': [{'cron': '99 8 * * *'}]
+        }
+        self.assertFalse(self.app._validate_json_config(config_data))
+    
+    def test_fetch_streams_when_configured(self):
+        """测试配置 stream 后签到请求改为流式读取"""
+        session = Mock()
+        self.app.config = {'stream': True, 'stream_tail': 1024}
+        with patch('main_enhanced.fetch_streaming') as mock_stream:
+            self.app._fetch(session, 'GET', 'http://k8n.cn/x', None, timeout=10)
+            mock_stream.assert_called_once_with(session, 'GET', 'http://k8n.cn/x', None, tail_limit=1024, timeout=10)
+        
+        self.app.config = {}
+        self.app._fetch(session, 'POST', 'http://k8n.cn/x', None, data={})
+        session.post.assert_called_once_with('http://k8n.cn/x', data={})
+    
+    def test_page_parser_follows_config(self):
+        """测试页面解析器按配置选择后端，未知后端的配置验证失败"""
+        self.assertEqual(self.app.get_page_parser().backend, 'regex')
+        self.app.config['parser'] = 'html.parser'
+        self.assertEqual(self.app.get_page_parser().backend, 'html.parser')
+        
+        config_data = {'class': '12345', 'lat': '39.9', 'lng': '116.4', 'acc': '100',
+                       'cookie': [], 'parser': 'xml'}
+        self.assertFalse(self.app._validate_json_config(config_data))
+    
+    def test_process_retries_nothing_due(self):
+        """测试没有到期任务时不发起请求"""
+        self.app.retry_queue.schedule('a')
+        with patch.object(self.app, 'run_checkin') as mock_run:
+            self.app.process_retries()
+        mock_run.assert_not_called()
+    
     def test_qiandao_invalid_cookie_format(self):
         """测试无效Cookie格式"""
         self.app.config = {
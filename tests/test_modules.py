@@ -14,6 +14,23 @@ try:
     from modules.secure_storage import SecureStorage, CookieManager
     from modules.location_manager import LocationManager
     from modules.browser_cookie_extractor import BrowserCookieExtractor
+    from modules.http_session import SessionPool, fetch_streaming
+    from modules.async_engine import AsyncCheckinEngine
+    from modules.rate_limiter import TokenBucket
+    from modules.retry_queue import RetryQueue
+    from modules import punch_result
+    from modules.punch_index import SignedPunchIndex
+    from modules.punch_watcher import PunchWatcher
+    from modules.punch_history import PunchHistory, AdaptivePollPolicy, parse_timetable, simulate_polling
+    from modules.precise_scheduler import PreciseScheduler
+    from modules.job_spec import CronSpec, WeeklySpec, load_jobs, select_cookies
+    from modules.cookie_prefetch import CookieHealthPrefetch
+    from modules.account_store import AccountStore
+    from modules.file_lock import FileLock
+    from modules.punch_parser import (parse_punch_page, parse_punch_page_soup, parse_sign_result,
+                                      parse_sign_result_soup, punch_ids, benchmark_parsers, sample_punch_page,
+                                      PunchParser, ParseCache, available_backends, load_corpus,
+                                      punch_page_decided, sign_result_decided)
 except ImportError as e:
     print(f"模块导入失败: {e}")
     print("请确保所有模块文件都存在")
@@ -70,6 +87,49 @@ class TestSecureStorage(unittest.TestCase):
         self.assertIn('_timestamp', loaded_data)
         self.assertIn('_version', loaded_data)
     
+    def test_load_data_cached_until_file_changes(self):
+        """测试重复读取不再解密，文件被其他实例改写后重新读取"""
+        self.storage.save_data({'value': 1})
+        
+        with patch.object(self.storage.cipher, 'decrypt', wraps=self.storage.cipher.decrypt) as mock_decrypt:
+            first = self.storage.load_data()
+            first['value'] = 'modified'
+            self.assertEqual(self.storage.load_data()['value'], 1)
+            mock_decrypt.assert_not_called()
+        
+        # 其他进程直接改写文件
+        import json
+        with open(self.storage.data_file, 'wb') as f:
+            f.write(self.storage.cipher.encrypt(json.dumps({'value': 2, 'extra': True}).encode('utf-8')))
+        self.assertEqual(self.storage.load_data()['value'], 2)
+        
+        self.storage.clear_data()
+        self.assertIsNone(self.storage.load_data())
+    
+    def test_delayed_writes_coalesced(self):
+        """测试延迟写入合并多次保存，flush后落盘且不留临时文件"""
+        self.storage.flush_delay = 30
+        with patch('modules.secure_storage.atomic_write') as mock_write:
+            for value in range(5):
+                self.storage.save_data({'value': value})
+            self.assertEqual(self.storage.load_data()['value'], 4)
+            mock_write.assert_not_called()
+        
+        self.assertFalse(os.path.exists(self.storage.data_file))
+        self.assertTrue(self.storage.flush())
+        self.assertEqual(self.storage.load_data()['value'], 4)
+        self.assertEqual(sorted(os.listdir(self.temp_dir)), ['test.key', 'test_data.enc', 'test_data.enc.lock'])
+    
+    def test_failed_write_keeps_original_file(self):
+        """测试写入中途失败时原文件保持完整"""
+        self.storage.save_data({'value': 'original'})
+        
+        with patch('modules.secure_storage.os.replace', side_effect=OSError('disk full')):
+            self.assertFalse(self.storage.save_data({'value': 'new'}))
+        
+        self.assertEqual(self.storage.load_data()['value'], 'original')
+        self.assertEqual(sorted(os.listdir(self.temp_dir)), ['test.key', 'test_data.enc', 'test_data.enc.lock'])
+    
     def test_load_nonexistent_data(self):
         """测试加载不存在的数据"""
         result = self.storage.load_data()
@@ -175,6 +235,181 @@ class TestCookieManager(unittest.TestCase):
         result = self.cookie_manager.validate_cookie(test_cookie)
         self.assertFalse(result)
     
+    @patch('requests.get')
+    def test_validate_cookie_cached_within_ttl(self, mock_get):
+        """测试TTL内同一Cookie只验证一次，失效后重新验证"""
+        mock_get.return_value = Mock(status_code=200, url='http://k8n.cn/student/dashboard')
+        prefix = 'remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d='
+        
+        self.assertTrue(self.cookie_manager.validate_cookie(f'username=a;{prefix}valid'))
+        self.assertEqual(self.cookie_manager.refresh_cookies([f'username=b;{prefix}valid']),
+                         [f'username=b;{prefix}valid'])
+        self.assertEqual(mock_get.call_count, 1)
+        
+        self.cookie_manager.invalidate(f'{prefix}valid')
+        self.cookie_manager.validate_cookie(f'{prefix}valid')
+        self.assertEqual(mock_get.call_count, 2)
+        
+        self.cookie_manager.validation_ttl = 0
+        self.cookie_manager.validate_cookie(f'{prefix}valid')
+        self.assertEqual(mock_get.call_count, 3)
+    
+    @patch('requests.get')
+    def test_validate_cookie_network_error_not_cached(self, mock_get):
+        """测试网络异常的验证结果不缓存"""
+        import requests
+        mock_get.side_effect = requests.exceptions.ConnectionError()
+        cookie = 'remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d=valid'
+        
+        self.assertFalse(self.cookie_manager.validate_cookie(cookie))
+        
+        mock_get.side_effect = None
+        mock_get.return_value = Mock(status_code=200, url='http://k8n.cn/student/dashboard')
+        self.assertTrue(self.cookie_manager.validate_cookie(cookie))
+    
+    def test_validate_cookies_concurrently(self):
+        """测试批量验证并发进行，结果按原顺序过滤"""
+        import time
+        def slow_check(cookie):
+            time.sleep(0.2)
+            return 'valid' in cookie
+        cookies = [f'c{i}_valid' if i % 2 else f'c{i}_bad' for i in range(6)]
+        reported = []
+        
+        with patch.object(self.cookie_manager, 'validate_cookie', side_effect=slow_check):
+            start = time.monotonic()
+            results = self.cookie_manager.validate_cookies(
+                cookies, on_result=lambda cookie, valid: reported.append(cookie))
+            elapsed = time.monotonic() - start
+            self.assertLess(elapsed, 0.6)
+            self.assertEqual(sorted(reported), sorted(cookies))
+            self.assertEqual(results, {c: 'valid' in c for c in cookies})
+            self.assertEqual(self.cookie_manager.refresh_cookies(cookies),
+                             [c for c in cookies if 'valid' in c])
+    
+    def test_validate_cookies_deadline_keeps_pending(self):
+        """测试超过总时限未完成的Cookie结果为None且被保留"""
+        import threading
+        release = threading.Event()
+        def check(cookie):
+            if cookie == 'slow':
+                release.wait(2)
+            return cookie != 'bad'
+        
+        self.cookie_manager.deadline = 0.2
+        try:
+            with patch.object(self.cookie_manager, 'validate_cookie', side_effect=check):
+                results = self.cookie_manager.validate_cookies(['ok', 'bad', 'slow'])
+                self.assertEqual(results, {'ok': True, 'bad': False, 'slow': None})
+                self.assertEqual(self.cookie_manager.refresh_cookies(['slow', 'bad', 'ok']), ['slow', 'ok'])
+        finally:
+            release.set()
+    
+    def test_save_cookies_without_validation(self):
+        """测试不验证的保存不发网络请求，内容未变化时不重写文件"""
+        cookies = ['username=a;remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d=x']
+        
+        with patch.object(self.cookie_manager, 'validate_cookie') as mock_validate, \
+             patch.object(self.cookie_manager.storage, 'update',
+                          wraps=self.cookie_manager.storage.update) as mock_write:
+            self.assertTrue(self.cookie_manager.save_cookies(cookies, {'class_id': '1'}, validate=False))
+            self.assertTrue(self.cookie_manager.save_cookies(cookies, {'class_id': '1'}, validate=False))
+            mock_validate.assert_not_called()
+            self.assertEqual(mock_write.call_count, 1)
+        
+        self.assertEqual(self.cookie_manager.stored_cookies(), cookies)
+        
+        with patch.object(self.cookie_manager, 'validate_cookie', return_value=False), \
+             patch.object(self.cookie_manager.storage, 'update',
+                          wraps=self.cookie_manager.storage.update) as mock_update:
+            self.assertEqual(self.cookie_manager.validate_stored_cookies(), [])
+            mock_update.assert_called_once()
+        self.assertEqual(self.cookie_manager.stored_cookies(), [])
+        self.assertIn('validation_time', self.cookie_manager.storage.load_data())
+    
+    def test_validate_stored_cookies_stamps_once(self):
+        """测试全部有效时也只写入一次验证时间"""
+        cookies = ['username=a;remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d=x']
+        self.cookie_manager.save_cookies(cookies, validate=False)
+        
+        with patch.object(self.cookie_manager, 'validate_cookie', return_value=True), \
+             patch.object(self.cookie_manager.storage, 'update',
+                          wraps=self.cookie_manager.storage.update) as mock_update:
+            self.assertEqual(self.cookie_manager.validate_stored_cookies(), cookies)
+            mock_update.assert_called_once()
+        
+        self.assertEqual(self.cookie_manager.stored_cookies(), cookies)
+        self.assertEqual(self.cookie_manager.account_store.count('valid'), 1)
+        self.assertIn('validation_time', self.cookie_manager.storage.load_data())
+    
+    def test_save_cookies_updates_under_lock(self):
+        """测试验证后的保存在写锁内读-改-写，只移除失效Cookie"""
+        prefix = 'remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d='
+        cookies = [f'{prefix}good', f'{prefix}bad']
+        self.cookie_manager.storage.save_data({'push_history': [1]})
+        
+        with patch.object(self.cookie_manager, 'validate_cookie', side_effect=lambda c: c.endswith('good')), \
+             patch.object(self.cookie_manager.storage, 'update',
+                          wraps=self.cookie_manager.storage.update) as mock_update:
+            self.assertTrue(self.cookie_manager.save_cookies(cookies, {'class_id': '1'}))
+            mock_update.assert_called_once()
+        
+        self.assertEqual(self.cookie_manager.stored_cookies(), [f'{prefix}good'])
+        data = self.cookie_manager.storage.load_data()
+        self.assertEqual(data['push_history'], [1])
+        self.assertIn('validation_time', data)
+        self.assertNotIn('cookies', data)
+    
+    def test_delayed_saves_coalesced(self):
+        """测试启用延迟写入时多次保存Cookie只加密写入一次数据文件"""
+        from modules import secure_storage
+        storage = self.cookie_manager.storage
+        storage.flush_delay = 5
+        cookies = ['username=a;remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d=x']
+        
+        with patch('modules.secure_storage.atomic_write', wraps=secure_storage.atomic_write) as mock_write:
+            for i in range(5):
+                self.assertTrue(self.cookie_manager.save_cookies(cookies, {'class_id': str(i)}, validate=False))
+            mock_write.assert_not_called()
+            self.assertEqual(self.cookie_manager.get_user_info(), {'class_id': '4'})
+            
+            self.assertTrue(storage.flush())
+            self.assertEqual(mock_write.call_count, 1)
+        
+        self.assertEqual(storage._load_committed()['user_info'], {'class_id': '4'})
+        self.assertEqual(self.cookie_manager.load_cookies(), cookies)
+    
+    def test_save_cookies_writes_changed_accounts_only(self):
+        """测试保存时只写入新增或变化的账号，删除移除的账号"""
+        prefix = 'remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d='
+        cookies = [f'username={i};{prefix}t{i}' for i in range(5)]
+        self.cookie_manager.save_cookies(cookies, validate=False)
+        store = self.cookie_manager.account_store
+        
+        changed = cookies[:3] + [f'username=new;{prefix}new']
+        with patch.object(store, 'put', wraps=store.put) as mock_put, \
+             patch.object(store, 'delete', wraps=store.delete) as mock_delete:
+            self.assertTrue(self.cookie_manager.save_cookies(changed, validate=False))
+        
+        self.assertEqual(mock_put.call_count, 1)
+        self.assertEqual(mock_delete.call_count, 2)
+        self.assertEqual(self.cookie_manager.stored_cookies(), changed)
+        self.assertEqual(self.cookie_manager.load_cookies(), changed)
+    
+    def test_legacy_cookie_list_migrated(self):
+        """测试旧版本数据文件中的Cookie列表迁移到账号存储"""
+        cookies = ['username=b;a=2', 'username=a;a=1']
+        self.cookie_manager.storage.save_data({'cookies': cookies, 'user_info': {'class_id': '1'}})
+        
+        self.assertEqual(self.cookie_manager.stored_cookies(), cookies)
+        data = self.cookie_manager.storage.load_data()
+        self.assertNotIn('cookies', data)
+        self.assertEqual(data['user_info'], {'class_id': '1'})
+        self.assertEqual(len(self.cookie_manager.account_store), 2)
+        
+        self.assertTrue(self.cookie_manager.clear_all_data())
+        self.assertEqual(len(self.cookie_manager.account_store), 0)
+    
     def test_validate_cookie_invalid_format(self):
         """测试无效Cookie格式"""
         invalid_cookies = [
@@ -348,6 +583,913 @@ class TestBrowserCookieExtractor(unittest.TestCase):
         self.assertEqual(len(formatted), 0)
 
 
+class TestSessionPool(unittest.TestCase):
+    """会话池测试类"""
+    
+    def setUp(self):
+        """测试前准备"""
+        self.pool = SessionPool(pool_maxsize=5)
+    
+    def tearDown(self):
+        """测试后清理"""
+        self.pool.close()
+    
+    def test_session_reused(self):
+        """测试重复获取返回同一会话"""
+        session = self.pool.get_session()
+        self.assertIs(self.pool.get_session(), session)
+    
+    def test_adapter_pool_size(self):
+        """测试连接池大小配置"""
+        adapter = self.pool.get_session().get_adapter('http://k8n.cn')
+        self.assertEqual(adapter._pool_maxsize, 5)
+        self.assertTrue(adapter._pool_block)
+    
+    def test_session_does_not_store_cookies(self):
+        """测试会话不保存服务端下发的Cookie，避免账号串用"""
+        import requests
+        session = self.pool.get_session()
+        cookie = requests.cookies.create_cookie('laravel_session', 'abc', domain='k8n.cn')
+        session.cookies.set_cookie(cookie)
+        request = requests.Request('GET', 'http://k8n.cn/student').prepare()
+        self.assertIsNone(requests.cookies.get_cookie_header(session.cookies, request))
+    
+    def test_close_recreates_session(self):
+        """测试关闭后重新创建会话"""
+        session = self.pool.get_session()
+        self.pool.close()
+        self.assertIsNot(self.pool.get_session(), session)
+
+
+class TestTokenBucket(unittest.TestCase):
+    """令牌桶限流器测试类"""
+    
+    def test_burst_without_wait(self):
+        """测试突发额度内无需等待"""
+        bucket = TokenBucket(rate=1, burst=3)
+        waits = [bucket.reserve() for _ in range(3)]
+        self.assertEqual(waits, [0.0, 0.0, 0.0])
+    
+    def test_wait_grows_beyond_burst(self):
+        """测试超出突发额度后按速率排队"""
+        bucket = TokenBucket(rate=10, burst=2)
+        waits = [bucket.reserve() for _ in range(5)]
+        self.assertEqual(waits[:2], [0.0, 0.0])
+        self.assertAlmostEqual(waits[2], 0.1, places=2)
+        self.assertAlmostEqual(waits[4], 0.3, places=2)
+        
+        stats = bucket.get_stats()
+        self.assertEqual(stats['requests'], 5)
+        self.assertEqual(stats['waited_requests'], 3)
+        self.assertAlmostEqual(stats['max_wait'], 0.3, places=2)
+    
+    def test_try_acquire_does_not_overdraw(self):
+        """测试等待超过时限时不占用令牌"""
+        bucket = TokenBucket(rate=10, burst=1)
+        self.assertTrue(bucket.try_acquire(0))
+        self.assertFalse(bucket.try_acquire(0.05))
+        self.assertAlmostEqual(bucket.reserve(), 0.1, places=2)
+        self.assertEqual(bucket.get_stats()['requests'], 2)
+    
+    def test_unlimited_rate(self):
+        """测试速率为0时不限流"""
+        bucket = TokenBucket(rate=0, burst=1)
+        self.assertEqual([bucket.reserve() for _ in range(5)], [0.0] * 5)
+    
+    def test_shared_across_threads(self):
+        """测试多线程共享限流时总速率受控"""
+        import threading
+        import time
+        bucket = TokenBucket(rate=50, burst=1)
+        start = time.monotonic()
+        threads = [threading.Thread(target=bucket.acquire) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertGreaterEqual(time.monotonic() - start, 0.09)
+        self.assertEqual(bucket.get_stats()['requests'], 6)
+
+
+class TestRetryQueue(unittest.TestCase):
+    """延迟重试队列测试类"""
+    
+    def setUp(self):
+        """测试前准备"""
+        self.queue = RetryQueue(base_delay=300, backoff=3, max_retries=2)
+    
+    def test_exponential_backoff(self):
+        """测试指数退避间隔"""
+        self.assertEqual(self.queue.schedule('a', attempt=0, now=0), 300)
+        self.assertEqual(self.queue.schedule('b', attempt=1, now=0), 900)
+        self.assertIsNone(self.queue.schedule('c', attempt=2, now=0))
+    
+    def test_pop_due_in_order(self):
+        """测试按到期时间取出任务"""
+        self.queue.schedule('late', attempt=1, now=0)
+        self.queue.schedule('early', attempt=0, now=100)
+        
+        self.assertEqual(self.queue.pop_due(now=399), [])
+        self.assertEqual(self.queue.next_due(), 400)
+        self.assertEqual([t['cookie'] for t in self.queue.pop_due(now=400)], ['early'])
+        self.assertEqual([t['cookie'] for t in self.queue.pop_due(now=1000)], ['late'])
+        self.assertEqual(len(self.queue), 0)
+    
+    def test_no_duplicate_pending(self):
+        """测试同一Cookie不会重复入队"""
+        self.assertIsNotNone(self.queue.schedule('a', now=0))
+        self.assertIsNone(self.queue.schedule('a', now=10))
+        self.assertIn('a', self.queue)
+        
+        self.queue.pop_due(now=300)
+        self.assertNotIn('a', self.queue)
+    
+    def test_seconds_until_due(self):
+        """测试距离到期的秒数"""
+        self.assertIsNone(self.queue.seconds_until_due(now=0))
+        self.queue.schedule('a', now=0)
+        self.assertEqual(self.queue.seconds_until_due(now=100), 200)
+        self.assertEqual(self.queue.seconds_until_due(now=500), 0)
+
+
+class TestPunchResult(unittest.TestCase):
+    """签到结果分类测试类"""
+    
+    def test_classify_page(self):
+        """测试签到页面分类"""
+        self.assertIsNone(punch_result.classify_page(200, '课程页面'))
+        self.assertEqual(punch_result.classify_page(200, '出错啦'), punch_result.EXPIRED_LOGIN)
+        self.assertEqual(punch_result.classify_page(502, None), punch_result.SERVER_ERROR)
+        self.assertEqual(punch_result.classify_page(429, None), punch_result.TRANSIENT_NETWORK)
+        self.assertEqual(punch_result.classify_page(404, None), punch_result.CLIENT_ERROR)
+    
+    def test_classify_sign(self):
+        """测试签到结果文本分类"""
+        self.assertEqual(punch_result.classify_sign(200, '签到成功'), punch_result.SIGNED)
+        self.assertEqual(punch_result.classify_sign(200, '您已签到过啦'), punch_result.ALREADY_SIGNED)
+        self.assertEqual(punch_result.classify_sign(200, '签到已结束'), punch_result.PUNCH_CLOSED)
+        self.assertEqual(punch_result.classify_sign(200, '不在签到范围内'), punch_result.SIGN_REJECTED)
+        self.assertEqual(punch_result.classify_sign(200, None), punch_result.SUBMITTED)
+        self.assertEqual(punch_result.classify_sign(500, None), punch_result.SERVER_ERROR)
+    
+    def test_classify_exception(self):
+        """测试异常分类"""
+        import requests
+        self.assertEqual(punch_result.classify_exception(requests.exceptions.ReadTimeout()),
+                         punch_result.TRANSIENT_NETWORK)
+        self.assertEqual(punch_result.classify_exception(ValueError('bad')),
+                         punch_result.UNKNOWN_ERROR)
+    
+    def test_retryable_and_status(self):
+        """测试可重试判断与账号状态映射"""
+        self.assertTrue(punch_result.is_retryable(punch_result.SERVER_ERROR))
+        self.assertFalse(punch_result.is_retryable(punch_result.EXPIRED_LOGIN))
+        self.assertFalse(punch_result.is_retryable(punch_result.ALREADY_SIGNED))
+        self.assertEqual(punch_result.status_for(punch_result.EXPIRED_LOGIN), 'failed')
+        self.assertEqual(punch_result.status_for(punch_result.TRANSIENT_NETWORK), 'error')
+        self.assertEqual(punch_result.status_for(punch_result.INVALID_COOKIE), 'null')
+        self.assertEqual(punch_result.status_for(punch_result.SIGNED), 'ok')
+    
+    def test_merge_outcomes(self):
+        """测试多个签到任务结果合并"""
+        self.assertEqual(punch_result.merge_outcomes([]), punch_result.NO_PUNCH)
+        self.assertEqual(
+            punch_result.merge_outcomes([punch_result.SIGNED, punch_result.SERVER_ERROR]),
+            punch_result.SERVER_ERROR
+        )
+        self.assertEqual(
+            punch_result.merge_outcomes([punch_result.SIGNED, punch_result.ALREADY_SIGNED]),
+            punch_result.SIGNED
+        )
+
+
+class TestSignedPunchIndex(unittest.TestCase):
+    """已签到索引测试类"""
+    
+    def setUp(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.index_file = os.path.join(self.temp_dir, "signed_punches.json")
+        self.index = SignedPunchIndex(self.index_file)
+    
+    def tearDown(self):
+        """测试后清理"""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_mark_and_persist(self):
+        """测试签到记录在重新加载后仍然存在"""
+        self.index.mark('acct', '12345', '678', punch_result.SIGNED, '签到成功')
+        self.assertTrue(self.index.is_signed('acct', '12345', 678))
+        self.assertTrue(self.index.save())
+        
+        reloaded = SignedPunchIndex(self.index_file)
+        self.assertTrue(reloaded.is_signed('acct', '12345', '678'))
+        self.assertFalse(reloaded.is_signed('acct', '54321', '678'))
+        self.assertEqual(reloaded.get('acct', '12345', '678')['outcome'], punch_result.SIGNED)
+    
+    def test_account_key_hides_cookie(self):
+        """测试账号标识只依赖Cookie值且不包含明文"""
+        prefix = 'remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d='
+        key = SignedPunchIndex.account_key(f'username=a;{prefix}secret')
+        
+        self.assertEqual(key, SignedPunchIndex.account_key(f'username=b;{prefix}secret'))
+        self.assertNotEqual(key, SignedPunchIndex.account_key(f'{prefix}other'))
+        self.assertNotIn('secret', key)
+    
+    def test_prune_old_entries(self):
+        """测试超过保留天数的记录在加载时被清理"""
+        import json
+        with open(self.index_file, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'entries': {
+                'acct|12345|1': {'outcome': 'signed', 'time': '2000-01-01T00:00:00'}
+            }}, f)
+        
+        self.assertEqual(len(SignedPunchIndex(self.index_file)), 0)
+
+
+class TestPunchWatcher(unittest.TestCase):
+    """签到任务监视器测试类"""
+    
+    def setUp(self):
+        """测试前准备"""
+        self.watcher = PunchWatcher(interval=10)
+    
+    def test_only_new_ids_trigger(self):
+        """测试只有新出现的签到ID会触发签到"""
+        self.assertEqual(self.watcher.observe(['1'], now=0), ['1'])
+        self.assertEqual(self.watcher.observe(['1', '2'], now=10), ['2'])
+        self.assertEqual(self.watcher.observe(['1', '2'], now=20), [])
+    
+    def test_reopened_punch_triggers_again(self):
+        """测试签到消失后重新出现会再次触发"""
+        self.watcher.observe(['1'], now=0)
+        self.watcher.observe([], now=10)
+        self.assertEqual(self.watcher.observe(['1'], now=20), ['1'])
+    
+    def test_latency_stats(self):
+        """测试发现到签到完成的延迟统计"""
+        self.watcher.observe(['1', '2'], now=100)
+        self.assertEqual(self.watcher.mark_signed('1', now=101), 1)
+        self.assertEqual(self.watcher.mark_signed('2', now=103), 3)
+        self.assertIsNone(self.watcher.mark_signed('2', now=104))
+        self.assertIsNone(self.watcher.mark_signed('9', now=104))
+        
+        stats = self.watcher.get_stats()
+        self.assertEqual(stats['punches'], 2)
+        self.assertEqual(stats['avg_latency'], 2)
+        self.assertEqual(stats['max_latency'], 3)
+
+
+class TestPunchHistory(unittest.TestCase):
+    """签到历史与自适应轮询测试类"""
+    
+    def setUp(self):
+        """测试前准备"""
+        from datetime import datetime, timedelta
+        self.temp_dir = tempfile.mkdtemp()
+        self.history = PunchHistory(os.path.join(self.temp_dir, "punch_history.json"))
+        
+        # 过去四周每周一 08:05 出现签到
+        for week in range(4):
+            self.history.record('12345', datetime(2024, 1, 1, 8, 5) + timedelta(weeks=week))
+    
+    def tearDown(self):
+        """测试后清理"""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_histogram_and_windows(self):
+        """测试按星期×时段统计并扩展相邻时段"""
+        self.assertEqual(self.history.histogram('12345'), {(0, 32): 4})
+        self.assertEqual(self.history.windows('12345'), {(0, 31), (0, 32), (0, 33)})
+        self.assertEqual(self.history.windows('12345', min_count=5), set())
+        
+        self.assertTrue(self.history.save())
+        reloaded = PunchHistory(self.history.history_file, retention_days=100000)
+        self.assertEqual(reloaded.histogram('12345'), {(0, 32): 4})
+    
+    def test_timetable_window(self):
+        """测试课表窗口"""
+        from datetime import datetime
+        policy = AdaptivePollPolicy(timetable=parse_timetable([
+            {'weekdays': [3], 'start': '14:00', 'end': '15:40'}
+        ]), base_interval=30)
+        
+        self.assertTrue(policy.in_window(datetime(2024, 1, 3, 14, 30)))
+        self.assertFalse(policy.in_window(datetime(2024, 1, 3, 15, 40)))
+        self.assertFalse(policy.in_window(datetime(2024, 1, 4, 14, 30)))
+    
+    def test_backoff_outside_windows(self):
+        """测试窗口外指数退避，且不会越过下一个窗口"""
+        from datetime import datetime
+        policy = AdaptivePollPolicy(self.history.windows('12345'), base_interval=30, max_interval=600)
+        
+        self.assertEqual(policy.next_interval(datetime(2024, 1, 29, 3, 0)), 60)
+        self.assertEqual(policy.next_interval(datetime(2024, 1, 29, 3, 1)), 120)
+        self.assertEqual(policy.next_interval(datetime(2024, 1, 29, 3, 3)), 240)
+        self.assertEqual(policy.next_interval(datetime(2024, 1, 29, 7, 40)), 300)
+        self.assertEqual(policy.next_interval(datetime(2024, 1, 29, 7, 45)), 30)
+    
+    def test_no_windows_uses_fixed_interval(self):
+        """测试没有历史时使用固定间隔"""
+        from datetime import datetime
+        policy = AdaptivePollPolicy(base_interval=30)
+        self.assertFalse(policy.has_windows)
+        self.assertEqual(policy.next_interval(datetime(2024, 1, 29, 3, 0)), 30)
+    
+    def test_adaptive_beats_fixed_interval(self):
+        """测试自适应轮询的请求次数与发现延迟均优于固定间隔"""
+        from datetime import datetime, timedelta
+        policy = AdaptivePollPolicy(self.history.windows('12345'), base_interval=30, max_interval=900)
+        start = datetime(2024, 1, 29)
+        end = start + timedelta(days=7)
+        punches = [datetime(2024, 1, 29, 8, 7, 13)]
+        
+        fixed = simulate_polling(lambda now: 120, punches, start, end)
+        adaptive = simulate_polling(policy.next_interval, punches, start, end)
+        
+        self.assertEqual(adaptive['detected'], 1)
+        self.assertLess(adaptive['polls'], fixed['polls'])
+        self.assertLess(adaptive['avg_latency'], fixed['avg_latency'])
+
+
+class TestPreciseScheduler(unittest.TestCase):
+    """精确调度器测试类"""
+    
+    def setUp(self):
+        """测试前准备"""
+        self.scheduler = PreciseScheduler()
+    
+    def test_run_pending_in_order(self):
+        """测试按到期时间执行事件，取消的事件不执行"""
+        fired = []
+        self.scheduler.call_at(20, lambda: fired.append('late'), 'late')
+        self.scheduler.call_at(10, lambda: fired.append('early'), 'early')
+        cancelled = self.scheduler.call_at(15, lambda: fired.append('cancelled'), 'cancelled')
+        self.scheduler.cancel(cancelled)
+        
+        self.assertEqual(self.scheduler.next_due(), 10)
+        self.assertEqual(self.scheduler.run_pending(now=5), 0)
+        self.assertEqual(self.scheduler.run_pending(now=30), 2)
+        self.assertEqual(fired, ['early', 'late'])
+        self.assertEqual(len(self.scheduler), 0)
+    
+    def test_seconds_until(self):
+        """测试距离下一次 HH:MM 的秒数"""
+        from datetime import datetime
+        now = datetime(2024, 1, 1, 8, 29, 30)
+        self.assertEqual(PreciseScheduler.seconds_until('08:30', now), 30)
+        self.assertEqual(PreciseScheduler.seconds_until('08:29', now), 24 * 3600 - 30)
+    
+    def test_resync_after_suspend(self):
+        """测试系统休眠后按本地时间修正到期时间，不按单调时钟晚触发"""
+        import time
+        from datetime import datetime, timedelta
+        start = datetime.now()
+        event = self.scheduler.call_recurring(lambda after: after + timedelta(hours=1), lambda: None, 'daily')
+        other = self.scheduler.call_later(10, lambda: None, 'once')
+        self.assertGreater(self.scheduler.next_due() - time.monotonic(), 9)
+        
+        # 模拟休眠一小时：本地时间前进，单调时钟不变
+        class Resumed(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return start + timedelta(hours=1, seconds=1)
+        
+        with patch('modules.precise_scheduler.datetime', Resumed):
+            self.scheduler.resync()
+        
+        self.assertLessEqual(event['due'], time.monotonic())
+        self.assertEqual(self.scheduler.next_due(), event['due'])
+        self.assertGreater(other['due'], time.monotonic() + 9)
+    
+    def test_wait_capped(self):
+        """测试调度循环每次休眠不超过 max_wait 秒"""
+        from datetime import timedelta
+        scheduler = PreciseScheduler(max_wait=5)
+        scheduler.call_recurring(lambda after: after + timedelta(hours=1), lambda: None, 'daily')
+        waits = []
+        
+        def wait(timeout):
+            waits.append(timeout)
+            if len(waits) == 2:
+                scheduler.stop()
+        
+        with patch.object(scheduler._wakeup, 'wait', side_effect=wait):
+            scheduler.run_forever()
+        self.assertEqual(waits, [5, 5])
+    
+    def test_recurring_event_rescheduled(self):
+        """测试重复事件触发后从本次计划时间之后安排下一次"""
+        import time
+        from datetime import timedelta
+        fired = []
+        calls = []
+        
+        def next_time(after):
+            calls.append(after)
+            if len(calls) == 1:
+                return after + timedelta(milliseconds=10)
+            return after + timedelta(days=1)
+        
+        event = self.scheduler.call_recurring(next_time, lambda: fired.append(1))
+        first_due = event['wall_due']
+        time.sleep(0.02)
+        self.scheduler.run_pending()
+        
+        self.assertEqual(fired, [1])
+        self.assertGreaterEqual(calls[1], first_due)
+        self.assertEqual(len(self.scheduler), 1)
+        self.assertGreater(self.scheduler.next_due() - time.monotonic(), 23 * 3600)
+    
+    def test_daily_event(self):
+        """测试每日事件的首次到期时间"""
+        import time
+        self.scheduler.call_daily('08:30', lambda: None)
+        delay = self.scheduler.next_due() - time.monotonic()
+        self.assertAlmostEqual(delay, PreciseScheduler.seconds_until('08:30'), delta=1)
+    
+    def test_run_forever_fires_on_time(self):
+        """测试调度循环精确休眠到到期时刻并记录触发延迟"""
+        fired = []
+        self.scheduler.call_later(0.05, lambda: fired.append(1), 'first')
+        self.scheduler.call_later(0.1, self.scheduler.stop, 'stop')
+        
+        self.scheduler.run_forever()
+        
+        stats = self.scheduler.get_stats()
+        self.assertEqual(fired, [1])
+        self.assertEqual(stats['fired'], 2)
+        self.assertLess(stats['max_lag_ms'], 50)
+    
+    def test_event_exception_does_not_stop_loop(self):
+        """测试事件异常不影响后续事件"""
+        fired = []
+        self.scheduler.call_at(1, lambda: 1 / 0, 'bad')
+        self.scheduler.call_at(2, lambda: fired.append(1), 'good')
+        
+        self.assertEqual(self.scheduler.run_pending(now=3), 2)
+        self.assertEqual(fired, [1])
+
+
+class TestJobSpec(unittest.TestCase):
+    """签到任务计划测试类"""
+    
+    def test_cron_next_after(self):
+        """测试cron表达式的下次触发时间"""
+        from datetime import datetime
+        spec = CronSpec('25 8 * * 1,3')
+        monday = datetime(2024, 1, 1, 9, 0)
+        
+        self.assertEqual(spec.next_after(monday), datetime(2024, 1, 3, 8, 25))
+        self.assertEqual(spec.next_after(datetime(2024, 1, 3, 8, 25)), datetime(2024, 1, 8, 8, 25))
+        self.assertEqual(CronSpec('*/20 14-15 * * *').next_after(monday), datetime(2024, 1, 1, 14, 0))
+        self.assertEqual(CronSpec('0 0 1 3 *').next_after(monday), datetime(2024, 3, 1, 0, 0))
+        self.assertEqual(CronSpec('0 8 * * 0').next_after(monday), datetime(2024, 1, 7, 8, 0))
+    
+    def test_cron_invalid(self):
+        """测试无效cron表达式"""
+        from datetime import datetime
+        for expr in ('25 8 * *', '60 8 * * *', '0 8 * * mon', '0 8 31 2 *'):
+            with self.assertRaises(ValueError):
+                CronSpec(expr).next_after(datetime(2024, 1, 1))
+    
+    def test_weekly_next_after(self):
+        """测试星期+时间列表的下次触发时间"""
+        from datetime import datetime
+        spec = WeeklySpec([2, 4], ['16:00', '14:00'])
+        
+        self.assertEqual(spec.next_after(datetime(2024, 1, 2, 14, 0)), datetime(2024, 1, 2, 16, 0))
+        self.assertEqual(spec.next_after(datetime(2024, 1, 2, 16, 0)), datetime(2024, 1, 4, 14, 0))
+        self.assertEqual(spec.next_after(datetime(2024, 1, 4, 17, 0)), datetime(2024, 1, 9, 14, 0))
+    
+    def test_weekly_invalid_times(self):
+        """测试无效的时间格式与取值"""
+        for value in ('25:00', '08:60', '0830', '8:5', 'ab:cd', ''):
+            with self.assertRaises(ValueError):
+                WeeklySpec([1], [value])
+        self.assertEqual(WeeklySpec([1], [' 8:30', '23:59']).times, [(8, 30), (23, 59)])
+    
+    def test_load_jobs_and_select_accounts(self):
+        """测试任务解析与账号组筛选"""
+        jobs = load_jobs([
+            {'name': '早课', 'cron': '25 8 * * 1', 'class': 54321, 'accounts': ['张三', 3]},
+            {'times': ['08:00']}
+        ])
+        cookies = ['username=张三;a=1', 'username=李四;a=2', 'a=3']
+        
+        self.assertEqual(jobs[0]['class'], '54321')
+        self.assertEqual(jobs[1]['name'], '任务2')
+        self.assertIsNone(jobs[1]['class'])
+        self.assertEqual(select_cookies(cookies, jobs[0]['accounts']), [cookies[0], cookies[2]])
+        self.assertEqual(select_cookies(cookies, []), cookies)
+        
+        with self.assertRaises(ValueError):
+            load_jobs([{'name': '缺少时间'}])
+
+
+class TestCookieHealthPrefetch(unittest.TestCase):
+    """Cookie健康检查预取测试类"""
+    
+    def test_result_used_once(self):
+        """测试预取结果只对相同Cookie集合使用一次"""
+        import threading
+        release = threading.Event()
+        
+        def refresh(cookies):
+            release.wait(1)
+            return cookies[:1]
+        
+        prefetch = CookieHealthPrefetch(refresh)
+        self.assertTrue(prefetch.start(['a', 'b']))
+        self.assertFalse(prefetch.start(['a', 'b']))
+        self.assertTrue(prefetch.is_running(['a', 'b']))
+        self.assertIsNone(prefetch.take(['a', 'b']))
+        
+        release.set()
+        prefetch.wait(1)
+        
+        self.assertIsNone(prefetch.take(['a']))
+        self.assertEqual(prefetch.take(['a', 'b']), ['a'])
+        self.assertIsNone(prefetch.take(['a', 'b']))
+    
+    def test_expired_result_ignored(self):
+        """测试超过有效期的预取结果作废"""
+        import time
+        prefetch = CookieHealthPrefetch(lambda cookies: cookies, max_age=0)
+        prefetch.start(['a'])
+        prefetch.wait(1)
+        time.sleep(0.01)
+        self.assertIsNone(prefetch.take(['a']))
+
+
+class TestAccountStore(unittest.TestCase):
+    """账号记录存储测试类"""
+    
+    def setUp(self):
+        """测试前准备"""
+        from cryptography.fernet import Fernet
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_file = os.path.join(self.temp_dir, "accounts.db")
+        self.store = AccountStore(self.db_file, Fernet(Fernet.generate_key()))
+    
+    def tearDown(self):
+        """测试后清理"""
+        import shutil
+        self.store.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    def test_put_get_and_encrypted_at_rest(self):
+        """测试记录读写，数据库中不含明文"""
+        self.store.put('a1', {'cookie': 'secret_token'}, 'valid')
+        self.assertEqual(self.store.get('a1'), {'cookie': 'secret_token'})
+        self.assertEqual(self.store.status('a1'), 'valid')
+        self.assertIsNone(self.store.get('missing'))
+        
+        with open(self.db_file, 'rb') as f:
+            self.assertNotIn(b'secret_token', f.read())
+    
+    def test_update_status_and_filter(self):
+        """测试只更新状态与按状态筛选"""
+        self.store.put_many((f'a{i}', {'n': i}, 'valid') for i in range(5))
+        self.assertTrue(self.store.update_status('a3', 'invalid'))
+        self.assertFalse(self.store.update_status('missing', 'invalid'))
+        
+        self.assertEqual(self.store.count('valid'), 4)
+        self.assertEqual([(aid, record) for aid, _, record in self.store.iter_records('invalid')],
+                         [('a3', {'n': 3})])
+        self.assertTrue(self.store.delete('a3'))
+        self.assertEqual(len(self.store), 4)
+    
+    def test_iter_records_in_batches(self):
+        """测试分批遍历覆盖全部账号"""
+        self.store.put_many((f'{i:04d}', {'n': i}, 'valid') for i in range(25))
+        ids = [aid for aid, _, _ in self.store.iter_records(batch_size=4)]
+        self.assertEqual(ids, [f'{i:04d}' for i in range(25)])
+    
+    def test_transaction_rolls_back_on_error(self):
+        """测试批量写入中途出错时整体回滚"""
+        with self.assertRaises(RuntimeError):
+            with self.store.transaction():
+                self.store.put('a1', {}, 'valid')
+                self.store.put('a2', {}, 'valid')
+                raise RuntimeError('中断')
+        self.assertEqual(len(self.store), 0)
+
+
+class TestFileLock(unittest.TestCase):
+    """跨进程文件锁测试类"""
+    
+    def setUp(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, "config.json")
+    
+    def tearDown(self):
+        """测试后清理"""
+        import shutil
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+    
+    @unittest.skipIf(os.name == 'nt', "Windows不支持共享锁")
+    def test_readers_do_not_block(self):
+        """测试多个读锁可同时持有，持有读锁时写锁等待超时"""
+        with FileLock(self.path).shared(), FileLock(self.path, timeout=0.1).shared():
+            with self.assertRaises(TimeoutError):
+                with FileLock(self.path, timeout=0.1).exclusive():
+                    pass
+    
+    def test_writers_serialize(self):
+        """测试写锁互斥"""
+        import threading
+        import time
+        active = []
+        overlaps = []
+        
+        def writer():
+            with FileLock(self.path).exclusive():
+                active.append(1)
+                overlaps.append(len(active))
+                time.sleep(0.02)
+                active.pop()
+        
+        threads = [threading.Thread(target=writer) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(overlaps, [1, 1, 1, 1])
+    
+    def test_concurrent_updates_not_lost(self):
+        """测试多个存储实例并发读-改-写时更新不丢失"""
+        import threading
+        stores = []
+        for _ in range(4):
+            storage = SecureStorage("TestApp")
+            storage.key_file = os.path.join(self.temp_dir, "test.key")
+            storage.data_file = os.path.join(self.temp_dir, "test_data.enc")
+            storage.cipher = storage._get_or_create_cipher()
+            stores.append(storage)
+        
+        def increment(storage):
+            for _ in range(5):
+                storage.update(lambda data: data.update(count=data.get('count', 0) + 1))
+        
+        threads = [threading.Thread(target=increment, args=(storage,)) for storage in stores]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(stores[0].load_data()['count'], 20)
+
+
+class TestPunchParser(unittest.TestCase):
+    """签到页面解析测试类"""
+    
+    def test_parse_punch_page(self):
+        """测试单次扫描提取标题与签到ID"""
+        page = parse_punch_page('<html><head><TITLE>签到 &amp; 列表</TITLE></head>'
+                                '<a onclick="punch_gps(11)"></a><div id="punchcard_22"></div>'
+                                '<a onclick="punch_gps(33)"></a></html>')
+        self.assertEqual(page, {'title': '签到 & 列表', 'gps': ['11', '33'], 'qr': ['22']})
+        self.assertEqual(punch_ids(page), ['11', '33', '22'])
+        self.assertIsNone(parse_punch_page('<html>punch_gps(1)</html>')['title'])
+    
+    def test_matches_beautifulsoup(self):
+        """测试快速解析与BeautifulSoup结果一致，标题未闭合时回退"""
+        pages = [sample_punch_page(), sample_punch_page(0), '<title>出错了</title>',
+                 '<html><title>未闭合 punch_gps(5)</html>']
+        for page in pages:
+            self.assertEqual(parse_punch_page(page), parse_punch_page_soup(page))
+    
+    def test_parse_sign_result(self):
+        """测试签到结果文本提取"""
+        cases = [
+            '<div class="box" id="title"> 签到成功 </div>',
+            '<div id=title><b>已签到</b></div>',
+            '<div id="title"><div>嵌套</div>结果</div>',
+            '<div data-id="title">不是结果</div>',
+            '<h1>没有结果</h1>'
+        ]
+        for text in cases:
+            self.assertEqual(parse_sign_result(text), parse_sign_result_soup(text))
+        self.assertEqual(parse_sign_result(cases[0]), '签到成功')
+    
+    def test_backends_agree_on_corpus(self):
+        """测试各可用后端在录制页面上的解析结果一致"""
+        pages = load_corpus(os.path.join(os.path.dirname(__file__), 'data'))
+        self.assertTrue(pages)
+        parsers = [PunchParser(backend) for backend in available_backends()]
+        for page in pages:
+            expected = parsers[0].parse_page(page), parsers[0].parse_sign_result(page)
+            for parser in parsers[1:]:
+                self.assertEqual((parser.parse_page(page), parser.parse_sign_result(page)), expected)
+    
+    def test_unavailable_backend_falls_back(self):
+        """测试未知后端回退到regex"""
+        self.assertEqual(PunchParser('unknown').backend, 'regex')
+        self.assertEqual(PunchParser('html.parser').features, 'html.parser')
+    
+    def test_parse_cache_reuses_identical_pages(self):
+        """测试内容相同的页面复用解析结果，内容变化时重新解析"""
+        parser = PunchParser('regex')
+        page = sample_punch_page()
+        with patch('modules.punch_parser.parse_punch_page', wraps=parse_punch_page) as mock_parse:
+            first = parser.parse_page(page, key=('54321', 'a'))
+            first['gps'].append('999')
+            self.assertEqual(parser.parse_page(page, key=('54321', 'a'))['gps'], ['3000', '3001'])
+            parser.parse_page(page, key=('54321', 'b'))
+            parser.parse_page(sample_punch_page(1), key=('54321', 'a'))
+            self.assertEqual(mock_parse.call_count, 3)
+        self.assertEqual(parser.cache.get_stats()['hits'], 1)
+    
+    def test_parse_cache_lru_eviction(self):
+        """测试缓存条目数有上限，淘汰最久未使用的账号"""
+        cache = ParseCache(max_entries=2)
+        page = sample_punch_page()
+        cache.get_or_parse('a', page, parse_punch_page)
+        cache.get_or_parse('b', page, parse_punch_page)
+        cache.get_or_parse('a', page, parse_punch_page)
+        cache.get_or_parse('c', page, parse_punch_page)
+        self.assertEqual(len(cache), 2)
+        
+        cache.get_or_parse('a', page, parse_punch_page)
+        cache.get_or_parse('b', page, parse_punch_page)
+        self.assertEqual((cache.hits, cache.misses), (2, 4))
+    
+    def test_benchmark_parsers(self):
+        """测试各后端的解析开销对比"""
+        results = benchmark_parsers([sample_punch_page()], repeat=2, backends=['regex', 'html.parser'])
+        self.assertEqual(set(results), {'regex', 'html.parser'})
+        self.assertGreater(results['regex']['pages_per_sec'], 0)
+        self.assertLess(results['regex']['peak_kb'], results['html.parser']['peak_kb'])
+
+
+class TestStreamingFetch(unittest.TestCase):
+    """流式读取签到页面测试类"""
+    
+    PAGES = {
+        '/expired': '<html><head><title>出错了</title></head><body>' + 'x' * 200000 + '</body></html>',
+        '/result': '<html><body><div id="title">签到成功</div>' + 'y' * 1000 + '</body></html>',
+        '/page': '<html><head><title>签到</title></head><body>punch_gps(12)' + 'z' * 50000 + '</body></html>'
+    }
+    
+    @classmethod
+    def setUpClass(cls):
+        """启动本地HTTP服务，记录每个请求使用的客户端端口"""
+        import threading
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+        ports = cls.ports = []
+        pages = cls.PAGES
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            
+            def do_GET(self):
+                ports.append(self.client_address[1])
+                body = pages[self.path].encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                try:
+                    self.wfile.write(body)
+                except OSError:
+                    pass
+            
+            def log_message(self, *args):
+                pass
+        
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        cls.server.handle_error = lambda request, address: None
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f'http://127.0.0.1:{cls.server.server_port}'
+    
+    @classmethod
+    def tearDownClass(cls):
+        """关闭本地HTTP服务"""
+        cls.server.shutdown()
+        cls.server.server_close()
+    
+    def setUp(self):
+        """测试前准备"""
+        self.pool = SessionPool()
+        self.session = self.pool.get_session()
+        del self.ports[:]
+    
+    def tearDown(self):
+        """测试后清理"""
+        self.pool.close()
+    
+    def test_full_page_when_undecided(self):
+        """测试无法提前判断的页面完整读取"""
+        page = fetch_streaming(self.session, 'GET', f'{self.base_url}/page', punch_page_decided)
+        self.assertTrue(page.complete)
+        self.assertEqual(page.text, self.PAGES['/page'])
+    
+    def test_early_exit_reuses_connection_after_short_tail(self):
+        """测试读到签到结果即停止，剩余内容较少时读完以复用连接"""
+        page = fetch_streaming(self.session, 'GET', f'{self.base_url}/result', sign_result_decided, chunk_size=64)
+        self.assertFalse(page.complete)
+        self.assertEqual(parse_sign_result(page.text), '签到成功')
+        
+        fetch_streaming(self.session, 'GET', f'{self.base_url}/page', punch_page_decided)
+        self.assertEqual(len(set(self.ports)), 1)
+    
+    def test_early_exit_closes_connection_after_long_tail(self):
+        """测试登录失效页面只读取开头，剩余内容超过上限时关闭连接"""
+        page = fetch_streaming(self.session, 'GET', f'{self.base_url}/expired', punch_page_decided)
+        self.assertFalse(page.complete)
+        self.assertLess(page.bytes_read, 10000)
+        self.assertEqual(parse_punch_page(page.text)['title'], '出错了')
+        
+        fetch_streaming(self.session, 'GET', f'{self.base_url}/page', punch_page_decided)
+        self.assertEqual(len(set(self.ports)), 2)
+
+
+@unittest.skipUnless(AsyncCheckinEngine.is_available(), "未安装aiohttp")
+class TestAsyncCheckinEngine(unittest.TestCase):
+    """异步签到引擎测试类"""
+    
+    def setUp(self):
+        """测试前准备"""
+        self.engine = AsyncCheckinEngine('12345', '39.904697', '116.407178', '100', concurrency=3)
+        self.cookie_prefix = 'remember_student_59ba36addc2b2f9401580f014c7f58ea4e30989d='
+    
+    def test_run_success_and_errors(self):
+        """测试并发签到结果与同步引擎返回格式一致，仅可重试的失败进入重试列表"""
+        async def fake_request(session, method, url, **kwargs):
+            cookie = kwargs['headers']['Cookie']
+            if method == 'GET':
+                if cookie.endswith('expired'):
+                    return 200, '<html><title>出错啦</title></html>'
+                if cookie.endswith('busy'):
+                    return 502, ''
+                return 200, '<html><title>课程</title><script>punch_gps(678)</script></html>'
+            return 200, '<div id="title">签到成功</div>'
+        
+        cookies = [
+            f'username=a;{self.cookie_prefix}ok',
+            f'username=b;{self.cookie_prefix}expired',
+            f'username=c;{self.cookie_prefix}busy',
+            'invalid_cookie'
+        ]
+        with patch.object(self.engine, '_request', side_effect=fake_request):
+            error_cookies, null_cookie = self.engine.run(cookies)
+        
+        self.assertEqual(error_cookies, [cookies[2]])
+        self.assertEqual(null_cookie, 1)
+        self.assertEqual([r['outcome'] for r in self.engine.results],
+                         ['signed', 'expired_login', 'server_error', 'invalid_cookie'])
+    
+    def test_concurrency_limit(self):
+        """测试同时进行的请求数不超过并发上限"""
+        import asyncio
+        state = {'active': 0, 'peak': 0}
+        
+        async def fake_request(session, method, url, **kwargs):
+            state['active'] += 1
+            state['peak'] = max(state['peak'], state['active'])
+            await asyncio.sleep(0.01)
+            state['active'] -= 1
+            return 200, '<html><title>课程</title></html>'
+        
+        cookies = [f'{self.cookie_prefix}c{i}' for i in range(10)]
+        with patch.object(self.engine, '_request', side_effect=fake_request):
+            error_cookies, null_cookie = self.engine.run(cookies)
+        
+        self.assertEqual(error_cookies, [])
+        self.assertLessEqual(state['peak'], 3)
+        self.assertGreater(state['peak'], 1)
+    
+    def test_skips_signed_punches(self):
+        """测试已签到的任务不再发送签到请求"""
+        temp_dir = tempfile.mkdtemp()
+        index = SignedPunchIndex(os.path.join(temp_dir, "signed_punches.json"))
+        engine = AsyncCheckinEngine('12345', '39.904697', '116.407178', '100', punch_index=index)
+        calls = []
+        
+        async def fake_request(session, method, url, **kwargs):
+            calls.append(method)
+            if method == 'GET':
+                return 200, '<html><title>课程</title><script>punch_gps(678)</script></html>'
+            return 200, '<div id="title">签到成功</div>'
+        
+        cookies = [f'{self.cookie_prefix}ok']
+        with patch.object(engine, '_request', side_effect=fake_request):
+            engine.run(cookies)
+            engine.run(cookies)
+        
+        self.assertEqual(calls, ['GET', 'POST', 'GET'])
+        self.assertEqual(engine.results[0]['outcome'], punch_result.ALREADY_SIGNED)
+        self.assertTrue(os.path.exists(index.index_file))
+    
+    def test_run_missing_config(self):
+        """测试配置不完整"""
+        engine = AsyncCheckinEngine('', '39.904697', '116.407178', '100')
+        self.assertEqual(engine.run([f'{self.cookie_prefix}c']), ([], 1))
+
+
 class TestIntegration(unittest.TestCase):
     """集成测试类"""
     
@@ -402,6 +1544,21 @@ if __name__ == '__main__':
     test_suite.addTest(unittest.makeSuite(TestCookieManager))
     test_suite.addTest(unittest.makeSuite(TestLocationManager))
     test_suite.addTest(unittest.makeSuite(TestBrowserCookieExtractor))
+    test_suite.addTest(unittest.makeSuite(TestSessionPool))
+    test_suite.addTest(unittest.makeSuite(TestTokenBucket))
+    test_suite.addTest(unittest.makeSuite(TestRetryQueue))
+    test_suite.addTest(unittest.makeSuite(TestPunchResult))
+    test_suite.addTest(unittest.makeSuite(TestSignedPunchIndex))
+    test_suite.addTest(unittest.makeSuite(TestPunchWatcher))
+    test_suite.addTest(unittest.makeSuite(TestPunchHistory))
+    test_suite.addTest(unittest.makeSuite(TestPreciseScheduler))
+    test_suite.addTest(unittest.makeSuite(TestJobSpec))
+    test_suite.addTest(unittest.makeSuite(TestCookieHealthPrefetch))
+    test_suite.addTest(unittest.makeSuite(TestAccountStore))
+    test_suite.addTest(unittest.makeSuite(TestFileLock))
+    test_suite.addTest(unittest.makeSuite(TestPunchParser))
+    test_suite.addTest(unittest.makeSuite(TestStreamingFetch))
+    test_suite.addTest(unittest.makeSuite(TestAsyncCheckinEngine))
     test_suite.addTest(unittest.makeSuite(TestIntegration))
     
     # 运行测试